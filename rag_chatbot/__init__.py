@@ -1,23 +1,46 @@
 """Hilfsfunktionen zur Vorbereitung der Wissensbasis für den RAG-Chatbot."""
 
-from .chat import ChatMessage, ChatPrompt, ChatResponder, ChatSession, ChatTurn
+from .chat import (
+    AsyncChatResponder,
+    AsyncChatSession,
+    BaseChatSession,
+    ChatMessage,
+    ChatPrompt,
+    ChatResponder,
+    ChatSession,
+    ChatTurn,
+    TurnTimings,
+)
 from .corpus_builder import BuildOptions, BuildResult, build_corpus
 from .index_builder import IndexOptions, IndexResult, build_index
-from .loader import Document
+from .loader import Document, DocumentCache
 from .pipeline import PipelineOptions, PipelineResult, run_pipeline
 from .report import (
+    ReportAggregator,
     SourceReport,
+    StageLatency,
     TranscriptReport,
     build_report,
+    build_report_from_turns,
     format_report,
     load_report,
     load_transcript,
     report_from_json,
 )
-from .retrieval import SearchResult, SemanticIndex
-from .transcript import ChatTranscript, TranscriptContext, TranscriptStats, TranscriptTurn
+from .retrieval import SearchResult, SemanticIndex, TermMatch
+from .transcript import (
+    ChatTranscript,
+    TranscriptContext,
+    TranscriptStats,
+    TranscriptTurn,
+    TranscriptWriter,
+    iter_transcript_turns,
+)
 
 __all__ = [
+    "AsyncChatResponder",
+    "AsyncChatSession",
+    "BaseChatSession",
     "ChatMessage",
     "ChatPrompt",
     "ChatResponder",
@@ -27,21 +50,29 @@ __all__ = [
     "BuildOptions",
     "BuildResult",
     "Document",
+    "DocumentCache",
     "build_index",
     "IndexOptions",
     "IndexResult",
     "SemanticIndex",
     "SearchResult",
+    "TermMatch",
     "SourceReport",
+    "StageLatency",
     "TranscriptReport",
     "ChatTranscript",
     "TranscriptContext",
     "TranscriptStats",
     "TranscriptTurn",
+    "TranscriptWriter",
+    "TurnTimings",
     "PipelineOptions",
     "PipelineResult",
+    "ReportAggregator",
     "build_report",
+    "build_report_from_turns",
     "format_report",
+    "iter_transcript_turns",
     "load_report",
     "load_transcript",
     "report_from_json",
@@ -0,0 +1,30 @@
+"""Benchmarks für Loader, Chunker, Indexaufbau und Suche auf synthetischen Korpora."""
+
+from .runner import (
+    BENCHMARK_FORMAT,
+    BENCHMARK_VERSION,
+    SEARCH_MODES,
+    STAGES,
+    BenchmarkOptions,
+    dump_benchmark,
+    recall_at_k,
+    run_benchmark,
+)
+from .synthetic import BASE_DOCUMENTS, BASE_WORDS, SyntheticCorpus, TextGenerator, parse_scales, write_corpus
+
+__all__ = [
+    "BASE_DOCUMENTS",
+    "BASE_WORDS",
+    "BENCHMARK_FORMAT",
+    "BENCHMARK_VERSION",
+    "BenchmarkOptions",
+    "SEARCH_MODES",
+    "STAGES",
+    "SyntheticCorpus",
+    "TextGenerator",
+    "dump_benchmark",
+    "parse_scales",
+    "recall_at_k",
+    "run_benchmark",
+    "write_corpus",
+]
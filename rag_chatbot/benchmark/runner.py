@@ -0,0 +1,246 @@
+from __future__ import annotations
+
+"""Messung von Laufzeit, Speicher und Trefferqualität über skalierte Korpora."""
+
+import json
+import math
+import platform
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+from ..chunker import chunk_paragraphs, split_into_paragraphs
+from ..corpus_builder import BuildOptions, build_corpus
+from ..index_builder import IndexOptions, build_index
+from ..loader import load_documents
+from ..profiling import peak_rss_kb
+from ..retrieval import SearchResult, SemanticIndex
+from .synthetic import TextGenerator, write_corpus
+
+BENCHMARK_FORMAT = "rag-benchmark"
+BENCHMARK_VERSION = 1
+
+STAGES = ("load", "chunk", "corpus", "index", "load_index", "query")
+
+SearchMode = Callable[[SemanticIndex, str, int, float], List[SearchResult]]
+
+
+def _search(index: SemanticIndex, query: str, top_k: int, min_score: float) -> List[SearchResult]:
+    return index.search(query, top_k=top_k, min_score=min_score)
+
+
+SEARCH_MODES: Dict[str, SearchMode] = {"search": _search}
+"""Suchverfahren, deren recall@k gegen die erschöpfende Suche gemessen wird.
+
+Neue (z. B. approximative) Verfahren werden hier unter einem Namen
+registriert; die Funktion muss auf Modulebene liegen, damit sie sich in
+isolierten Prozessen per Name auflösen lässt.
+"""
+
+
+@dataclass(frozen=True)
+class BenchmarkOptions:
+    """Einstellungen für :func:`run_benchmark`."""
+
+    scales: Sequence[float]
+    workdir: Path
+    seed: int = 1
+    questions: int = 50
+    top_k: int = 4
+    min_score: float = 0.05
+    max_words: int = 180
+    overlap: int = 40
+    modes: Sequence[str] = ("search",)
+    # Jede Stufe in einem frischen Prozess messen, damit ``peak_rss_kb`` nur sie enthält.
+    isolate: bool = True
+    query_list: Sequence[str] = ()
+
+
+def run_benchmark(options: BenchmarkOptions, *, progress: Optional[Callable[[str], None]] = None) -> Dict[str, object]:
+    """Erzeugt für jede Skalierung einen Korpus und misst alle Stufen.
+
+    Das Ergebnis ist ein JSON-fähiges Dictionary; zwei Läufe (z. B. vor und
+    nach einem Commit) lassen sich Stufe für Stufe vergleichen.
+    """
+
+    if not options.scales:
+        raise ValueError("Es wurde keine Skalierung angegeben.")
+    unknown = [mode for mode in options.modes if mode not in SEARCH_MODES]
+    if unknown:
+        raise ValueError(f"Unbekannte Suchverfahren: {', '.join(unknown)}")
+
+    generator = TextGenerator(seed=options.seed)
+    questions = list(options.query_list) or generator.questions(options.questions)
+    runs = []
+    for scale in options.scales:
+        directory = options.workdir / f"scale-{scale:g}"
+        paths = {
+            "sources": directory / "docs",
+            "corpus": directory / "corpus.jsonl",
+            "index": directory / "index.json",
+        }
+        if progress:
+            progress(f"Skalierung {scale:g}: erzeuge Dokumente")
+        started = time.perf_counter()
+        corpus = write_corpus(paths["sources"], scale, seed=options.seed, generator=generator)
+        run: Dict[str, object] = {
+            "scale": scale,
+            "documents": corpus.documents,
+            "words": corpus.words,
+            "generate_seconds": round(time.perf_counter() - started, 4),
+        }
+        stages: Dict[str, Dict[str, object]] = {}
+        for stage in STAGES:
+            if progress:
+                progress(f"Skalierung {scale:g}: {stage}")
+            stages[stage] = _measure(stage, paths, options, questions)
+        run["stages"] = stages
+        run["corpus_bytes"] = paths["corpus"].stat().st_size
+        run["index_bytes"] = paths["index"].stat().st_size
+        runs.append(run)
+
+    return {
+        "format": BENCHMARK_FORMAT,
+        "version": BENCHMARK_VERSION,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {
+            "seed": options.seed,
+            "questions": len(questions),
+            "top_k": options.top_k,
+            "min_score": options.min_score,
+            "max_words": options.max_words,
+            "overlap": options.overlap,
+            "isolated": options.isolate,
+        },
+        "runs": runs,
+    }
+
+
+def dump_benchmark(result: Dict[str, object], path: Optional[Path] = None) -> str:
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if path is not None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text + "\n", encoding="utf-8")
+    return text
+
+
+def recall_at_k(
+    index: SemanticIndex,
+    questions: Sequence[str],
+    mode: SearchMode,
+    *,
+    top_k: int,
+    min_score: float,
+) -> float:
+    """Anteil der Treffer der erschöpfenden Suche, die ``mode`` ebenfalls liefert.
+
+    Beide Suchen verwenden dasselbe ``min_score``, damit nur das Verfahren
+    und nicht die Schwelle gemessen wird.
+    """
+
+    found = expected = 0
+    for question in questions:
+        exact = {result.chunk_id for result in index.search(question, top_k=top_k, min_score=min_score)}
+        if not exact:
+            continue
+        candidate = {result.chunk_id for result in mode(index, question, top_k, min_score)}
+        found += len(exact & candidate)
+        expected += len(exact)
+    return round(found / expected, 6) if expected else 1.0
+
+
+def _measure(
+    stage: str,
+    paths: Dict[str, Path],
+    options: BenchmarkOptions,
+    questions: Sequence[str],
+) -> Dict[str, object]:
+    if not options.isolate:
+        return _run_stage(stage, paths, options, questions)
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+        return executor.submit(_run_stage, stage, paths, options, questions).result()
+
+
+def _run_stage(
+    stage: str,
+    paths: Dict[str, Path],
+    options: BenchmarkOptions,
+    questions: Sequence[str],
+) -> Dict[str, object]:
+    extra: Dict[str, object] = {}
+    documents = load_documents([paths["sources"]]) if stage == "chunk" else None
+    index = SemanticIndex(paths["index"]) if stage == "query" else None
+
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    if stage == "load":
+        extra["documents"] = len(load_documents([paths["sources"]]))
+    elif stage == "chunk":
+        chunks = 0
+        for document in documents or ():
+            paragraphs = split_into_paragraphs(document.text)
+            chunks += sum(1 for _ in chunk_paragraphs(paragraphs, max_words=options.max_words, overlap=options.overlap))
+        extra["chunks"] = chunks
+    elif stage == "corpus":
+        result = build_corpus(
+            BuildOptions(
+                sources=[paths["sources"]],
+                output_path=paths["corpus"],
+                max_words=options.max_words,
+                overlap=options.overlap,
+            )
+        )
+        extra["chunks"] = result.chunks
+    elif stage == "index":
+        built = build_index(IndexOptions(corpus_path=paths["corpus"], output_path=paths["index"]))
+        extra["vocabulary"] = built.vocabulary_size
+    elif stage == "load_index":
+        SemanticIndex(paths["index"])
+    elif stage == "query" and index is not None:
+        latencies = []
+        for question in questions:
+            started = time.perf_counter()
+            index.search(question, top_k=options.top_k, min_score=options.min_score)
+            latencies.append(time.perf_counter() - started)
+        latencies.sort()
+        extra["queries"] = len(latencies)
+        for label, quantile in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99)):
+            extra[f"{label}_ms"] = round(_nearest_rank(latencies, quantile) * 1000, 4)
+    else:
+        raise ValueError(f"Unbekannte Stufe: {stage}")
+    measured = {
+        "seconds": round(time.perf_counter() - wall, 4),
+        "cpu_seconds": round(time.process_time() - cpu, 4),
+        "peak_rss_kb": peak_rss_kb(),
+    }
+
+    if stage == "query" and index is not None:
+        extra["recall_at_k"] = {
+            name: recall_at_k(index, questions, SEARCH_MODES[name], top_k=options.top_k, min_score=options.min_score)
+            for name in options.modes
+        }
+    measured.update(extra)
+    return measured
+
+
+def _nearest_rank(ordered: Sequence[float], quantile: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[max(1, math.ceil(quantile * len(ordered))) - 1]
+
+
+__all__ = [
+    "BENCHMARK_FORMAT",
+    "BENCHMARK_VERSION",
+    "BenchmarkOptions",
+    "SEARCH_MODES",
+    "STAGES",
+    "SearchMode",
+    "dump_benchmark",
+    "recall_at_k",
+    "run_benchmark",
+]
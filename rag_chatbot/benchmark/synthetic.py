@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+"""Deterministischer Generator für deutsch anmutende Markdown-Dokumente."""
+
+import random
+from bisect import bisect_left
+from dataclasses import dataclass
+from itertools import accumulate
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+BASE_DOCUMENTS = 69
+"""Anzahl der Dokumente in ``docs/`` – entspricht Skalierung 1."""
+
+BASE_WORDS = 67_000
+"""Ungefähre Wortzahl von ``docs/`` nach dem Laden – entspricht Skalierung 1."""
+
+_ONSETS = (
+    "b", "d", "f", "g", "h", "k", "l", "m", "n", "p", "r", "s", "t", "w", "z",
+    "br", "dr", "fl", "gr", "kl", "kr", "pf", "sch", "sp", "st", "tr", "schw", "str",
+)
+_NUCLEI = ("a", "e", "i", "o", "u", "ä", "ö", "ü", "ei", "au", "ie", "eu", "e", "e")
+_CODAS = ("", "", "n", "r", "s", "t", "ch", "ck", "ng", "nd", "rt", "st", "lt", "mm", "tz")
+_SUFFIXES = ("ung", "heit", "keit", "schaft", "en", "er", "lich", "isch", "bar", "e")
+_FUNCTION_WORDS = (
+    "der", "die", "das", "und", "ist", "mit", "für", "von", "nicht", "ein", "eine",
+    "zu", "auf", "im", "den", "dem", "auch", "wird", "werden", "bei", "oder", "als",
+)
+_QUESTION_TEMPLATES = (
+    "Was bedeutet {0} bei {1}?",
+    "Wie hängen {0} und {1} mit {2} zusammen?",
+    "Welche Rolle spielt {0} für {1}?",
+    "Wo finde ich {0} und {1}?",
+)
+
+
+@dataclass(frozen=True)
+class SyntheticCorpus:
+    """Ergebnis von :func:`write_corpus`."""
+
+    scale: float
+    documents: int
+    words: int
+    paths: Tuple[Path, ...]
+
+
+class TextGenerator:
+    """Erzeugt Wörter mit Zipf-Verteilung aus einem silbenbasierten Vokabular.
+
+    Vokabular und Fragen hängen nur von ``seed`` ab, nicht von der
+    Skalierung; dadurch sind Messungen verschiedener Korpusgrößen vergleichbar.
+    """
+
+    def __init__(self, *, seed: int = 1, vocabulary_size: int = 20_000) -> None:
+        if vocabulary_size <= len(_FUNCTION_WORDS):
+            raise ValueError("vocabulary_size ist zu klein.")
+        self._rng = random.Random(seed)
+        self.vocabulary: Tuple[str, ...] = _FUNCTION_WORDS + self._content_words(
+            vocabulary_size - len(_FUNCTION_WORDS)
+        )
+        self._cumulative: List[float] = list(accumulate(1.0 / rank for rank in range(1, len(self.vocabulary) + 1)))
+        self._question_rng = random.Random(seed ^ 0x5EED)
+
+    def word(self, rng: random.Random) -> str:
+        position = bisect_left(self._cumulative, rng.random() * self._cumulative[-1])
+        return self.vocabulary[min(position, len(self.vocabulary) - 1)]
+
+    def sentence(self, rng: random.Random) -> str:
+        words = [self.word(rng) for _ in range(rng.randint(6, 18))]
+        words[0] = words[0].capitalize()
+        return " ".join(words) + rng.choice(".....?!")
+
+    def document(self, rng: random.Random, words: int) -> Tuple[str, int]:
+        """Markdown mit Titel, Abschnitten, Absätzen und Listen; liefert auch die Wortzahl."""
+
+        title = " ".join(self.word(rng).capitalize() for _ in range(rng.randint(2, 4)))
+        lines = [f"# {title}", ""]
+        written = 0
+        while written < words:
+            heading = " ".join(self.word(rng).capitalize() for _ in range(rng.randint(1, 3)))
+            lines.extend((f"## {heading}", ""))
+            for _ in range(rng.randint(1, 4)):
+                if rng.random() < 0.15:
+                    items = [f"- {self.sentence(rng)}" for _ in range(rng.randint(2, 5))]
+                    lines.extend(items)
+                    written += sum(len(item.split()) - 1 for item in items)
+                else:
+                    paragraph = " ".join(self.sentence(rng) for _ in range(rng.randint(2, 6)))
+                    lines.append(paragraph)
+                    written += len(paragraph.split())
+                lines.append("")
+                if written >= words:
+                    break
+        return "\n".join(lines), written
+
+    def questions(self, count: int) -> List[str]:
+        """Feste Fragenliste aus Wörtern mittlerer Häufigkeit."""
+
+        rng = random.Random(self._question_rng.random())
+        band = self.vocabulary[len(_FUNCTION_WORDS) : len(_FUNCTION_WORDS) + 2000]
+        questions = []
+        for position in range(count):
+            template = _QUESTION_TEMPLATES[position % len(_QUESTION_TEMPLATES)]
+            questions.append(template.format(*(rng.choice(band) for _ in range(3))))
+        return questions
+
+    def _content_words(self, count: int) -> Tuple[str, ...]:
+        words: List[str] = []
+        seen = set(_FUNCTION_WORDS)
+        while len(words) < count:
+            syllables = self._rng.choice((1, 1, 2, 2, 2, 3))
+            word = "".join(
+                self._rng.choice(_ONSETS) + self._rng.choice(_NUCLEI) + self._rng.choice(_CODAS)
+                for _ in range(syllables)
+            )
+            if self._rng.random() < 0.3:
+                word += self._rng.choice(_SUFFIXES)
+            if word not in seen:
+                seen.add(word)
+                words.append(word)
+        return tuple(words)
+
+
+def write_corpus(
+    directory: Path,
+    scale: float,
+    *,
+    seed: int = 1,
+    generator: Optional[TextGenerator] = None,
+) -> SyntheticCorpus:
+    """Schreibt ``scale`` × :data:`BASE_DOCUMENTS` Dokumente nach ``directory``.
+
+    Die Dokumentlängen streuen um ``BASE_WORDS / BASE_DOCUMENTS``; die
+    Gesamtwortzahl wächst damit linear mit ``scale``.
+    """
+
+    if scale <= 0:
+        raise ValueError("scale muss größer als 0 sein.")
+    generator = generator or TextGenerator(seed=seed)
+    directory.mkdir(parents=True, exist_ok=True)
+    count = max(1, round(BASE_DOCUMENTS * scale))
+    average = BASE_WORDS / BASE_DOCUMENTS
+    paths: List[Path] = []
+    total = 0
+    for number in range(count):
+        rng = random.Random(f"{seed}:{number}")
+        target = max(20, int(rng.lognormvariate(0, 0.8) * average * 0.62))
+        text, words = generator.document(rng, target)
+        # Unterverzeichnisse halten auch bei großen Skalierungen die Verzeichnisse klein.
+        path = directory / f"{number // 1000:04d}" / f"doc-{number:07d}.md"
+        path.parent.mkdir(exist_ok=True)
+        path.write_text(text, encoding="utf-8")
+        paths.append(path)
+        total += words
+    return SyntheticCorpus(scale=scale, documents=count, words=total, paths=tuple(paths))
+
+
+def parse_scales(raw: str) -> Sequence[float]:
+    """Liest kommagetrennte Skalierungen wie ``1,10,100``."""
+
+    try:
+        scales = [float(part) for part in raw.split(",") if part.strip()]
+    except ValueError as exc:
+        raise ValueError(f"Ungültige Skalierung: {raw!r}") from exc
+    if not scales or any(scale <= 0 for scale in scales):
+        raise ValueError("Skalierungen müssen größer als 0 sein.")
+    return scales
+
+
+__all__ = [
+    "BASE_DOCUMENTS",
+    "BASE_WORDS",
+    "SyntheticCorpus",
+    "TextGenerator",
+    "parse_scales",
+    "write_corpus",
+]
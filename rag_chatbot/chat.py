@@ -2,14 +2,21 @@ from __future__ import annotations
 
 """Chat-spezifische Komponenten für den RAG-Chatbot."""
 
-from dataclasses import dataclass
-from typing import TYPE_CHECKING, List, Optional, Protocol, Sequence, Tuple
-
+import asyncio
+import hashlib
+import time
+import uuid
+from concurrent.futures import Executor
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Awaitable, Dict, List, Mapping, Optional, Protocol, Sequence, Tuple
+
+from .passages import ContextPassage, merge_adjacent
 from .retrieval import SearchResult, SemanticIndex
+from .snippets import DEFAULT_SNIPPET_CHARS, extract_snippet
 
 if TYPE_CHECKING:
-    from .transcript import ChatTranscript
-
+    from .compaction import HistoryCompactor
+    from .transcript import TranscriptSink
 
 
 ChatRole = str
@@ -29,6 +36,63 @@ class ChatPrompt:
 
     messages: Tuple[ChatMessage, ...]
     context: Tuple[SearchResult, ...]
+    layout: str = "default"
+    prefix_length: int = 0
+    prefix_fingerprint: str = ""
+    cache_key: str = field(default="", compare=False)
+
+    @property
+    def prefix(self) -> Tuple[ChatMessage, ...]:
+        """Die Nachrichten, die zwischen den Runden einer Sitzung unverändert bleiben sollen."""
+
+        return self.messages[: self.prefix_length]
+
+    @property
+    def chars(self) -> int:
+        return sum(len(message.content) for message in self.messages)
+
+    @property
+    def estimated_tokens(self) -> int:
+        return sum(estimate_tokens(message.content) for message in self.messages)
+
+
+TIMING_STAGES = ("vectorise", "search", "prompt", "responder")
+
+
+@dataclass(frozen=True)
+class TurnTimings:
+    """Dauer der einzelnen Schritte einer Chat-Runde in Sekunden (monotone Uhr).
+
+    ``vectorise`` bleibt ``None``, wenn der Index Vektorisierung und Suche
+    nicht getrennt anbietet; die Zeit steckt dann in ``search``.
+    """
+
+    vectorise: Optional[float]
+    search: float
+    prompt: float
+    responder: float
+
+    def to_dict(self) -> Dict[str, float]:
+        return {
+            stage: round(value, 6)
+            for stage in TIMING_STAGES
+            if (value := getattr(self, stage)) is not None
+        }
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, object]) -> Optional["TurnTimings"]:
+        values: Dict[str, Optional[float]] = {}
+        for stage in TIMING_STAGES:
+            value = data.get(stage)
+            values[stage] = float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+        if values["search"] is None or values["prompt"] is None or values["responder"] is None:
+            return None
+        return cls(
+            vectorise=values["vectorise"],
+            search=values["search"],
+            prompt=values["prompt"],
+            responder=values["responder"],
+        )
 
 
 @dataclass(frozen=True)
@@ -37,6 +101,7 @@ class ChatTurn:
 
     response: str
     prompt: ChatPrompt
+    timings: Optional[TurnTimings] = None
 
 
 class ChatResponder(Protocol):
@@ -53,116 +118,397 @@ DEFAULT_SYSTEM_PROMPT = (
 
 DEFAULT_CONTEXT_HEADER = "Kontext aus der Wissensbasis:\n"
 
+DEFAULT_QUESTION_HEADER = "Frage:\n"
 
-class ChatSession:
-    """Verwaltet eine Konversation und baut Eingaben für ein Sprachmodell."""
+PROMPT_LAYOUTS = ("default", "stable")
+
+
+def estimate_tokens(text: str) -> int:
+    """Grobe Token-Schätzung (≈ vier Zeichen pro Token), ohne Tokenizer-Abhängigkeit."""
+
+    if not text:
+        return 0
+    return (len(text) + 3) // 4
+
+
+def prefix_fingerprint(messages: Sequence[ChatMessage]) -> str:
+    """Stabiler Hash über Rollen und Inhalte eines Prefixes.
+
+    Der Hash ändert sich mit jeder Runde, in der der Verlauf wächst; er dient
+    der Diagnose. Als Routing-Schlüssel für Prefix-Caches eignet sich
+    :attr:`ChatPrompt.cache_key`.
+    """
+
+    digest = hashlib.sha256()
+    for message in messages:
+        digest.update(message.role.encode("utf-8"))
+        digest.update(b"\x1f")
+        digest.update(message.content.encode("utf-8"))
+        digest.update(b"\x1e")
+    return digest.hexdigest()[:32]
+
+
+class _StageTimer:
+    """Misst die Zeit seit dem letzten Zwischenstopp; nur aktiv bei ``record_timings``."""
+
+    __slots__ = ("_last", "laps")
+
+    def __init__(self) -> None:
+        self.laps: Dict[str, float] = {}
+        self._last = time.perf_counter()
+
+    def lap(self, stage: str) -> None:
+        now = time.perf_counter()
+        self.laps[stage] = now - self._last
+        self._last = now
+
+    def result(self) -> TurnTimings:
+        return TurnTimings(
+            vectorise=self.laps.get("vectorise"),
+            search=self.laps.get("search", 0.0),
+            prompt=self.laps.get("prompt", 0.0),
+            responder=self.laps.get("responder", 0.0),
+        )
+
+
+class AsyncChatResponder(Protocol):
+    """Protokoll für asynchrone Antwortgeneratoren."""
+
+    def __call__(self, prompt: ChatPrompt) -> Awaitable[str]:  # pragma: no cover - Signatur
+        ...
+
+
+class BaseChatSession:
+    """Gemeinsame Prompt-, Verlaufs- und Protokolllogik der Chat-Sitzungen.
+
+    Basis von :class:`ChatSession` und :class:`AsyncChatSession`; Code, der
+    beide Varianten verwaltet (z. B. ``ChatSessionStore``), typisiert hierauf.
+
+    Mit ``prompt_layout="stable"`` bleibt der Anfang des Prompts (System-Prompt
+    und Verlauf) über die Runden byte-identisch: Der wechselnde Kontext wandert
+    in die letzte Nutzer-Nachricht, und der Verlauf wird nicht bei jeder Runde
+    um eine Runde verschoben, sondern erst beim Überschreiten des Limits in
+    einem Schritt auf die Hälfte gekürzt. So können Prefix-Caches beim Anbieter
+    oder im Chat-Service greifen.
+
+    Jede Kontextpassage wird auf ``snippet_chars`` Zeichen rund um die
+    Fundstellen der Frage gekürzt.
+
+    Mit ``record_timings=True`` enthält jede :class:`ChatTurn` die Dauer von
+    Vektorisierung, Suche, Prompt-Aufbau und Antwortgenerator.
+
+    ``cache_key`` (Standard: zufällig pro Sitzung) wird in jeden Prompt
+    übernommen und bleibt über alle Runden gleich.
+    """
 
     def __init__(
         self,
         index: SemanticIndex,
-        responder: ChatResponder,
         *,
         system_prompt: str = DEFAULT_SYSTEM_PROMPT,
         history_limit: int = 4,
         top_k: int = 3,
         min_score: float = 0.2,
-        transcript: Optional["ChatTranscript"] = None,
+        transcript: Optional["TranscriptSink"] = None,
+        compactor: Optional["HistoryCompactor"] = None,
+        prompt_layout: str = "default",
+        snippet_chars: int = DEFAULT_SNIPPET_CHARS,
+        record_timings: bool = False,
+        cache_key: Optional[str] = None,
     ) -> None:
         if history_limit < 0:
             raise ValueError("history_limit darf nicht negativ sein.")
         if top_k <= 0:
             raise ValueError("top_k muss größer als 0 sein.")
+        if snippet_chars <= 0:
+            raise ValueError("snippet_chars muss größer als 0 sein.")
+        if prompt_layout not in PROMPT_LAYOUTS:
+            raise ValueError(f"Unbekanntes Prompt-Layout: {prompt_layout!r}")
 
         self._index = index
-        self._responder = responder
         self._system_prompt = system_prompt.strip()
         self._history_limit = history_limit
         self._top_k = top_k
         self._min_score = min_score
         self._transcript = transcript
+        self._compactor = compactor
+        self._prompt_layout = prompt_layout
+        self._snippet_chars = snippet_chars
+        self._record_timings = record_timings
+        self._cache_key = cache_key or uuid.uuid4().hex
+        # Getrennte Messung von Vektorisierung und Suche, sofern der Index beides anbietet.
+        self._split_search = callable(getattr(index, "vectorise", None)) and callable(
+            getattr(index, "search_vector", None)
+        )
         self._history: List[ChatMessage] = []
 
+    @property
+    def prompt_layout(self) -> str:
+        return self._prompt_layout
+
+    @property
+    def cache_key(self) -> str:
+        """Für die ganze Sitzung gleichbleibender Schlüssel, z. B. für ``prompt_cache_key``."""
+
+        return self._cache_key
+
     @property
     def history(self) -> Tuple[ChatMessage, ...]:
         """Gibt die bisherige Konversation ohne System-Prompt zurück."""
 
         return tuple(self._history)
 
-    def send(self, user_message: str) -> ChatTurn:
+    def load_history(self, messages: Sequence[ChatMessage]) -> None:
+        """Ersetzt den Verlauf, z. B. beim Wiederherstellen einer gespeicherten Sitzung."""
+
+        self._history = list(messages)
+        self._truncate_history()
+
+    @staticmethod
+    def _normalise_message(user_message: str) -> str:
         user_message = user_message.strip()
         if not user_message:
             raise ValueError("Die Nutzer-Nachricht darf nicht leer sein.")
-
-        context = self._index.search(user_message, top_k=self._top_k, min_score=self._min_score)
+        return user_message
+
+    def _retrieve(self, user_message: str, timer: Optional[_StageTimer] = None) -> List[SearchResult]:
+        if timer is None:
+            return self._index.search(user_message, top_k=self._top_k, min_score=self._min_score)
+        if self._split_search:
+            vector = self._index.vectorise(user_message)
+            timer.lap("vectorise")
+            results = self._index.search_vector(vector, top_k=self._top_k, min_score=self._min_score)
+        else:
+            results = self._index.search(user_message, top_k=self._top_k, min_score=self._min_score)
+        timer.lap("search")
+        return results
+
+    def _build_prompt(self, user_message: str, context: Sequence[SearchResult]) -> ChatPrompt:
         context_message = self._build_context_message(context)
 
         messages: List[ChatMessage] = [ChatMessage("system", self._system_prompt)]
         if self._history:
             messages.extend(self._history)
-        if context_message:
+        prefix_length = len(messages)
+        if self._prompt_layout == "stable":
+            # Kontext und Frage bilden gemeinsam das wechselnde Ende des Prompts.
+            if context_message:
+                user_message = f"{context_message.content}\n\n{DEFAULT_QUESTION_HEADER}{user_message}"
+        elif context_message:
             messages.append(context_message)
         messages.append(ChatMessage("user", user_message))
 
-        prompt = ChatPrompt(messages=tuple(messages), context=tuple(context))
-        response = self._responder(prompt).strip()
-
-        turn = ChatTurn(response=response, prompt=prompt)
-
-        self._history.extend((ChatMessage("user", user_message), ChatMessage("assistant", response)))
-        self._truncate_history()
+        return ChatPrompt(
+            messages=tuple(messages),
+            context=tuple(context),
+            layout=self._prompt_layout,
+            prefix_length=prefix_length,
+            prefix_fingerprint=prefix_fingerprint(messages[:prefix_length]),
+            cache_key=self._cache_key,
+        )
 
+    def _finish_turn(
+        self,
+        user_message: str,
+        prompt: ChatPrompt,
+        response: str,
+        timer: Optional[_StageTimer] = None,
+    ) -> ChatTurn:
+        turn = self._complete_turn(user_message, prompt, response, timer)
         if self._transcript is not None:
             self._transcript.record(user_message, turn)
+        return turn
 
+    def _complete_turn(
+        self,
+        user_message: str,
+        prompt: ChatPrompt,
+        response: str,
+        timer: Optional[_StageTimer],
+    ) -> ChatTurn:
+        """Übernimmt die Runde in den Verlauf, ohne sie zu protokollieren."""
+
+        turn = ChatTurn(
+            response=response.strip(),
+            prompt=prompt,
+            timings=timer.result() if timer is not None else None,
+        )
+
+        self._history.extend((ChatMessage("user", user_message), ChatMessage("assistant", turn.response)))
+        self._truncate_history()
         return turn
 
     def _truncate_history(self) -> None:
         if self._history_limit == 0:
             self._history.clear()
             return
+        stable = self._prompt_layout == "stable"
+        if self._compactor is not None:
+            # Mit Compactor begrenzt das Token-Budget den Verlauf statt der Nachrichtenanzahl.
+            target = max(1, self._compactor.token_budget // 2) if stable else None
+            self._history = self._compactor.compact(self._history, target=target)
+            return
         max_messages = self._history_limit * 2
-        excess = len(self._history) - max_messages
-        if excess > 0:
-            del self._history[:excess]
+        if len(self._history) <= max_messages:
+            return
+        keep = max(1, self._history_limit // 2) * 2 if stable else max_messages
+        del self._history[: len(self._history) - keep]
 
     def _build_context_message(self, context: Sequence[SearchResult]) -> Optional[ChatMessage]:
         if not context:
             return None
         lines = [DEFAULT_CONTEXT_HEADER]
-        for index, item in enumerate(context, start=1):
-            summary = _summarise_text(item.text)
-            source = _format_source(item)
-            lines.append(f"[{index}] {source}\n{summary}")
+        # Benachbarte Chunks überlappen sich; zusammengeführt erscheint der Text nur einmal.
+        for index, passage in enumerate(merge_adjacent(context), start=1):
+            snippet = extract_snippet(passage.text, passage.matches, self._snippet_chars)
+            source = _format_source(passage)
+            lines.append(f"[{index}] {source}\n{snippet}")
         content = "\n\n".join(lines)
         return ChatMessage("system", content)
 
 
-def _summarise_text(text: str, limit: int = 420) -> str:
-    condensed = " ".join(text.split())
-    if len(condensed) <= limit:
-        return condensed
-    return condensed[: limit - 1] + "…"
+class ChatSession(BaseChatSession):
+    """Verwaltet eine Konversation und baut Eingaben für ein Sprachmodell."""
+
+    def __init__(
+        self,
+        index: SemanticIndex,
+        responder: ChatResponder,
+        *,
+        system_prompt: str = DEFAULT_SYSTEM_PROMPT,
+        history_limit: int = 4,
+        top_k: int = 3,
+        min_score: float = 0.2,
+        transcript: Optional["TranscriptSink"] = None,
+        compactor: Optional["HistoryCompactor"] = None,
+        prompt_layout: str = "default",
+        snippet_chars: int = DEFAULT_SNIPPET_CHARS,
+        record_timings: bool = False,
+        cache_key: Optional[str] = None,
+    ) -> None:
+        super().__init__(
+            index,
+            system_prompt=system_prompt,
+            history_limit=history_limit,
+            top_k=top_k,
+            min_score=min_score,
+            transcript=transcript,
+            compactor=compactor,
+            prompt_layout=prompt_layout,
+            snippet_chars=snippet_chars,
+            record_timings=record_timings,
+            cache_key=cache_key,
+        )
+        self._responder = responder
 
+    def send(self, user_message: str) -> ChatTurn:
+        user_message = self._normalise_message(user_message)
+        timer = _StageTimer() if self._record_timings else None
+        context = self._retrieve(user_message, timer)
+        prompt = self._build_prompt(user_message, context)
+        if timer is not None:
+            timer.lap("prompt")
+        response = self._responder(prompt)
+        if timer is not None:
+            timer.lap("responder")
+        return self._finish_turn(user_message, prompt, response, timer)
+
+
+class AsyncChatSession(BaseChatSession):
+    """Asynchrone Variante von :class:`ChatSession` für viele Gespräche in einer Event-Loop.
+
+    Die CPU-lastige Suche läuft im Thread-Pool (``executor`` oder der
+    Standard-Executor der Loop), der Responder wird nur abgewartet; auch das
+    Protokollieren über ``transcript`` läuft in einem Thread. Aufrufe von
+    :meth:`asend` auf derselben Sitzung werden nacheinander abgearbeitet, damit
+    der Verlauf dieselbe Reihenfolge wie bei :meth:`ChatSession.send` behält.
+    """
 
-def _format_source(result: SearchResult) -> str:
-    metadata = result.metadata
+    def __init__(
+        self,
+        index: SemanticIndex,
+        responder: AsyncChatResponder,
+        *,
+        system_prompt: str = DEFAULT_SYSTEM_PROMPT,
+        history_limit: int = 4,
+        top_k: int = 3,
+        min_score: float = 0.2,
+        transcript: Optional["TranscriptSink"] = None,
+        compactor: Optional["HistoryCompactor"] = None,
+        prompt_layout: str = "default",
+        snippet_chars: int = DEFAULT_SNIPPET_CHARS,
+        record_timings: bool = False,
+        cache_key: Optional[str] = None,
+        executor: Optional[Executor] = None,
+    ) -> None:
+        super().__init__(
+            index,
+            system_prompt=system_prompt,
+            history_limit=history_limit,
+            top_k=top_k,
+            min_score=min_score,
+            transcript=transcript,
+            compactor=compactor,
+            prompt_layout=prompt_layout,
+            snippet_chars=snippet_chars,
+            record_timings=record_timings,
+            cache_key=cache_key,
+        )
+        self._responder = responder
+        self._executor = executor
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def asend(self, user_message: str) -> ChatTurn:
+        user_message = self._normalise_message(user_message)
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            timer = _StageTimer() if self._record_timings else None
+            context = await loop.run_in_executor(self._executor, self._retrieve, user_message, timer)
+            prompt = self._build_prompt(user_message, context)
+            if timer is not None:
+                timer.lap("prompt")
+            response = await self._responder(prompt)
+            if timer is not None:
+                timer.lap("responder")
+            turn = self._complete_turn(user_message, prompt, response, timer)
+            if self._transcript is not None:
+                # Das Protokoll schreibt in Dateien (inkl. fsync) und gehört nicht auf die Event-Loop.
+                await asyncio.to_thread(self._transcript.record, user_message, turn)
+            return turn
+
+
+def _format_source(passage: ContextPassage) -> str:
+    metadata = passage.metadata
     title = metadata.get("title")
     chunk_index = metadata.get("chunk_index")
     if title:
+        indices = passage.chunk_indices
+        if len(indices) > 1:
+            return f"{title} (Abschnitte {indices[0]}–{indices[-1]})"
         if chunk_index is not None:
             return f"{title} (Abschnitt {chunk_index})"
         return str(title)
     source = metadata.get("source")
     if source:
         return str(source)
-    return result.chunk_id
+    return passage.results[0].chunk_id
 
 
 __all__ = [
+    "AsyncChatResponder",
+    "AsyncChatSession",
+    "BaseChatSession",
     "ChatMessage",
     "ChatPrompt",
     "ChatResponder",
     "ChatSession",
     "ChatTurn",
     "DEFAULT_SYSTEM_PROMPT",
+    "PROMPT_LAYOUTS",
+    "TIMING_STAGES",
+    "TurnTimings",
+    "estimate_tokens",
+    "prefix_fingerprint",
 ]
@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+"""Nachschlagen von Chunk-Texten anhand ihrer IDs aus der lokalen Wissensbasis."""
+
+import json
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+_DOMAIN_RE = re.compile(r"^[a-z0-9][a-z0-9._-]*$")
+_METADATA_KEYS = ("source", "title", "chunk_index", "word_count")
+
+
+@dataclass(frozen=True)
+class StoredChunk:
+    """Ein aus dem Korpus gelesener Chunk."""
+
+    chunk_id: str
+    text: str
+    metadata: Dict[str, Any]
+
+
+@dataclass(frozen=True)
+class _CorpusOffsets:
+    path: Path
+    mtime_ns: int
+    size: int
+    offsets: Dict[str, int]
+
+
+class ChunkStore:
+    """Löst Chunk-IDs über die ``corpus.jsonl``-Dateien der Domains auf.
+
+    Pro Korpus wird nur eine Tabelle ``ID -> Byte-Offset`` gehalten; die Texte
+    selbst landen in einem begrenzten LRU-Cache. Ändert sich eine Korpusdatei,
+    wird ihre Offset-Tabelle beim nächsten Zugriff neu aufgebaut.
+    """
+
+    def __init__(self, base_path: Path, *, cache_size: int = 2048) -> None:
+        if cache_size < 0:
+            raise ValueError("cache_size darf nicht negativ sein.")
+        self._base_path = base_path
+        self._cache_size = cache_size
+        self._offsets: Dict[Path, _CorpusOffsets] = {}
+        self._cache: "OrderedDict[Tuple[Path, int, str], StoredChunk]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def cached_chunks(self) -> int:
+        return len(self._cache)
+
+    def corpus_path(self, domain: Optional[str] = None) -> Path:
+        """Gibt den Korpuspfad für eine Domain (oder die Standard-Wissensbasis) zurück."""
+
+        if domain is None or domain.strip() == "":
+            return self._base_path / "corpus.jsonl"
+        normalised = domain.strip().lower()
+        if not _DOMAIN_RE.match(normalised) or ".." in normalised:
+            raise ValueError(f"Ungültige Domain: {domain!r}")
+        return self._base_path / "domains" / normalised / "corpus.jsonl"
+
+    def resolve(self, chunk_id: str, domain: Optional[str] = None) -> Optional[StoredChunk]:
+        """Liefert den Chunk zu ``chunk_id`` oder ``None``, falls er unbekannt ist."""
+
+        path = self.corpus_path(domain)
+        with self._lock:
+            offsets = self._load_offsets(path)
+            if offsets is None:
+                return None
+            key = (path, offsets.mtime_ns, chunk_id)
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                return cached
+            offset = offsets.offsets.get(chunk_id)
+            if offset is None:
+                return None
+            chunk = _read_chunk(path, offset)
+            if chunk is None:
+                return None
+            if self._cache_size > 0:
+                self._cache[key] = chunk
+                while len(self._cache) > self._cache_size:
+                    self._cache.popitem(last=False)
+            return chunk
+
+    def _load_offsets(self, path: Path) -> Optional[_CorpusOffsets]:
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            self._offsets.pop(path, None)
+            return None
+        current = self._offsets.get(path)
+        if current is not None and current.mtime_ns == stat.st_mtime_ns and current.size == stat.st_size:
+            return current
+
+        offsets: Dict[str, int] = {}
+        with path.open("rb") as handle:
+            position = handle.tell()
+            for line in handle:
+                if line.strip():
+                    try:
+                        item = json.loads(line)
+                    except json.JSONDecodeError:
+                        item = None
+                    if isinstance(item, dict) and "id" in item:
+                        offsets[str(item["id"])] = position
+                position += len(line)
+
+        current = _CorpusOffsets(path=path, mtime_ns=stat.st_mtime_ns, size=stat.st_size, offsets=offsets)
+        self._offsets[path] = current
+        return current
+
+
+def _read_chunk(path: Path, offset: int) -> Optional[StoredChunk]:
+    with path.open("rb") as handle:
+        handle.seek(offset)
+        line = handle.readline()
+    try:
+        item = json.loads(line)
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(item, dict):
+        return None
+    return StoredChunk(
+        chunk_id=str(item.get("id", "")),
+        text=str(item.get("text", "")),
+        metadata={key: item[key] for key in _METADATA_KEYS if key in item},
+    )
+
+
+__all__ = ["ChunkStore", "StoredChunk"]
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+"""Verdichtung älterer Gesprächsrunden, damit Prompts ein Token-Budget einhalten."""
+
+import re
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from .chat import ChatMessage, estimate_tokens
+
+SUMMARY_HEADER = "Zusammenfassung des bisherigen Gesprächs:\n"
+
+Summariser = Callable[[Optional[str], Sequence[ChatMessage], int], str]
+"""Erhält die bisherige Zusammenfassung, die zu verdichtenden Nachrichten und ein Token-Budget."""
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?…])\s+")
+_ROLE_LABELS = {"user": "Nutzer", "assistant": "Assistent"}
+
+
+@dataclass(frozen=True)
+class ExtractiveSummariser:
+    """Offline-Zusammenfassung: behält den ersten Satz jeder Nachricht.
+
+    Ältere Zeilen fallen zuerst heraus, wenn das Budget nicht reicht.
+    """
+
+    max_sentence_chars: int = 200
+
+    def __call__(self, previous: Optional[str], messages: Sequence[ChatMessage], budget: int) -> str:
+        lines: List[str] = previous.splitlines() if previous else []
+        for message in messages:
+            sentence = _first_sentence(message.content, self.max_sentence_chars)
+            if sentence:
+                label = _ROLE_LABELS.get(message.role, message.role)
+                lines.append(f"- {label}: {sentence}")
+        while len(lines) > 1 and estimate_tokens("\n".join(lines)) > budget:
+            del lines[0]
+        return "\n".join(lines)
+
+
+@dataclass(frozen=True)
+class HistoryCompactor:
+    """Hält den Verlauf unter ``token_budget``, indem alte Runden zusammengefasst werden.
+
+    Die Zusammenfassung steht als System-Nachricht am Anfang des Verlaufs und
+    ist selbst auf ``summary_budget`` Tokens begrenzt. Die jüngste
+    Frage-Antwort-Runde bleibt immer wörtlich erhalten.
+    """
+
+    token_budget: int
+    summary_budget: Optional[int] = None
+    summariser: Summariser = field(default_factory=ExtractiveSummariser)
+
+    def __post_init__(self) -> None:
+        if self.token_budget <= 0:
+            raise ValueError("token_budget muss größer als 0 sein.")
+        if self.summary_budget is not None and self.summary_budget <= 0:
+            raise ValueError("summary_budget muss größer als 0 sein.")
+
+    @property
+    def effective_summary_budget(self) -> int:
+        if self.summary_budget is not None:
+            return min(self.summary_budget, self.token_budget)
+        return max(1, self.token_budget // 4)
+
+    def compact(self, history: Sequence[ChatMessage], *, target: Optional[int] = None) -> List[ChatMessage]:
+        """Verdichtet ``history``, sobald das Budget überschritten ist.
+
+        ``target`` (Standard: ``token_budget``) legt fest, wie weit dann
+        verdichtet wird; ein kleinerer Wert sorgt dafür, dass der Verlauf
+        danach für mehrere Runden wieder unverändert wachsen kann.
+        """
+
+        summary, turns = split_summary(history)
+        if _history_tokens(summary, turns) <= self.token_budget:
+            return list(history)
+
+        limit = self.token_budget if target is None else min(target, self.token_budget)
+        folded: List[ChatMessage] = []
+        reserve = min(self.effective_summary_budget, limit)
+        while len(turns) > 2 and _history_tokens(None, turns) + reserve > limit:
+            folded.extend(turns[:2])
+            turns = turns[2:]
+
+        if folded:
+            budget = max(1, self.effective_summary_budget - estimate_tokens(SUMMARY_HEADER))
+            summary = self.summariser(summary, folded, budget)
+
+        # Reicht das Budget immer noch nicht, wird die Zusammenfassung geopfert.
+        if summary and _history_tokens(summary, turns) > self.token_budget:
+            summary = None
+
+        compacted: List[ChatMessage] = []
+        if summary:
+            compacted.append(ChatMessage("system", SUMMARY_HEADER + summary))
+        compacted.extend(turns)
+        return compacted
+
+
+def split_summary(history: Sequence[ChatMessage]) -> Tuple[Optional[str], List[ChatMessage]]:
+    """Trennt eine vorhandene Zusammenfassung vom wörtlichen Verlauf."""
+
+    if history and history[0].role == "system" and history[0].content.startswith(SUMMARY_HEADER):
+        return history[0].content[len(SUMMARY_HEADER):], list(history[1:])
+    return None, list(history)
+
+
+def _history_tokens(summary: Optional[str], turns: Sequence[ChatMessage]) -> int:
+    total = sum(estimate_tokens(message.content) for message in turns)
+    if summary:
+        total += estimate_tokens(SUMMARY_HEADER + summary)
+    return total
+
+
+def _first_sentence(text: str, limit: int) -> str:
+    condensed = " ".join(text.split())
+    if not condensed:
+        return ""
+    sentence = _SENTENCE_RE.split(condensed, maxsplit=1)[0]
+    if len(sentence) > limit:
+        return sentence[: limit - 1] + "…"
+    return sentence
+
+
+__all__ = [
+    "ExtractiveSummariser",
+    "HistoryCompactor",
+    "SUMMARY_HEADER",
+    "Summariser",
+    "split_summary",
+]
@@ -3,10 +3,18 @@ from __future__ import annotations
 import json
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, Iterable, List, Sequence
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
 
 from .chunker import Chunk, chunk_paragraphs, split_into_paragraphs
-from .loader import Document, load_documents
+from .loader import Document, DocumentCache, load_documents
+from .locking import atomic_output
+from .profiling import Profiler, profile_stage
+from .progress import ProgressReporter, progress_stage
+
+
+# Erhöhen, wenn sich Inhalt oder Format der erzeugten Datei bei gleichen Eingaben ändert;
+# das Build-Manifest erzwingt dann einen Neuaufbau.
+BUILDER_VERSION = 1
 
 
 @dataclass(frozen=True)
@@ -23,37 +31,73 @@ class BuildResult:
     chunks: int
     average_words: float
     output_path: Path
-
-
-def build_corpus(options: BuildOptions) -> BuildResult:
-    documents = load_documents(options.sources)
+    written: bool = True
+
+
+def build_corpus(
+    options: BuildOptions,
+    *,
+    profiler: Optional[Profiler] = None,
+    progress: Optional[ProgressReporter] = None,
+    cache: Optional[DocumentCache] = None,
+) -> BuildResult:
+    with profile_stage(profiler, "load"), progress_stage(progress, "load"):
+        documents = load_documents(options.sources, progress=progress, cache=cache)
     chunks: List[Dict[str, object]] = []
 
-    for document in documents:
-        paragraphs = split_into_paragraphs(document.text)
-        for index, chunk in enumerate(
-            chunk_paragraphs(paragraphs, max_words=options.max_words, overlap=options.overlap)
-        ):
-            chunks.append(
-                {
-                    "id": f"{document.path.stem}:{index:04d}",
-                    "source": document.source,
-                    "title": document.title,
-                    "chunk_index": index,
-                    "word_count": chunk.word_count,
-                    "text": _format_chunk_text(chunk),
-                }
-            )
-
-    _write_jsonl(options.output_path, chunks)
+    with profile_stage(profiler, "chunk"), progress_stage(progress, "chunk"):
+        for document in documents:
+            chunks.extend(chunk_records(document, max_words=options.max_words, overlap=options.overlap))
+            if progress is not None:
+                progress.count("chunks_created", len(chunks))
+        if progress is not None:
+            progress.count("chunks_created", len(chunks), final=True)
+
+    with profile_stage(profiler, "write"), progress_stage(progress, "write"):
+        _write_jsonl(options.output_path, chunks)
+        if progress is not None:
+            progress.count("chunks_written", len(chunks), final=True)
 
     total_words = sum(chunk["word_count"] for chunk in chunks)
-    average_words = total_words / len(chunks) if chunks else 0.0
+    return build_result(options, documents=len(documents), chunks=len(chunks), total_words=total_words)
+
+
+def chunk_records(document: Document, *, max_words: int, overlap: int) -> Iterator[Dict[str, object]]:
+    """Die Korpuseinträge eines Dokuments in der Form, in der sie im JSONL stehen."""
+
+    paragraphs = split_into_paragraphs(document.text)
+    for index, chunk in enumerate(chunk_paragraphs(paragraphs, max_words=max_words, overlap=overlap)):
+        yield {
+            "id": f"{document.path.stem}:{index:04d}",
+            "source": document.source,
+            "title": document.title,
+            "chunk_index": index,
+            "word_count": chunk.word_count,
+            "text": _format_chunk_text(chunk),
+        }
+
+
+def format_record(record: Dict[str, object]) -> str:
+    """Eine JSONL-Zeile des Korpus inklusive Zeilenumbruch."""
+
+    return json.dumps(record, ensure_ascii=False) + "\n"
+
+
+def build_result(
+    options: BuildOptions,
+    *,
+    documents: int,
+    chunks: int,
+    total_words: int,
+    written: bool = True,
+) -> BuildResult:
+    average_words = total_words / chunks if chunks else 0.0
     return BuildResult(
-        documents=len(documents),
-        chunks=len(chunks),
+        documents=documents,
+        chunks=chunks,
         average_words=round(average_words, 2),
         output_path=options.output_path,
+        written=written,
     )
 
 
@@ -62,9 +106,7 @@ def _format_chunk_text(chunk: Chunk) -> str:
 
 
 def _write_jsonl(path: Path, chunks: Iterable[Dict[str, object]]) -> None:
-    path.parent.mkdir(parents=True, exist_ok=True)
-    with path.open("w", encoding="utf-8") as handle:
+    with atomic_output(path) as handle:
         for item in chunks:
-            json.dump(item, handle, ensure_ascii=False)
-            handle.write("\n")
+            handle.write(format_record(item))
 
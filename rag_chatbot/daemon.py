@@ -0,0 +1,466 @@
+from __future__ import annotations
+
+"""Langlebiger Build-Daemon mit lokaler Job-Warteschlange über einen Unix-Socket."""
+
+import heapq
+import itertools
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import Dict, List, Mapping, Optional, Tuple
+
+from .loader import DEFAULT_CACHE_BYTES, DocumentCache
+from .pipeline import PipelineOptions, PipelineResult, run_pipeline
+from .progress import ProgressReporter
+
+PROTOCOL_VERSION = 1
+JOB_STATES = ("queued", "running", "done", "failed")
+DEFAULT_HISTORY = 200
+
+
+class DaemonError(RuntimeError):
+    """Der Daemon hat eine Anfrage abgelehnt oder nicht beantwortet."""
+
+
+@dataclass
+class BuildJob:
+    """Ein Aufbau-Auftrag; ``key`` ist der aufgelöste Indexpfad.
+
+    ``requests`` zählt, wie viele Anfragen in diesem Auftrag zusammengefasst
+    wurden, solange er noch wartete.
+    """
+
+    id: int
+    key: str
+    options: PipelineOptions
+    priority: int = 0
+    state: str = "queued"
+    requests: int = 1
+    submitted_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    build_seconds: Optional[float] = None
+    result: Optional[PipelineResult] = None
+    error: Optional[str] = None
+    finished: threading.Event = field(default_factory=threading.Event, repr=False, compare=False)
+
+    @property
+    def queue_seconds(self) -> Optional[float]:
+        if self.started_at is None:
+            return None
+        return round(self.started_at - self.submitted_at, 6)
+
+    def to_dict(self) -> Dict[str, object]:
+        payload: Dict[str, object] = {
+            "id": self.id,
+            "index": self.key,
+            "state": self.state,
+            "priority": self.priority,
+            "requests": self.requests,
+            "submitted_at": self.submitted_at,
+            "queue_seconds": self.queue_seconds,
+            "build_seconds": self.build_seconds,
+        }
+        if self.result is not None:
+            payload["result"] = self.result.to_dict()
+        if self.error is not None:
+            payload["error"] = self.error
+        return payload
+
+
+class BuildQueue:
+    """Prioritätswarteschlange mit höchstens einem wartenden Auftrag pro Index.
+
+    Höhere ``priority`` wird zuerst bearbeitet, bei Gleichstand in
+    Eingangsreihenfolge. Trifft eine Anfrage für einen Index ein, der bereits
+    wartet, wird sie in den wartenden Auftrag übernommen: Die neuen Optionen
+    gelten (``force`` bleibt gesetzt, falls eine der Anfragen es verlangt)
+    und die höhere Priorität zählt. Läuft der Index gerade, entsteht ein
+    neuer Auftrag, weil sich die Quellen seit dem Start geändert haben können.
+    """
+
+    def __init__(self, *, history: int = DEFAULT_HISTORY) -> None:
+        self._condition = threading.Condition()
+        self._heap: List[Tuple[int, int, int]] = []
+        self._waiting: Dict[str, BuildJob] = {}
+        self._jobs: "OrderedDict[int, BuildJob]" = OrderedDict()
+        self._ids = itertools.count(1)
+        self._sequence = itertools.count()
+        self._history = history
+        self._closed = False
+        self.deduplicated = 0
+
+    def submit(self, options: PipelineOptions, *, priority: int = 0) -> Tuple[BuildJob, bool]:
+        """Reiht ``options`` ein; liefert den Auftrag und ob er zusammengefasst wurde."""
+
+        key = str(options.index_path.resolve())
+        with self._condition:
+            if self._closed:
+                raise DaemonError("Der Daemon wird beendet und nimmt keine Aufträge mehr an.")
+            job = self._waiting.get(key)
+            if job is not None:
+                job.options = replace(options, force=options.force or job.options.force)
+                job.requests += 1
+                self.deduplicated += 1
+                if priority > job.priority:
+                    job.priority = priority
+                    heapq.heappush(self._heap, (-priority, next(self._sequence), job.id))
+                return job, True
+            job = BuildJob(id=next(self._ids), key=key, options=options, priority=priority)
+            self._jobs[job.id] = job
+            self._waiting[key] = job
+            heapq.heappush(self._heap, (-priority, next(self._sequence), job.id))
+            self._condition.notify()
+            return job, False
+
+    def next(self, timeout: Optional[float] = None) -> Optional[BuildJob]:
+        """Nächster Auftrag oder ``None`` nach ``timeout`` bzw. nach :meth:`close`."""
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while True:
+                while self._heap:
+                    _, _, job_id = heapq.heappop(self._heap)
+                    job = self._jobs.get(job_id)
+                    # Nach einer Prioritätserhöhung liegt der Auftrag doppelt im Heap.
+                    if job is None or job.state != "queued" or self._waiting.get(job.key) is not job:
+                        continue
+                    del self._waiting[job.key]
+                    job.state = "running"
+                    job.started_at = time.time()
+                    return job
+                if self._closed:
+                    return None
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._condition.wait(remaining)
+
+    def complete(
+        self,
+        job: BuildJob,
+        *,
+        result: Optional[PipelineResult] = None,
+        error: Optional[str] = None,
+    ) -> None:
+        with self._condition:
+            job.finished_at = time.time()
+            job.build_seconds = round(job.finished_at - (job.started_at or job.finished_at), 6)
+            job.result = result
+            job.error = error
+            job.state = "failed" if error is not None else "done"
+            self._trim()
+        job.finished.set()
+
+    def get(self, job_id: int) -> Optional[BuildJob]:
+        with self._condition:
+            return self._jobs.get(job_id)
+
+    def jobs(self) -> List[BuildJob]:
+        with self._condition:
+            return list(self._jobs.values())
+
+    def pending(self) -> int:
+        with self._condition:
+            return len(self._waiting)
+
+    def close(self) -> None:
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def _trim(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job.state in ("done", "failed")]
+        for job_id in finished[: max(0, len(finished) - self._history)]:
+            del self._jobs[job_id]
+
+
+class BuildDaemon:
+    """Bearbeitet Aufträge aus einer :class:`BuildQueue` in einem Build-Thread.
+
+    Der Prozess bleibt zwischen den Aufträgen bestehen; Module, kompilierte
+    Tokenizer-Ausdrücke und ein :class:`DocumentCache` mit bereits geparsten
+    Quellen bleiben dadurch warm. Aufträge werden nacheinander gebaut; der
+    :class:`~rag_chatbot.locking.BuildLock` des Index gilt weiterhin, sodass
+    gleichzeitige CLI-Aufrufe sauber zusammengefasst werden. ``events``
+    erhält ``job_queued``, ``job_start`` und ``job_end``. ``cache_bytes``
+    begrenzt den Dokument-Cache (siehe :class:`DocumentCache`).
+    """
+
+    def __init__(
+        self,
+        *,
+        history: int = DEFAULT_HISTORY,
+        events: Optional[ProgressReporter] = None,
+        cache_bytes: Optional[int] = DEFAULT_CACHE_BYTES,
+    ) -> None:
+        self.queue = BuildQueue(history=history)
+        self.cache = DocumentCache(max_bytes=cache_bytes)
+        self.events = events
+        self.started_at = time.time()
+        self.completed = 0
+        self.failed = 0
+        self._thread: Optional[threading.Thread] = None
+        self._events_lock = threading.Lock()
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._work, name="rag-build-worker", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Nimmt keine Aufträge mehr an, arbeitet die Warteschlange ab und beendet den Thread."""
+
+        self.queue.close()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def submit(self, options: PipelineOptions, *, priority: int = 0) -> Tuple[BuildJob, bool]:
+        job, merged = self.queue.submit(options, priority=priority)
+        self._emit("job_queued", job=job.id, index=job.key, priority=job.priority, merged=merged)
+        return job, merged
+
+    def status(self) -> Dict[str, object]:
+        jobs = self.queue.jobs()
+        return {
+            "pid": os.getpid(),
+            "uptime": round(time.time() - self.started_at, 3),
+            "queued": sum(1 for job in jobs if job.state == "queued"),
+            "running": [job.id for job in jobs if job.state == "running"],
+            "completed": self.completed,
+            "failed": self.failed,
+            "deduplicated": self.queue.deduplicated,
+            "cached_documents": len(self.cache),
+            "cached_bytes": self.cache.bytes,
+            "cache_evictions": self.cache.evictions,
+            "cache_hits": self.cache.hits,
+            "cache_misses": self.cache.misses,
+        }
+
+    def _work(self) -> None:
+        while True:
+            job = self.queue.next()
+            if job is None:
+                return
+            self._emit("job_start", job=job.id, index=job.key, queue_seconds=job.queue_seconds)
+            try:
+                result = run_pipeline(job.options, cache=self.cache)
+            except Exception as exc:  # noqa: BLE001 - ein fehlerhafter Auftrag darf den Daemon nicht beenden
+                self.failed += 1
+                self.queue.complete(job, error=f"{type(exc).__name__}: {exc}")
+            else:
+                self.completed += 1
+                self.queue.complete(job, result=result)
+            self.cache.discard_missing()
+            self._emit(
+                "job_end",
+                job=job.id,
+                index=job.key,
+                state=job.state,
+                build_seconds=job.build_seconds,
+                error=job.error,
+            )
+
+    def _emit(self, event: str, **fields: object) -> None:
+        if self.events is None:
+            return
+        with self._events_lock:
+            self.events.emit(event, **fields)
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    server: "BuildServer"
+
+    def handle(self) -> None:
+        line = self.rfile.readline()
+        if not line:
+            return
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("Anfrage muss ein JSON-Objekt sein.")
+            response = self.server.dispatch(request)
+        except (ValueError, KeyError, TypeError, DaemonError) as exc:
+            response = {"ok": False, "error": str(exc)}
+        self.wfile.write(json.dumps(response, ensure_ascii=False).encode("utf-8") + b"\n")
+
+
+class BuildServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Unix-Socket-Server vor einem :class:`BuildDaemon`.
+
+    Jede Verbindung sendet genau eine JSON-Zeile mit ``op`` und erhält eine
+    JSON-Zeile zurück:
+
+    * ``submit`` mit ``options`` (siehe :meth:`PipelineOptions.to_dict`),
+      optional ``priority``, ``wait`` und ``timeout``;
+    * ``status`` mit optionaler ``job``-ID;
+    * ``ping`` und ``shutdown``.
+
+    Quellen und Ausgabepfade eines Auftrags müssen unterhalb von ``root``
+    liegen, sonst wird er abgelehnt. Der Socket ist nur für den eigenen
+    Benutzer les- und schreibbar (``0600``).
+    """
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: Path, daemon: BuildDaemon, *, root: Path) -> None:
+        self.socket_path = socket_path
+        self.build_daemon = daemon
+        self.root = root.resolve()
+        _remove_stale_socket(socket_path)
+        socket_path.parent.mkdir(parents=True, exist_ok=True)
+        super().__init__(str(socket_path), _RequestHandler)
+
+    def server_bind(self) -> None:
+        super().server_bind()
+        os.chmod(self.socket_path, 0o600)
+
+    def serve(self) -> None:
+        """Startet den Build-Thread und bedient Anfragen bis :meth:`shutdown`."""
+
+        self.build_daemon.start()
+        try:
+            self.serve_forever()
+        finally:
+            self.build_daemon.stop()
+            self.server_close()
+
+    def server_close(self) -> None:
+        super().server_close()
+        try:
+            self.socket_path.unlink()
+        except FileNotFoundError:
+            pass
+
+    def dispatch(self, request: Mapping[str, object]) -> Dict[str, object]:
+        op = request.get("op")
+        daemon = self.build_daemon
+        if op == "ping":
+            return {"ok": True, "protocol": PROTOCOL_VERSION, "pid": os.getpid()}
+        if op == "status":
+            job_id = request.get("job")
+            if job_id is None:
+                return {"ok": True, "daemon": daemon.status(), "jobs": [job.to_dict() for job in daemon.queue.jobs()]}
+            job = daemon.queue.get(int(job_id))  # type: ignore[arg-type]
+            if job is None:
+                raise ValueError(f"Unbekannter Auftrag {job_id}.")
+            return {"ok": True, "job": job.to_dict()}
+        if op == "submit":
+            options = request.get("options")
+            if not isinstance(options, Mapping):
+                raise ValueError("submit erwartet options als Objekt.")
+            job, merged = daemon.submit(
+                self._check_paths(PipelineOptions.from_dict(options)),
+                priority=int(request.get("priority", 0)),  # type: ignore[arg-type]
+            )
+            if request.get("wait"):
+                timeout = request.get("timeout")
+                job.finished.wait(None if timeout is None else float(timeout))  # type: ignore[arg-type]
+            return {"ok": True, "merged": merged, "job": job.to_dict()}
+        if op == "shutdown":
+            threading.Thread(target=self.shutdown, name="rag-build-shutdown", daemon=True).start()
+            return {"ok": True}
+        raise ValueError(f"Unbekannte Operation {op!r}.")
+
+    def _check_paths(self, options: PipelineOptions) -> PipelineOptions:
+        for path in (*options.sources, options.corpus_path, options.index_path):
+            if not Path(path).resolve().is_relative_to(self.root):
+                raise ValueError(f"Pfad {path} liegt außerhalb von {self.root}.")
+        return options
+
+
+class BuildClient:
+    """Schlanker Client für :class:`BuildServer`.
+
+    Verbindungsfehler werden als :class:`OSError` weitergereicht, damit
+    Aufrufer auf einen lokalen Aufbau ausweichen können.
+    """
+
+    def __init__(self, socket_path: Path, *, timeout: Optional[float] = None) -> None:
+        self.socket_path = socket_path
+        self.timeout = timeout
+
+    def request(self, payload: Mapping[str, object]) -> Dict[str, object]:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+            connection.settimeout(self.timeout)
+            connection.connect(str(self.socket_path))
+            connection.sendall(json.dumps(payload, ensure_ascii=False).encode("utf-8") + b"\n")
+            with connection.makefile("rb") as reader:
+                line = reader.readline()
+        if not line:
+            raise DaemonError("Der Daemon hat die Verbindung ohne Antwort geschlossen.")
+        response = json.loads(line)
+        if not response.get("ok"):
+            raise DaemonError(str(response.get("error", "Unbekannter Fehler.")))
+        return response
+
+    def ping(self) -> Dict[str, object]:
+        return self.request({"op": "ping"})
+
+    def submit(
+        self,
+        options: PipelineOptions,
+        *,
+        priority: int = 0,
+        wait: bool = True,
+        timeout: Optional[float] = None,
+    ) -> Dict[str, object]:
+        """Reicht einen Auftrag ein; Pfade werden absolut übergeben."""
+
+        absolute = replace(
+            options,
+            sources=[Path(path).absolute() for path in options.sources],
+            corpus_path=options.corpus_path.absolute(),
+            index_path=options.index_path.absolute(),
+        )
+        payload: Dict[str, object] = {
+            "op": "submit",
+            "options": absolute.to_dict(),
+            "priority": priority,
+            "wait": wait,
+        }
+        if timeout is not None:
+            payload["timeout"] = timeout
+        return self.request(payload)
+
+    def status(self, job_id: Optional[int] = None) -> Dict[str, object]:
+        payload: Dict[str, object] = {"op": "status"}
+        if job_id is not None:
+            payload["job"] = job_id
+        return self.request(payload)
+
+    def shutdown(self) -> None:
+        self.request({"op": "shutdown"})
+
+
+def _remove_stale_socket(path: Path) -> None:
+    if not path.exists():
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(str(path))
+    except OSError:
+        path.unlink()
+    else:
+        raise DaemonError(f"Unter {path} läuft bereits ein Build-Daemon.")
+    finally:
+        probe.close()
+
+
+__all__ = [
+    "BuildClient",
+    "BuildDaemon",
+    "BuildJob",
+    "BuildQueue",
+    "BuildServer",
+    "DaemonError",
+    "JOB_STATES",
+    "PROTOCOL_VERSION",
+]
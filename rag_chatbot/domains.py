@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+"""Stapelaufbau aller Domain-Indizes in einem Prozess mit Worker-Pool."""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence
+
+from .loader import iter_source_files
+from .pipeline import PipelineOptions, PipelineResult, pipeline_is_stale, run_pipeline
+from .progress import ProgressReporter
+
+UPLOADS_DIRECTORY = "uploads"
+CORPUS_FILENAME = "corpus.jsonl"
+INDEX_FILENAME = "index.json"
+
+DOMAIN_STATUSES = ("built", "up_to_date", "coalesced", "skipped", "failed")
+
+
+@dataclass(frozen=True)
+class DomainTarget:
+    """Ein Domain-Verzeichnis nach dem Layout von ``DomainDocumentStorage``.
+
+    ``<root>/<domain>/uploads`` enthält die Quellen, daneben liegen
+    ``corpus.jsonl`` und ``index.json``.
+    """
+
+    name: str
+    directory: Path
+
+    @property
+    def uploads(self) -> Path:
+        return self.directory / UPLOADS_DIRECTORY
+
+    @property
+    def corpus_path(self) -> Path:
+        return self.directory / CORPUS_FILENAME
+
+    @property
+    def index_path(self) -> Path:
+        return self.directory / INDEX_FILENAME
+
+    def pipeline_options(self, template: PipelineOptions) -> PipelineOptions:
+        return replace(
+            template,
+            sources=[self.uploads],
+            corpus_path=self.corpus_path,
+            index_path=self.index_path,
+        )
+
+
+@dataclass(frozen=True)
+class DomainResult:
+    """Ergebnis für eine Domain; ``status`` ist einer von :data:`DOMAIN_STATUSES`."""
+
+    domain: str
+    status: str
+    seconds: float
+    result: Optional[PipelineResult] = None
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, object]:
+        payload: Dict[str, object] = {
+            "domain": self.domain,
+            "status": self.status,
+            "seconds": self.seconds,
+        }
+        if self.result is not None:
+            payload["result"] = self.result.to_dict()
+        if self.error is not None:
+            payload["error"] = self.error
+        return payload
+
+
+def discover_domains(root: Path) -> List[DomainTarget]:
+    """Alle Unterverzeichnisse von ``root`` mit einem ``uploads``-Ordner, nach Namen sortiert."""
+
+    if not root.is_dir():
+        raise FileNotFoundError(root)
+    return [
+        DomainTarget(name=entry.name, directory=entry)
+        for entry in sorted(root.iterdir(), key=lambda item: item.name)
+        if entry.is_dir() and (entry / UPLOADS_DIRECTORY).is_dir()
+    ]
+
+
+def rebuild_domains(
+    targets: Sequence[DomainTarget],
+    template: PipelineOptions,
+    *,
+    workers: Optional[int] = None,
+    progress: Optional[ProgressReporter] = None,
+) -> List[DomainResult]:
+    """Baut veraltete Domains neu; das Ergebnis folgt der Reihenfolge von ``targets``.
+
+    Ob eine Domain veraltet ist, wird vorab im aufrufenden Prozess geprüft
+    (nur ``stat``); nur diese Domains gehen an den Pool. Domains ohne
+    unterstützte Dateien werden übersprungen und behalten ihren Index:
+    ``DomainIndexManager::rebuild`` leert ihn erst, wenn auch keine
+    Wiki-Artikel ausgewählt sind, und diese Auswahl ist hier nicht bekannt.
+    ``template`` liefert Chunk- und Vokabular-Einstellungen sowie
+    ``force``; Quellen und Ausgabepfade werden je Domain gesetzt.
+    """
+
+    if workers is not None and workers <= 0:
+        raise ValueError("workers muss größer als 0 sein.")
+
+    results: Dict[str, DomainResult] = {}
+    stale: List[DomainTarget] = []
+    for target in targets:
+        try:
+            if not _has_sources(target):
+                results[target.name] = DomainResult(domain=target.name, status="skipped", seconds=0.0)
+            elif pipeline_is_stale(target.pipeline_options(template)):
+                stale.append(target)
+            else:
+                results[target.name] = DomainResult(domain=target.name, status="up_to_date", seconds=0.0)
+        except OSError as exc:
+            results[target.name] = DomainResult(domain=target.name, status="failed", seconds=0.0, error=str(exc))
+        if progress is not None and target.name in results:
+            progress.emit("domain_end", **results[target.name].to_dict())
+
+    workers = min(workers or os.cpu_count() or 1, max(1, len(stale)))
+    for result in _run_stale(stale, template, workers=workers, progress=progress):
+        results[result.domain] = result
+        if progress is not None:
+            progress.emit("domain_end", **result.to_dict())
+
+    return [results[target.name] for target in targets]
+
+
+def _run_stale(
+    stale: Sequence[DomainTarget],
+    template: PipelineOptions,
+    *,
+    workers: int,
+    progress: Optional[ProgressReporter],
+) -> Iterator[DomainResult]:
+    if progress is not None:
+        for target in stale:
+            progress.emit("domain_queued", domain=target.name)
+    if workers == 1 or len(stale) <= 1:
+        for target in stale:
+            yield _build_domain(target, template)
+        return
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_build_domain, target, template) for target in stale]
+        for target, future in zip(stale, futures):
+            try:
+                yield future.result()
+            except Exception as exc:
+                # z. B. BrokenProcessPool: nur diese Domain scheitert, der Stapel läuft weiter.
+                yield DomainResult(
+                    domain=target.name,
+                    status="failed",
+                    seconds=round(time.perf_counter() - started, 4),
+                    error=str(exc) or type(exc).__name__,
+                )
+
+
+def _build_domain(target: DomainTarget, template: PipelineOptions) -> DomainResult:
+    started = time.perf_counter()
+    try:
+        result = run_pipeline(target.pipeline_options(template))
+    except (OSError, ValueError) as exc:
+        return DomainResult(
+            domain=target.name,
+            status="failed",
+            seconds=round(time.perf_counter() - started, 4),
+            error=str(exc),
+        )
+    status = "coalesced" if result.coalesced else "built"
+    return DomainResult(
+        domain=target.name,
+        status=status,
+        seconds=round(time.perf_counter() - started, 4),
+        result=result,
+    )
+
+
+def _has_sources(target: DomainTarget) -> bool:
+    return next(iter_source_files([target.uploads]), None) is not None
+
+
+__all__ = [
+    "DOMAIN_STATUSES",
+    "DomainResult",
+    "DomainTarget",
+    "discover_domains",
+    "rebuild_domains",
+]
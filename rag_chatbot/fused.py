@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+"""Wissensbasis und Index in einem Durchlauf, ohne das JSONL erneut einzulesen."""
+
+from contextlib import nullcontext
+from typing import ContextManager, Dict, IO, List, Optional, Tuple
+
+from .corpus_builder import BuildOptions, BuildResult, build_result, chunk_records, format_record
+from .index_builder import IndexOptions, IndexResult, TokenisedChunk, index_tokenised, tokenise_chunk
+from .loader import DocumentCache, iter_documents
+from .locking import atomic_output
+from .profiling import Profiler, profile_stage
+from .progress import ProgressReporter, progress_stage
+
+
+def build_fused(
+    corpus_options: BuildOptions,
+    index_options: IndexOptions,
+    *,
+    write_corpus: bool = True,
+    profiler: Optional[Profiler] = None,
+    progress: Optional[ProgressReporter] = None,
+    cache: Optional[DocumentCache] = None,
+) -> Tuple[BuildResult, IndexResult]:
+    """Erzeugt Wissensbasis und Index wie :func:`build_corpus` gefolgt von :func:`build_index`.
+
+    Dokumente werden einzeln geparst und gechunkt; jeder Eintrag wird
+    sofort tokenisiert und – mit ``write_corpus`` – als JSONL-Zeile
+    geschrieben. Das erneute Lesen und Parsen des Korpus entfällt, und die
+    Dokumenttexte müssen nicht alle gleichzeitig im Speicher liegen. Beide
+    Dateien sind byte-identisch zum getrennten Aufbau. Ohne
+    ``write_corpus`` bleibt ``corpus_options.output_path`` unangetastet.
+    """
+
+    chunks: List[Dict[str, object]] = []
+    tokenised: List[TokenisedChunk] = []
+    documents = 0
+    total_words = 0
+
+    writer: ContextManager[Optional[IO[str]]] = (
+        atomic_output(corpus_options.output_path) if write_corpus else nullcontext(None)
+    )
+    with profile_stage(profiler, "stream"), progress_stage(progress, "stream"):
+        with writer as handle:
+            for document in iter_documents(corpus_options.sources, progress=progress, cache=cache):
+                documents += 1
+                for record in chunk_records(
+                    document, max_words=corpus_options.max_words, overlap=corpus_options.overlap
+                ):
+                    if handle is not None:
+                        handle.write(format_record(record))
+                    chunks.append(record)
+                    tokenised.append(tokenise_chunk(record))
+                    total_words += record["word_count"]  # type: ignore[operator]
+                if progress is not None:
+                    progress.count("chunks_created", len(chunks))
+        if progress is not None:
+            progress.count("chunks_created", len(chunks), final=True)
+            if write_corpus:
+                progress.count("chunks_written", len(chunks), final=True)
+
+    corpus_result = build_result(
+        corpus_options,
+        documents=documents,
+        chunks=len(chunks),
+        total_words=total_words,
+        written=write_corpus,
+    )
+    index_result = index_tokenised(chunks, tokenised, index_options, profiler=profiler, progress=progress)
+    return corpus_result, index_result
+
+
+__all__ = ["build_fused"]
@@ -6,18 +6,39 @@ import re
 from collections import Counter
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional, Sequence
+from typing import IO, Dict, Iterable, List, Optional, Sequence, Tuple
 
+from .locking import atomic_output
+from .profiling import Profiler, profile_stage
+from .progress import ProgressReporter, progress_stage
 
 TOKEN_RE = re.compile(r"\b\w+\b", re.UNICODE)
 
+# Kleingeschriebene Tokens mit Start- und End-Offset im Originaltext. Das Ende
+# wird mitgeführt, weil ``lower()`` die Länge ändern kann (z. B. „İ“).
+TokenisedChunk = Tuple[List[str], List[int], List[int]]
+
+
+# Erhöhen, wenn sich Inhalt oder Format der erzeugten Datei bei gleichen Eingaben ändert;
+# das Build-Manifest erzwingt dann einen Neuaufbau.
+BUILDER_VERSION = 2
+
 
 @dataclass(frozen=True)
 class IndexOptions:
+    """Einstellungen für :func:`build_index`.
+
+    ``term_offsets`` speichert je Chunk die Fundstellen aller Terme
+    (``spans``) für die Snippet-Auswahl in Python. Der Index wird dadurch
+    etwa um die Hälfte größer; ``SemanticIndex.php`` nutzt das Feld nicht,
+    daher ist es standardmäßig aus.
+    """
+
     corpus_path: Path
     output_path: Path
     max_features: Optional[int] = None
     min_term_length: int = 2
+    term_offsets: bool = False
 
 
 @dataclass(frozen=True)
@@ -27,31 +48,71 @@ class IndexResult:
     output_path: Path
 
 
-def build_index(options: IndexOptions) -> IndexResult:
-    chunks = list(_load_corpus(options.corpus_path))
+def build_index(
+    options: IndexOptions,
+    *,
+    profiler: Optional[Profiler] = None,
+    progress: Optional[ProgressReporter] = None,
+) -> IndexResult:
+    with profile_stage(profiler, "read"), progress_stage(progress, "read"):
+        chunks = list(_load_corpus(options.corpus_path))
+        if progress is not None:
+            progress.count("chunks_read", len(chunks), final=True)
     if not chunks:
         raise ValueError("Das Korpus ist leer – bitte zuerst die Wissensbasis erzeugen.")
 
-    tokenised_texts = [_tokenise(chunk["text"]) for chunk in chunks]
-    vocabulary = _build_vocabulary(
-        tokenised_texts,
-        max_features=options.max_features,
-        min_term_length=options.min_term_length,
-    )
+    with profile_stage(profiler, "tokenise"), progress_stage(progress, "tokenise"):
+        tokenised = [tokenise_chunk(chunk) for chunk in chunks]
+    return index_tokenised(chunks, tokenised, options, profiler=profiler, progress=progress)
+
+
+def tokenise_chunk(chunk: Dict[str, object]) -> TokenisedChunk:
+    """Tokens eines Korpuseintrags samt Zeichen-Offsets, wie sie :func:`index_tokenised` erwartet."""
+
+    return _tokenise_with_offsets(str(chunk["text"]))
+
+
+def index_tokenised(
+    chunks: Sequence[Dict[str, object]],
+    tokenised: Sequence[TokenisedChunk],
+    options: IndexOptions,
+    *,
+    profiler: Optional[Profiler] = None,
+    progress: Optional[ProgressReporter] = None,
+) -> IndexResult:
+    """Baut Vokabular und Vektoren aus bereits tokenisierten Chunks und schreibt den Index.
+
+    ``options.corpus_path`` wird dabei nicht gelesen.
+    """
+
+    if not chunks:
+        raise ValueError("Das Korpus ist leer – bitte zuerst die Wissensbasis erzeugen.")
+    tokenised_texts = [tokens for tokens, _, _ in tokenised]
+    with profile_stage(profiler, "vocabulary"), progress_stage(progress, "vocabulary"):
+        vocabulary = _build_vocabulary(
+            tokenised_texts,
+            max_features=options.max_features,
+            min_term_length=options.min_term_length,
+        )
+        if progress is not None:
+            progress.count("terms_selected", len(vocabulary), final=True)
     if not vocabulary:
         raise ValueError("Es konnten keine Terme für den Index extrahiert werden.")
 
-    idf = _compute_idf(tokenised_texts, vocabulary)
-    indexed_chunks = _vectorise_chunks(chunks, tokenised_texts, vocabulary, idf)
-
-    payload = {
-        "vocabulary": vocabulary,
-        "idf": idf,
-        "chunks": indexed_chunks,
-    }
+    with profile_stage(profiler, "vectorise"), progress_stage(progress, "vectorise"):
+        idf = _compute_idf(tokenised_texts, vocabulary)
+        indexed_chunks = _vectorise_chunks(chunks, tokenised_texts, vocabulary, idf)
+        if options.term_offsets:
+            _attach_term_offsets(indexed_chunks, tokenised, vocabulary)
+        if progress is not None:
+            postings = sum(len(chunk["vector"]) for chunk in indexed_chunks)  # type: ignore[arg-type]
+            progress.count("postings_built", postings, final=True)
 
-    options.output_path.parent.mkdir(parents=True, exist_ok=True)
-    options.output_path.write_text(json.dumps(payload), encoding="utf-8")
+    with profile_stage(profiler, "write"), progress_stage(progress, "write"):
+        with atomic_output(options.output_path) as handle:
+            _write_payload(handle, vocabulary, idf, indexed_chunks)
+        if progress is not None:
+            progress.count("bytes_written", options.output_path.stat().st_size, final=True)
 
     return IndexResult(
         chunks=len(indexed_chunks),
@@ -60,6 +121,30 @@ def build_index(options: IndexOptions) -> IndexResult:
     )
 
 
+def _write_payload(
+    handle: IO[str],
+    vocabulary: Sequence[str],
+    idf: Sequence[float],
+    chunks: Sequence[Dict[str, object]],
+) -> None:
+    """Schreibt ``{"vocabulary": …, "idf": …, "chunks": […]}`` Chunk für Chunk.
+
+    Das Ergebnis ist byte-identisch zu ``json.dumps`` über das ganze
+    Dictionary, ohne den kompletten Index als einen String aufzubauen.
+    """
+
+    handle.write('{"vocabulary": ')
+    handle.write(json.dumps(vocabulary))
+    handle.write(', "idf": ')
+    handle.write(json.dumps(idf))
+    handle.write(', "chunks": [')
+    for position, chunk in enumerate(chunks):
+        if position:
+            handle.write(", ")
+        handle.write(json.dumps(chunk))
+    handle.write("]}")
+
+
 def _load_corpus(path: Path) -> Iterable[Dict[str, object]]:
     if not path.exists():
         raise FileNotFoundError(path)
@@ -76,6 +161,17 @@ def _tokenise(text: str) -> List[str]:
     return tokens
 
 
+def _tokenise_with_offsets(text: str) -> TokenisedChunk:
+    tokens: List[str] = []
+    starts: List[int] = []
+    ends: List[int] = []
+    for match in TOKEN_RE.finditer(text):
+        tokens.append(match.group().lower())
+        starts.append(match.start())
+        ends.append(match.end())
+    return tokens, starts, ends
+
+
 def _build_vocabulary(
     tokenised_texts: Sequence[Sequence[str]],
     *,
@@ -101,8 +197,9 @@ def _build_vocabulary(
 
 def _compute_idf(tokenised_texts: Sequence[Sequence[str]], vocabulary: Sequence[str]) -> List[float]:
     doc_freq: Counter[str] = Counter()
+    terms = set(vocabulary)
     for tokens in tokenised_texts:
-        unique_tokens = {token for token in tokens if token in vocabulary}
+        unique_tokens = terms.intersection(tokens)
         doc_freq.update(unique_tokens)
 
     total_docs = len(tokenised_texts)
@@ -153,3 +250,22 @@ def _vectorise_chunks(
 
     return indexed_chunks
 
+
+def _attach_term_offsets(
+    indexed_chunks: Sequence[Dict[str, object]],
+    tokenised: Sequence[TokenisedChunk],
+    vocabulary: Sequence[str],
+) -> None:
+    """Speichert je Chunk die Fundstellen jedes Index-Terms als ``[term, start, end, ...]``.
+
+    Damit lassen sich Trefferstellen zur Laufzeit ohne erneutes Tokenisieren finden.
+    """
+
+    vocab_index = {term: index for index, term in enumerate(vocabulary)}
+    for chunk, (tokens, starts, ends) in zip(indexed_chunks, tokenised, strict=True):
+        positions: Dict[int, List[int]] = {}
+        for token, start, end in zip(tokens, starts, ends):
+            index = vocab_index.get(token)
+            if index is not None:
+                positions.setdefault(index, []).extend((start, end))
+        chunk["spans"] = [[index, *spans] for index, spans in sorted(positions.items())]
@@ -1,13 +1,19 @@
 from __future__ import annotations
 
 import re
+from collections import OrderedDict
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .progress import ProgressReporter
 
 
 SUPPORTED_EXTENSIONS: Sequence[str] = (".md", ".markdown", ".html", ".htm", ".txt")
 
+DEFAULT_CACHE_BYTES = 256 * 1024 * 1024
+
 
 @dataclass(frozen=True)
 class Document:
@@ -103,12 +109,100 @@ def iter_source_files(
                     yield file
 
 
-def load_documents(paths: Iterable[Path]) -> List[Document]:
-    documents: List[Document] = []
-    for path in iter_source_files(paths):
+class DocumentCache:
+    """Hält geparste Dokumente im Speicher, solange Größe und ``mtime`` der Datei gleich bleiben.
+
+    Gedacht für langlebige Prozesse wie den Build-Daemon, die dieselben
+    Quellen wiederholt einlesen. Die Summe der Dateigrößen ist auf
+    ``max_bytes`` begrenzt; darüber werden die am längsten nicht genutzten
+    Einträge verworfen (``None`` hebt die Grenze auf). Nicht threadsicher.
+    """
+
+    def __init__(self, max_bytes: Optional[int] = DEFAULT_CACHE_BYTES) -> None:
+        if max_bytes is not None and max_bytes < 0:
+            raise ValueError("max_bytes darf nicht negativ sein.")
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Path, Tuple[int, int, Document]]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def bytes(self) -> int:
+        """Summe der Dateigrößen aller zwischengespeicherten Dokumente."""
+
+        return self._bytes
+
+    def parse(self, path: Path) -> Document:
+        stat = path.stat()
+        entry = self._entries.get(path)
+        if entry is not None and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+            self.hits += 1
+            self._entries.move_to_end(path)
+            return entry[2]
+        self.misses += 1
+        document = parse_document(path)
+        self._drop(path)
+        if self.max_bytes is None or stat.st_size <= self.max_bytes:
+            self._entries[path] = (stat.st_size, stat.st_mtime_ns, document)
+            self._bytes += stat.st_size
+            self._evict()
+        return document
+
+    def discard_missing(self) -> int:
+        """Entfernt Einträge gelöschter Dateien und liefert deren Anzahl."""
+
+        missing = [path for path in self._entries if not path.exists()]
+        for path in missing:
+            self._drop(path)
+        return len(missing)
+
+    def _drop(self, path: Path) -> None:
+        entry = self._entries.pop(path, None)
+        if entry is not None:
+            self._bytes -= entry[0]
+
+    def _evict(self) -> None:
+        while self.max_bytes is not None and self._bytes > self.max_bytes:
+            _, (size, _, _) = self._entries.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+
+
+def iter_documents(
+    paths: Iterable[Path],
+    *,
+    progress: Optional["ProgressReporter"] = None,
+    cache: Optional[DocumentCache] = None,
+) -> Iterator[Document]:
+    """Parst die Quelldateien nacheinander; nicht als UTF-8 lesbare Dateien werden übersprungen."""
+
+    parse = parse_document if cache is None else cache.parse
+    if progress is None:
+        files: Iterable[Path] = iter_source_files(paths)
+    else:
+        files = list(iter_source_files(paths))
+        progress.count("files_scanned", len(files), final=True)
+    for position, path in enumerate(files, start=1):
         try:
-            documents.append(parse_document(path))
+            document = parse(path)
         except UnicodeDecodeError:
             continue
-    return documents
+        finally:
+            if progress is not None:
+                progress.count("files_parsed", position, total=len(files), final=position == len(files))
+        yield document
+
+
+def load_documents(
+    paths: Iterable[Path],
+    *,
+    progress: Optional["ProgressReporter"] = None,
+    cache: Optional[DocumentCache] = None,
+) -> List[Document]:
+    return list(iter_documents(paths, progress=progress, cache=cache))
 
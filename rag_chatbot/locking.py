@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+"""Build-Lock mit Zusammenfassung paralleler Anfragen und atomares Schreiben von Ausgaben."""
+
+import os
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Iterator, Optional
+
+try:  # pragma: no cover - unter Windows nicht verfügbar
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None  # type: ignore[assignment]
+
+
+class BuildLock:
+    """Beratende Sperre für den Aufbau von ``path`` mit Vormerkung weiterer Anfragen.
+
+    Neben ``<path>.lock`` (per ``flock`` gesperrt) gibt es die Markierung
+    ``<path>.pending``. Jede Anfrage setzt zuerst die Markierung und versucht
+    dann, die Sperre zu bekommen. Wer sie hält, baut so lange neu, wie die
+    Markierung nach einem Durchlauf wieder gesetzt ist – beliebig viele
+    Anfragen während eines Aufbaus führen so zu genau einem weiteren
+    Durchlauf. Ohne ``fcntl`` (Windows) wird nicht gesperrt.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.lock_path = path.with_name(path.name + ".lock")
+        self.pending_path = path.with_name(path.name + ".pending")
+        self._handle: Optional[IO[str]] = None
+
+    @property
+    def held(self) -> bool:
+        return self._handle is not None
+
+    def request(self) -> bool:
+        """Merkt einen Aufbau vor; ``True``, wenn der Aufrufer ihn selbst ausführen soll."""
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.pending_path.touch()
+        return self._acquire()
+
+    def take_pending(self) -> bool:
+        """Entfernt die Vormerkung; ``True``, wenn ein (weiterer) Durchlauf fällig ist."""
+
+        try:
+            self.pending_path.unlink()
+        except FileNotFoundError:
+            return False
+        return True
+
+    def release(self) -> bool:
+        """Gibt die Sperre frei.
+
+        Wurde zwischen der letzten Prüfung und der Freigabe noch etwas
+        vorgemerkt und ist die Sperre weiterhin frei, wird sie erneut
+        übernommen und ``True`` zurückgegeben.
+        """
+
+        self._release()
+        if self.pending_path.exists():
+            return self._acquire()
+        return False
+
+    def close(self) -> None:
+        self._release()
+
+    def _acquire(self) -> bool:
+        if self._handle is not None:
+            return True
+        handle = self.lock_path.open("a+", encoding="utf-8")
+        if fcntl is not None:
+            try:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                handle.close()
+                return False
+        handle.seek(0)
+        handle.truncate()
+        handle.write(f"{os.getpid()}\n")
+        handle.flush()
+        self._handle = handle
+        return True
+
+    def _release(self) -> None:
+        handle, self._handle = self._handle, None
+        if handle is None:
+            return
+        if fcntl is not None:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+        handle.close()
+
+
+@contextmanager
+def atomic_output(path: Path, *, encoding: str = "utf-8") -> Iterator[IO[str]]:
+    """Schreibt in eine temporäre Datei neben ``path`` und ersetzt ``path`` erst am Ende.
+
+    Leser sehen so entweder die alte oder die vollständige neue Datei. Bei
+    einem Fehler bleibt ``path`` unverändert und die temporäre Datei wird
+    entfernt.
+    """
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    descriptor, temporary = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(descriptor, "w", encoding=encoding) as handle:
+            # mkstemp legt 0600 an; die Rechte der bisherigen Datei (bzw. 0644) übernehmen.
+            os.chmod(temporary, path.stat().st_mode & 0o777 if path.exists() else 0o644)
+            yield handle
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(temporary, path)
+    except BaseException:
+        try:
+            os.unlink(temporary)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+__all__ = ["BuildLock", "atomic_output"]
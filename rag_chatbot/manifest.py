@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+"""Build-Manifest mit Inhalts-Fingerabdrücken für inkrementelle Pipeline-Läufe."""
+
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, Mapping, Optional
+
+from .locking import atomic_output
+
+MANIFEST_FORMAT = "rag-build-manifest"
+MANIFEST_VERSION = 1
+MANIFEST_SUFFIX = ".manifest"
+
+_HASH_BLOCK = 1 << 20
+
+
+@dataclass(frozen=True)
+class FileFingerprint:
+    """Größe, ``mtime`` und SHA-256 einer Datei.
+
+    ``size`` und ``mtime_ns`` dienen nur als schneller Vorfilter; ob sich
+    eine Datei geändert hat, entscheidet ``sha256``.
+    """
+
+    size: int
+    mtime_ns: int
+    sha256: str
+
+    def to_dict(self) -> Dict[str, object]:
+        return {"size": self.size, "mtime_ns": self.mtime_ns, "sha256": self.sha256}
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, object]) -> "FileFingerprint":
+        return cls(
+            size=int(data["size"]),  # type: ignore[arg-type]
+            mtime_ns=int(data["mtime_ns"]),  # type: ignore[arg-type]
+            sha256=str(data["sha256"]),
+        )
+
+
+@dataclass(frozen=True)
+class StageRecord:
+    """Stand eines Pipeline-Schritts beim letzten erfolgreichen Aufbau."""
+
+    builder: int
+    settings: Mapping[str, object]
+    inputs: Mapping[str, FileFingerprint]
+    output: FileFingerprint
+
+    def is_current(
+        self,
+        *,
+        builder: int,
+        settings: Mapping[str, object],
+        inputs: Mapping[str, FileFingerprint],
+        output: Optional[FileFingerprint],
+    ) -> bool:
+        """``True``, wenn Builder, Einstellungen, Eingaben und Ausgabe inhaltlich unverändert sind."""
+
+        if self.builder != builder or dict(self.settings) != dict(settings):
+            return False
+        if output is None or output.sha256 != self.output.sha256:
+            return False
+        if self.inputs.keys() != inputs.keys():
+            return False
+        return all(inputs[path].sha256 == recorded.sha256 for path, recorded in self.inputs.items())
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            "builder": self.builder,
+            "settings": dict(self.settings),
+            "inputs": {path: fingerprint.to_dict() for path, fingerprint in sorted(self.inputs.items())},
+            "output": self.output.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, object]) -> "StageRecord":
+        inputs = data["inputs"]
+        assert isinstance(inputs, Mapping)
+        return cls(
+            builder=int(data["builder"]),  # type: ignore[arg-type]
+            settings=dict(data["settings"]),  # type: ignore[arg-type]
+            inputs={str(path): FileFingerprint.from_dict(value) for path, value in inputs.items()},
+            output=FileFingerprint.from_dict(data["output"]),  # type: ignore[arg-type]
+        )
+
+
+@dataclass(frozen=True)
+class BuildManifest:
+    """Neben dem Index abgelegtes Manifest mit je einem :class:`StageRecord` pro Schritt."""
+
+    stages: Mapping[str, StageRecord] = field(default_factory=dict)
+
+    def get(self, stage: str) -> Optional[StageRecord]:
+        return self.stages.get(stage)
+
+    def with_stage(self, stage: str, record: StageRecord) -> "BuildManifest":
+        stages = dict(self.stages)
+        stages[stage] = record
+        return BuildManifest(stages=stages)
+
+    def without_stage(self, stage: str) -> "BuildManifest":
+        stages = dict(self.stages)
+        stages.pop(stage, None)
+        return BuildManifest(stages=stages)
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            "format": MANIFEST_FORMAT,
+            "version": MANIFEST_VERSION,
+            "stages": {name: record.to_dict() for name, record in sorted(self.stages.items())},
+        }
+
+
+def manifest_path(index_path: Path) -> Path:
+    return index_path.with_name(index_path.name + MANIFEST_SUFFIX)
+
+
+def load_manifest(path: Path) -> BuildManifest:
+    """Liest ein Manifest; fehlende, fremde oder beschädigte Dateien ergeben ein leeres."""
+
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return BuildManifest()
+    if not isinstance(data, dict) or data.get("format") != MANIFEST_FORMAT or data.get("version") != MANIFEST_VERSION:
+        return BuildManifest()
+    stages: Dict[str, StageRecord] = {}
+    raw_stages = data.get("stages")
+    if isinstance(raw_stages, dict):
+        for name, record in raw_stages.items():
+            try:
+                stages[str(name)] = StageRecord.from_dict(record)
+            except (AssertionError, KeyError, TypeError, ValueError):
+                continue
+    return BuildManifest(stages=stages)
+
+
+def remove_manifest(index_path: Path) -> bool:
+    try:
+        os.unlink(manifest_path(index_path))
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def write_manifest(path: Path, manifest: BuildManifest) -> None:
+    with atomic_output(path) as handle:
+        handle.write(json.dumps(manifest.to_dict(), ensure_ascii=False, indent=2) + "\n")
+
+
+def fingerprint_file(path: Path, previous: Optional[FileFingerprint] = None) -> Optional[FileFingerprint]:
+    """Fingerabdruck von ``path`` oder ``None``, falls die Datei fehlt.
+
+    Stimmen Größe und ``mtime`` mit ``previous`` überein, wird nur ``stat``
+    aufgerufen. Andernfalls wird der Inhalt gehasht – eine nur berührte
+    Datei (z. B. nach ``git checkout``) behält so ihren Hash.
+    """
+
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    if previous is not None and previous.size == stat.st_size and previous.mtime_ns == stat.st_mtime_ns:
+        return previous
+    return FileFingerprint(size=stat.st_size, mtime_ns=stat.st_mtime_ns, sha256=_sha256(path))
+
+
+def fingerprint_files(
+    paths: Iterable[Path],
+    previous: Optional[Mapping[str, FileFingerprint]] = None,
+) -> Dict[str, FileFingerprint]:
+    """Fingerabdrücke aller vorhandenen ``paths``, Schlüssel ist ``str(path)``."""
+
+    known = previous or {}
+    fingerprints: Dict[str, FileFingerprint] = {}
+    for path in paths:
+        key = str(path)
+        fingerprint = fingerprint_file(path, known.get(key))
+        if fingerprint is not None:
+            fingerprints[key] = fingerprint
+    return fingerprints
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        while block := handle.read(_HASH_BLOCK):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+__all__ = [
+    "BuildManifest",
+    "FileFingerprint",
+    "MANIFEST_FORMAT",
+    "MANIFEST_SUFFIX",
+    "MANIFEST_VERSION",
+    "StageRecord",
+    "fingerprint_file",
+    "fingerprint_files",
+    "load_manifest",
+    "manifest_path",
+    "remove_manifest",
+    "write_manifest",
+]
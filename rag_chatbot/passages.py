@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+"""Zusammenführen benachbarter, überlappender Treffer zu Kontextpassagen."""
+
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+
+from .retrieval import SearchResult, TermMatch
+
+_WORD_RE = re.compile(r"\S+")
+
+
+@dataclass(frozen=True)
+class ContextPassage:
+    """Ein oder mehrere aufeinanderfolgende Chunks eines Dokuments als ein Text."""
+
+    results: Tuple[SearchResult, ...]
+    text: str
+    matches: Tuple[TermMatch, ...] = ()
+
+    @property
+    def score(self) -> float:
+        return max(result.score for result in self.results)
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        return self.results[0].metadata
+
+    @property
+    def chunk_indices(self) -> Tuple[int, ...]:
+        return tuple(_chunk_index(result) for result in self.results if _chunk_index(result) is not None)
+
+
+def merge_adjacent(results: Sequence[SearchResult]) -> List[ContextPassage]:
+    """Fasst Treffer mit gleicher ``source`` und fortlaufendem ``chunk_index`` zusammen.
+
+    Die Überlappung zwischen zwei Nachbarn wird dabei nur einmal übernommen.
+    Die Passagen erscheinen in der Reihenfolge ihres bestplatzierten Treffers;
+    Laufzeit und Speicher sind linear in der Anzahl der Treffer und Wörter.
+    """
+
+    positions: Dict[Tuple[Hashable, int], int] = {}
+    for position, result in enumerate(results):
+        key = _adjacency_key(result)
+        if key is not None:
+            positions.setdefault(key, position)
+
+    runs: List[Tuple[int, List[SearchResult]]] = []
+    for position, result in enumerate(results):
+        key = _adjacency_key(result)
+        if key is None:
+            runs.append((position, [result]))
+            continue
+        if positions[key] != position:
+            continue  # doppelter Treffer
+        source, chunk_index = key
+        if (source, chunk_index - 1) in positions:
+            continue  # gehört zu einem Lauf, der früher beginnt
+        run = [result]
+        first = position
+        following = chunk_index + 1
+        while (source, following) in positions:
+            follower = positions[(source, following)]
+            run.append(results[follower])
+            first = min(first, follower)
+            following += 1
+        runs.append((first, run))
+
+    runs.sort(key=lambda item: item[0])
+    return [_stitch(run) for _, run in runs]
+
+
+def _adjacency_key(result: SearchResult) -> Optional[Tuple[Hashable, int]]:
+    source = result.metadata.get("source")
+    chunk_index = _chunk_index(result)
+    if not source or chunk_index is None:
+        return None
+    return str(source), chunk_index
+
+
+def _chunk_index(result: SearchResult) -> Optional[int]:
+    value = result.metadata.get("chunk_index")
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str) and value.isdigit():
+        return int(value)
+    return None
+
+
+def _stitch(run: Sequence[SearchResult]) -> ContextPassage:
+    first = run[0]
+    if len(run) == 1:
+        return ContextPassage(results=(first,), text=first.text, matches=first.matches)
+
+    parts = [first.text]
+    length = len(first.text)
+    matches: List[TermMatch] = list(first.matches)
+    words = first.text.split()
+    for result in run[1:]:
+        following = result.text.split()
+        overlap = _overlap_length(words, following)
+        words.extend(following[overlap:])
+        cut = _char_offset_after(result.text, overlap)
+        remainder = result.text[cut:].lstrip()
+        if not remainder:
+            continue
+        cut = len(result.text) - len(remainder)
+        shift = length + 1 - cut
+        matches.extend(
+            TermMatch(match.start + shift, match.end + shift, match.term, match.weight)
+            for match in result.matches
+            if match.start >= cut
+        )
+        parts.append(remainder)
+        length += 1 + len(remainder)
+    return ContextPassage(results=tuple(run), text=" ".join(parts), matches=tuple(matches))
+
+
+def _char_offset_after(text: str, words: int) -> int:
+    if words <= 0:
+        return 0
+    end = 0
+    for count, match in enumerate(_WORD_RE.finditer(text), start=1):
+        end = match.end()
+        if count == words:
+            break
+    return end
+
+
+def _overlap_length(previous: Sequence[str], following: Sequence[str]) -> int:
+    """Länge des längsten Suffixes von ``previous``, das ``following`` einleitet.
+
+    Präfixfunktion nach Knuth-Morris-Pratt über ``following`` gefolgt vom
+    passenden Ende von ``previous`` – linear statt quadratisch.
+    """
+
+    limit = min(len(previous), len(following))
+    if limit == 0:
+        return 0
+    pattern = list(following[:limit])
+    text = previous[len(previous) - limit:]
+    failure = [0] * limit
+    matched = 0
+    for position in range(1, limit):
+        while matched and pattern[position] != pattern[matched]:
+            matched = failure[matched - 1]
+        if pattern[position] == pattern[matched]:
+            matched += 1
+        failure[position] = matched
+    matched = 0
+    for word in text:
+        while matched and (matched == limit or word != pattern[matched]):
+            matched = failure[matched - 1]
+        if word == pattern[matched]:
+            matched += 1
+    return matched
+
+
+__all__ = ["ContextPassage", "merge_adjacent"]
@@ -2,18 +2,41 @@ from __future__ import annotations
 
 """Automatisierter Workflow zum Erzeugen von Wissensbasis und Index."""
 
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from pathlib import Path
-from typing import List, Optional, Sequence, Tuple
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
 
-from .corpus_builder import BuildOptions, BuildResult, build_corpus
-from .index_builder import IndexOptions, IndexResult, build_index
-from .loader import iter_source_files
+from .corpus_builder import BUILDER_VERSION as CORPUS_BUILDER_VERSION, BuildOptions, BuildResult, build_corpus
+from .fused import build_fused
+from .index_builder import BUILDER_VERSION as INDEX_BUILDER_VERSION, IndexOptions, IndexResult, build_index
+from .loader import DocumentCache, iter_source_files
+from .locking import BuildLock
+from .manifest import (
+    BuildManifest,
+    FileFingerprint,
+    StageRecord,
+    fingerprint_file,
+    fingerprint_files,
+    load_manifest,
+    manifest_path,
+    write_manifest,
+)
+from .profiling import Profiler, profile_stage
+from .progress import ProgressReporter, progress_stage
 
 
 @dataclass(frozen=True)
 class PipelineOptions:
-    """Einstellungen für den End-to-End-Aufbau der Wissensbasis."""
+    """Einstellungen für den End-to-End-Aufbau der Wissensbasis.
+
+    Mit ``fused`` entstehen Wissensbasis und Index in einem Durchlauf
+    (:func:`~rag_chatbot.fused.build_fused`), sobald die Wissensbasis neu
+    gebaut werden muss. ``write_corpus=False`` lässt das JSONL ganz weg und
+    baut immer in einem Durchlauf; eine vorhandene, ältere Wissensbasis unter
+    ``corpus_path`` wird dabei gelöscht, damit Chunk-IDs des neuen Index
+    nicht auf veraltete Texte verweisen. ``term_offsets`` wird an
+    :class:`~rag_chatbot.index_builder.IndexOptions` durchgereicht.
+    """
 
     sources: Sequence[Path]
     corpus_path: Path
@@ -23,6 +46,47 @@ class PipelineOptions:
     max_features: Optional[int] = None
     min_term_length: int = 2
     force: bool = False
+    lock: bool = True
+    fused: bool = False
+    write_corpus: bool = True
+    term_offsets: bool = False
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            "sources": [str(path) for path in self.sources],
+            "corpus_path": str(self.corpus_path),
+            "index_path": str(self.index_path),
+            "max_words": self.max_words,
+            "overlap": self.overlap,
+            "max_features": self.max_features,
+            "min_term_length": self.min_term_length,
+            "force": self.force,
+            "lock": self.lock,
+            "fused": self.fused,
+            "write_corpus": self.write_corpus,
+            "term_offsets": self.term_offsets,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, object]) -> "PipelineOptions":
+        sources = data.get("sources")
+        if not isinstance(sources, list) or not sources:
+            raise ValueError("sources muss eine nicht-leere Liste sein.")
+        max_features = data.get("max_features")
+        return cls(
+            sources=[Path(str(path)) for path in sources],
+            corpus_path=Path(str(data["corpus_path"])),
+            index_path=Path(str(data["index_path"])),
+            max_words=int(data.get("max_words", 180)),  # type: ignore[arg-type]
+            overlap=int(data.get("overlap", 40)),  # type: ignore[arg-type]
+            max_features=None if max_features is None else int(max_features),  # type: ignore[arg-type]
+            min_term_length=int(data.get("min_term_length", 2)),  # type: ignore[arg-type]
+            force=bool(data.get("force", False)),
+            lock=bool(data.get("lock", True)),
+            fused=bool(data.get("fused", False)),
+            write_corpus=bool(data.get("write_corpus", True)),
+            term_offsets=bool(data.get("term_offsets", False)),
+        )
 
 
 @dataclass(frozen=True)
@@ -32,69 +96,369 @@ class PipelineResult:
     corpus: Optional[BuildResult]
     index: Optional[IndexResult]
     skipped: Tuple[str, ...]
+    coalesced: bool = False
+    passes: int = 1
+
+    def to_dict(self) -> Dict[str, object]:
+        corpus = self.corpus
+        index = self.index
+        return {
+            "corpus": None
+            if corpus is None
+            else {
+                "documents": corpus.documents,
+                "chunks": corpus.chunks,
+                "average_words": corpus.average_words,
+                "output_path": str(corpus.output_path),
+                "written": corpus.written,
+            },
+            "index": None
+            if index is None
+            else {
+                "chunks": index.chunks,
+                "vocabulary_size": index.vocabulary_size,
+                "output_path": str(index.output_path),
+            },
+            "skipped": list(self.skipped),
+            "coalesced": self.coalesced,
+            "passes": self.passes,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, object]) -> "PipelineResult":
+        corpus = data.get("corpus")
+        index = data.get("index")
+        return cls(
+            corpus=None
+            if not isinstance(corpus, Mapping)
+            else BuildResult(
+                documents=int(corpus["documents"]),
+                chunks=int(corpus["chunks"]),
+                average_words=float(corpus["average_words"]),
+                output_path=Path(str(corpus["output_path"])),
+                written=bool(corpus.get("written", True)),
+            ),
+            index=None
+            if not isinstance(index, Mapping)
+            else IndexResult(
+                chunks=int(index["chunks"]),
+                vocabulary_size=int(index["vocabulary_size"]),
+                output_path=Path(str(index["output_path"])),
+            ),
+            skipped=tuple(str(stage) for stage in data.get("skipped", ())),  # type: ignore[union-attr]
+            coalesced=bool(data.get("coalesced", False)),
+            passes=int(data.get("passes", 1)),  # type: ignore[arg-type]
+        )
+
+
+def run_pipeline(
+    options: PipelineOptions,
+    *,
+    profiler: Optional[Profiler] = None,
+    progress: Optional[ProgressReporter] = None,
+    cache: Optional[DocumentCache] = None,
+) -> PipelineResult:
+    """Führt den kompletten Aufbau inklusive Index aus.
+
+    Mit ``profiler`` werden Laufzeit und Speicher für ``corpus`` und ``index``
+    samt ihrer Teilschritte erfasst; ``progress`` meldet dieselben Schritte,
+    Zwischenstände und am Ende das Ergebnis laufend als Ereignisse.
+
+    Mit ``options.lock`` (Standard) wird der Aufbau über einen
+    :class:`BuildLock` neben dem Index serialisiert. Läuft bereits ein
+    Aufbau, wird die Anfrage nur vorgemerkt und ``coalesced=True``
+    zurückgegeben; der laufende Prozess hängt dann genau einen weiteren
+    Durchlauf an.
+
+    ``cache`` hält geparste Quelldokumente zwischen Aufrufen im Speicher
+    (siehe :class:`~rag_chatbot.loader.DocumentCache`).
+    """
+
+    if not options.lock:
+        result = _run_once(options, profiler=profiler, progress=progress, cache=cache)
+    else:
+        result = _run_locked(options, profiler=profiler, progress=progress, cache=cache)
+    if progress is not None:
+        progress.emit("finished", **result.to_dict())
+    return result
 
 
-def run_pipeline(options: PipelineOptions) -> PipelineResult:
-    """Führt den kompletten Aufbau inklusive Index aus."""
+def _run_locked(
+    options: PipelineOptions,
+    *,
+    profiler: Optional[Profiler],
+    progress: Optional[ProgressReporter],
+    cache: Optional[DocumentCache],
+) -> PipelineResult:
+    lock = BuildLock(options.index_path)
+    if not lock.request():
+        if progress is not None:
+            progress.emit("coalesced", lock=str(lock.lock_path))
+        return PipelineResult(corpus=None, index=None, skipped=("corpus", "index"), coalesced=True, passes=0)
 
+    result: Optional[PipelineResult] = None
+    passes = 0
+    try:
+        while True:
+            while lock.take_pending():
+                if passes and progress is not None:
+                    progress.emit("follow_up", passes=passes)
+                result = _run_once(options, profiler=profiler, progress=progress, cache=cache)
+                passes += 1
+            if not lock.release():
+                break
+    finally:
+        lock.close()
+
+    if result is None:
+        # Die Vormerkung wurde noch vom vorherigen Inhaber der Sperre abgearbeitet.
+        return PipelineResult(corpus=None, index=None, skipped=("corpus", "index"), coalesced=True, passes=0)
+    return replace(result, passes=passes)
+
+
+def _run_once(
+    options: PipelineOptions,
+    *,
+    profiler: Optional[Profiler],
+    progress: Optional[ProgressReporter],
+    cache: Optional[DocumentCache],
+) -> PipelineResult:
     source_files = _collect_source_files(options.sources)
+    path = manifest_path(options.index_path)
+    manifest = load_manifest(path)
+    if not options.write_corpus:
+        return _run_without_corpus(options, manifest, source_files, profiler=profiler, progress=progress, cache=cache)
+    updated = manifest
     skipped: List[str] = []
 
-    corpus_result: Optional[BuildResult]
-    if options.force or _needs_rebuild(options.corpus_path, source_files):
-        corpus_options = BuildOptions(
-            sources=options.sources,
-            output_path=options.corpus_path,
-            max_words=options.max_words,
-            overlap=options.overlap,
-        )
-        corpus_result = build_corpus(corpus_options)
+    corpus_record = manifest.get("corpus")
+    sources, corpus_output = _corpus_state(options, corpus_record, source_files)
+    corpus_result: Optional[BuildResult] = None
+    index_result: Optional[IndexResult] = None
+    corpus_current = _is_current(corpus_record, CORPUS_BUILDER_VERSION, _corpus_settings(options), sources, corpus_output)
+    if (options.force or not corpus_current) and options.fused:
+        with profile_stage(profiler, "fused"), progress_stage(progress, "fused"):
+            corpus_result, index_result = build_fused(
+                _corpus_options(options),
+                _index_options(options),
+                profiler=profiler,
+                progress=progress,
+                cache=cache,
+            )
+        corpus_output = _require_fingerprint(options.corpus_path)
+    elif options.force or not corpus_current:
+        with profile_stage(profiler, "corpus"), progress_stage(progress, "corpus"):
+            corpus_result = build_corpus(_corpus_options(options), profiler=profiler, progress=progress, cache=cache)
+        corpus_output = _require_fingerprint(options.corpus_path)
     else:
-        corpus_result = None
         skipped.append("corpus")
+        if progress is not None:
+            progress.emit("stage_skipped", stage="corpus")
+    assert corpus_output is not None
+    # Auch übersprungene Schritte werden neu erfasst: Nur berührte Dateien
+    # bekommen so ihre neue mtime und der nächste Lauf bleibt beim stat.
+    updated = updated.with_stage(
+        "corpus", StageRecord(CORPUS_BUILDER_VERSION, _corpus_settings(options), sources, corpus_output)
+    )
 
-    index_dependencies: List[Path] = [options.corpus_path]
-    index_result: Optional[IndexResult]
-    if options.force or corpus_result is not None or _needs_rebuild(options.index_path, index_dependencies):
-        index_options = IndexOptions(
-            corpus_path=options.corpus_path,
-            output_path=options.index_path,
-            max_features=options.max_features,
-            min_term_length=options.min_term_length,
-        )
-        index_result = build_index(index_options)
+    index_record = manifest.get("index")
+    corpus_input, index_output = _index_state(options, index_record, corpus_output)
+    if index_result is not None:
+        index_output = _require_fingerprint(options.index_path)
+    elif options.force or not _is_current(
+        index_record, INDEX_BUILDER_VERSION, _index_settings(options), corpus_input, index_output
+    ):
+        with profile_stage(profiler, "index"), progress_stage(progress, "index"):
+            index_result = build_index(_index_options(options), profiler=profiler, progress=progress)
+        index_output = _require_fingerprint(options.index_path)
     else:
-        index_result = None
         skipped.append("index")
+        if progress is not None:
+            progress.emit("stage_skipped", stage="index")
+    assert index_output is not None
+    updated = updated.with_stage(
+        "index", StageRecord(INDEX_BUILDER_VERSION, _index_settings(options), corpus_input, index_output)
+    )
 
+    if updated != manifest:
+        write_manifest(path, updated)
     return PipelineResult(corpus=corpus_result, index=index_result, skipped=tuple(skipped))
 
 
+def _run_without_corpus(
+    options: PipelineOptions,
+    manifest: BuildManifest,
+    source_files: Sequence[Path],
+    *,
+    profiler: Optional[Profiler],
+    progress: Optional[ProgressReporter],
+    cache: Optional[DocumentCache],
+) -> PipelineResult:
+    # Ohne Korpusdatei hängt der Index direkt an den Quellen; im Manifest
+    # stehen dann Chunk- und Index-Einstellungen gemeinsam beim Index.
+    # Eine ältere Wissensbasis passt nicht zum Index (ChunkStore und PHP lösen
+    # IDs darüber auf) und wird vor dem Schreiben des Index entfernt.
+    stale_corpus = _remove_file(options.corpus_path)
+    record = manifest.get("index")
+    sources, output = _direct_state(options, record, source_files)
+    corpus_result: Optional[BuildResult] = None
+    index_result: Optional[IndexResult] = None
+    skipped: Tuple[str, ...] = ()
+    if options.force or not _is_current(record, INDEX_BUILDER_VERSION, _direct_settings(options), sources, output):
+        with profile_stage(profiler, "fused"), progress_stage(progress, "fused"):
+            corpus_result, index_result = build_fused(
+                _corpus_options(options),
+                _index_options(options),
+                write_corpus=False,
+                profiler=profiler,
+                progress=progress,
+                cache=cache,
+            )
+        output = _require_fingerprint(options.index_path)
+    else:
+        skipped = ("corpus", "index")
+        if progress is not None:
+            for stage in skipped:
+                progress.emit("stage_skipped", stage=stage)
+    assert output is not None
+
+    if stale_corpus and progress is not None:
+        progress.emit("corpus_removed", path=str(options.corpus_path))
+
+    updated = manifest.without_stage("corpus").with_stage(
+        "index", StageRecord(INDEX_BUILDER_VERSION, _direct_settings(options), sources, output)
+    )
+    if updated != manifest:
+        write_manifest(manifest_path(options.index_path), updated)
+    return PipelineResult(corpus=corpus_result, index=index_result, skipped=skipped)
+
+
+def _remove_file(path: Path) -> bool:
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def pipeline_is_stale(options: PipelineOptions) -> bool:
+    """``True``, wenn :func:`run_pipeline` mindestens einen Schritt neu ausführen würde.
+
+    Bei unveränderten Dateien genügen das Durchsuchen der Quellen und je ein
+    ``stat``; gehasht wird nur, wenn Größe oder mtime abweichen.
+    """
+
+    if options.force:
+        return True
+    source_files = _collect_source_files(options.sources)
+    manifest = load_manifest(manifest_path(options.index_path))
+    if not options.write_corpus:
+        record = manifest.get("index")
+        sources, output = _direct_state(options, record, source_files)
+        return not _is_current(record, INDEX_BUILDER_VERSION, _direct_settings(options), sources, output)
+    corpus_record = manifest.get("corpus")
+    sources, corpus_output = _corpus_state(options, corpus_record, source_files)
+    if not _is_current(corpus_record, CORPUS_BUILDER_VERSION, _corpus_settings(options), sources, corpus_output):
+        return True
+    index_record = manifest.get("index")
+    corpus_input, index_output = _index_state(options, index_record, corpus_output)
+    return not _is_current(index_record, INDEX_BUILDER_VERSION, _index_settings(options), corpus_input, index_output)
+
+
 def _collect_source_files(sources: Sequence[Path]) -> Tuple[Path, ...]:
     if not sources:
         raise ValueError("Es wurden keine Quellen übergeben.")
-    files: List[Path] = [Path(path) for path in iter_source_files(sources)]
+    files = tuple(iter_source_files(sources))
     if not files:
         raise ValueError("In den angegebenen Quellen wurden keine unterstützten Dateien gefunden.")
-    return tuple(files)
+    return files
 
 
-def _needs_rebuild(target: Path, dependencies: Sequence[Path]) -> bool:
-    if not target.exists():
-        return True
-    try:
-        target_mtime = target.stat().st_mtime
-    except FileNotFoundError:  # pragma: no cover - Race condition
-        return True
-    for dependency in dependencies:
-        try:
-            dep_mtime = dependency.stat().st_mtime
-        except FileNotFoundError:
-            continue
-        if dep_mtime > target_mtime:
-            return True
-    return False
+def _corpus_settings(options: PipelineOptions) -> Dict[str, object]:
+    return {"max_words": options.max_words, "overlap": options.overlap}
+
+
+def _index_settings(options: PipelineOptions) -> Dict[str, object]:
+    return {
+        "max_features": options.max_features,
+        "min_term_length": options.min_term_length,
+        "term_offsets": options.term_offsets,
+    }
+
+
+def _direct_settings(options: PipelineOptions) -> Dict[str, object]:
+    settings = _corpus_settings(options)
+    settings.update(_index_settings(options))
+    settings["corpus_builder"] = CORPUS_BUILDER_VERSION
+    return settings
+
+
+def _corpus_options(options: PipelineOptions) -> BuildOptions:
+    return BuildOptions(
+        sources=options.sources,
+        output_path=options.corpus_path,
+        max_words=options.max_words,
+        overlap=options.overlap,
+    )
+
+
+def _index_options(options: PipelineOptions) -> IndexOptions:
+    return IndexOptions(
+        corpus_path=options.corpus_path,
+        output_path=options.index_path,
+        max_features=options.max_features,
+        min_term_length=options.min_term_length,
+        term_offsets=options.term_offsets,
+    )
+
+
+def _corpus_state(
+    options: PipelineOptions,
+    record: Optional[StageRecord],
+    source_files: Sequence[Path],
+) -> Tuple[Dict[str, FileFingerprint], Optional[FileFingerprint]]:
+    sources = fingerprint_files(source_files, record.inputs if record is not None else None)
+    output = fingerprint_file(options.corpus_path, record.output if record is not None else None)
+    return sources, output
+
+
+def _index_state(
+    options: PipelineOptions,
+    record: Optional[StageRecord],
+    corpus_output: Optional[FileFingerprint],
+) -> Tuple[Dict[str, FileFingerprint], Optional[FileFingerprint]]:
+    corpus_input = {str(options.corpus_path): corpus_output} if corpus_output is not None else {}
+    output = fingerprint_file(options.index_path, record.output if record is not None else None)
+    return corpus_input, output
+
+
+def _direct_state(
+    options: PipelineOptions,
+    record: Optional[StageRecord],
+    source_files: Sequence[Path],
+) -> Tuple[Dict[str, FileFingerprint], Optional[FileFingerprint]]:
+    sources = fingerprint_files(source_files, record.inputs if record is not None else None)
+    output = fingerprint_file(options.index_path, record.output if record is not None else None)
+    return sources, output
+
+
+def _is_current(
+    record: Optional[StageRecord],
+    builder: int,
+    settings: Mapping[str, object],
+    inputs: Mapping[str, FileFingerprint],
+    output: Optional[FileFingerprint],
+) -> bool:
+    if record is None:
+        return False
+    return record.is_current(builder=builder, settings=settings, inputs=inputs, output=output)
+
 
+def _require_fingerprint(path: Path) -> FileFingerprint:
+    fingerprint = fingerprint_file(path)
+    if fingerprint is None:  # pragma: no cover - Datei wurde direkt nach dem Schreiben entfernt
+        raise FileNotFoundError(path)
+    return fingerprint
 
-__all__ = ["PipelineOptions", "PipelineResult", "run_pipeline"]
 
+__all__ = ["PipelineOptions", "PipelineResult", "pipeline_is_stale", "run_pipeline"]
@@ -0,0 +1,245 @@
+from __future__ import annotations
+
+"""Optionale Messung von Laufzeit, CPU-Zeit und Speicher je Pipeline-Schritt."""
+
+import json
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import ContextManager, Dict, Iterator, List, Optional, Tuple
+
+try:  # pragma: no cover - unter Windows nicht verfügbar
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None  # type: ignore[assignment]
+
+PROFILE_FORMAT = "rag-profile"
+PROFILE_VERSION = 1
+
+
+@dataclass(frozen=True)
+class AllocationSite:
+    """Codezeile mit dem größten Speicherzuwachs innerhalb eines Schritts."""
+
+    location: str
+    size_bytes: int
+    count: int
+
+    def to_dict(self) -> Dict[str, object]:
+        return {"location": self.location, "size_bytes": self.size_bytes, "count": self.count}
+
+
+@dataclass(frozen=True)
+class StageProfile:
+    """Messwerte eines Schritts; ``stages`` enthält verschachtelte Teilschritte."""
+
+    name: str
+    wall_seconds: float
+    cpu_seconds: float
+    peak_rss_kb: Optional[int]
+    traced_peak_bytes: Optional[int] = None
+    traced_delta_bytes: Optional[int] = None
+    top_allocations: Tuple[AllocationSite, ...] = ()
+    stages: Tuple["StageProfile", ...] = ()
+
+    def to_dict(self) -> Dict[str, object]:
+        payload: Dict[str, object] = {
+            "name": self.name,
+            "wall_seconds": self.wall_seconds,
+            "cpu_seconds": self.cpu_seconds,
+            "peak_rss_kb": self.peak_rss_kb,
+        }
+        if self.traced_peak_bytes is not None:
+            payload["traced_peak_bytes"] = self.traced_peak_bytes
+            payload["traced_delta_bytes"] = self.traced_delta_bytes
+            payload["top_allocations"] = [site.to_dict() for site in self.top_allocations]
+        if self.stages:
+            payload["stages"] = [stage.to_dict() for stage in self.stages]
+        return payload
+
+
+@dataclass
+class _Frame:
+    name: str
+    wall: float
+    cpu: float
+    overhead: Tuple[float, float] = (0.0, 0.0)
+    traced_start: int = 0
+    traced_peak: int = 0
+    snapshot: Optional[tracemalloc.Snapshot] = None
+    children: List[StageProfile] = field(default_factory=list)
+
+
+class Profiler:
+    """Sammelt :class:`StageProfile` für verschachtelte ``with profiler.stage(...)``-Blöcke.
+
+    Mit ``trace=True`` wird :mod:`tracemalloc` für die Dauer der Messung
+    aktiviert; pro Schritt werden der Spitzenwert des Python-Heaps und die
+    ``top`` Codezeilen mit dem größten Zuwachs festgehalten. ``peak_rss_kb``
+    ist der Höchststand des gesamten Prozesses bis zum Ende des Schritts.
+    Ohne Profiler bleiben die instrumentierten Funktionen unverändert schnell,
+    siehe :func:`profile_stage`.
+    """
+
+    def __init__(self, *, trace: bool = True, top: int = 10, frames: int = 1) -> None:
+        if top < 0:
+            raise ValueError("top darf nicht negativ sein.")
+        self._trace = trace
+        self._top = top
+        self._frames = max(1, frames)
+        self._stack: List[_Frame] = []
+        self._stages: List[StageProfile] = []
+        self._owns_tracing = False
+        self._started = time.time()
+        # Zeit für tracemalloc-Snapshots, die von den Schritten abgezogen wird.
+        self._overhead_wall = 0.0
+        self._overhead_cpu = 0.0
+
+    @property
+    def stages(self) -> Tuple[StageProfile, ...]:
+        return tuple(self._stages)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        self._enter(name)
+        try:
+            yield
+        finally:
+            self._exit()
+
+    def close(self) -> None:
+        """Beendet ``tracemalloc``, sofern der Profiler es gestartet hat."""
+
+        if self._owns_tracing and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self._owns_tracing = False
+
+    def __enter__(self) -> "Profiler":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def report(self) -> Dict[str, object]:
+        return {
+            "format": PROFILE_FORMAT,
+            "version": PROFILE_VERSION,
+            "started_at": self._started,
+            "tracemalloc": self._trace,
+            "overhead_seconds": round(self._overhead_wall, 6),
+            "stages": [stage.to_dict() for stage in self._stages],
+        }
+
+    def write(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.report(), ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+
+    def _enter(self, name: str) -> None:
+        frame = _Frame(name=name, wall=0.0, cpu=0.0)
+        if self._trace:
+            wall, cpu = time.perf_counter(), time.process_time()
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(self._frames)
+                self._owns_tracing = True
+            current, peak = tracemalloc.get_traced_memory()
+            if self._stack:
+                # Bisherigen Spitzenwert dem übergeordneten Schritt gutschreiben.
+                parent = self._stack[-1]
+                parent.traced_peak = max(parent.traced_peak, peak)
+            frame.traced_start = current
+            frame.traced_peak = current
+            if self._top:
+                frame.snapshot = tracemalloc.take_snapshot()
+            tracemalloc.reset_peak()
+            self._add_overhead(wall, cpu)
+        frame.overhead = (self._overhead_wall, self._overhead_cpu)
+        frame.wall = time.perf_counter()
+        frame.cpu = time.process_time()
+        self._stack.append(frame)
+
+    def _exit(self) -> None:
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        frame = self._stack.pop()
+        # Snapshots verschachtelter Schritte zählen nicht zur Laufzeit des Schritts.
+        elapsed = wall - frame.wall - (self._overhead_wall - frame.overhead[0])
+        elapsed_cpu = cpu - frame.cpu - (self._overhead_cpu - frame.overhead[1])
+        traced_peak = traced_delta = None
+        sites: Tuple[AllocationSite, ...] = ()
+        if self._trace and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            traced_peak = max(frame.traced_peak, peak)
+            traced_delta = current - frame.traced_start
+            if frame.snapshot is not None:
+                sites = _top_sites(tracemalloc.take_snapshot(), frame.snapshot, self._top)
+                frame.snapshot = None
+            tracemalloc.reset_peak()
+            self._add_overhead(wall, cpu)
+        profile = StageProfile(
+            name=frame.name,
+            wall_seconds=round(max(elapsed, 0.0), 6),
+            cpu_seconds=round(max(elapsed_cpu, 0.0), 6),
+            peak_rss_kb=peak_rss_kb(),
+            traced_peak_bytes=traced_peak,
+            traced_delta_bytes=traced_delta,
+            top_allocations=sites,
+            stages=tuple(frame.children),
+        )
+        if self._stack:
+            parent = self._stack[-1]
+            parent.children.append(profile)
+            if traced_peak is not None:
+                parent.traced_peak = max(parent.traced_peak, traced_peak)
+        else:
+            self._stages.append(profile)
+
+    def _add_overhead(self, wall: float, cpu: float) -> None:
+        self._overhead_wall += time.perf_counter() - wall
+        self._overhead_cpu += time.process_time() - cpu
+
+
+def profile_stage(profiler: Optional[Profiler], name: str) -> ContextManager[None]:
+    """``profiler.stage(name)`` oder ein wirkungsloser Kontext ohne Profiler."""
+
+    if profiler is None:
+        return nullcontext()
+    return profiler.stage(name)
+
+
+def _top_sites(after: tracemalloc.Snapshot, before: tracemalloc.Snapshot, limit: int) -> Tuple[AllocationSite, ...]:
+    ignore = (tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__))
+    statistics = after.filter_traces(ignore).compare_to(before.filter_traces(ignore), "lineno")
+    growing = [stat for stat in statistics if stat.size_diff > 0]
+    growing.sort(key=lambda stat: stat.size_diff, reverse=True)
+    return tuple(
+        AllocationSite(
+            location=f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+            size_bytes=stat.size_diff,
+            count=stat.count_diff,
+        )
+        for stat in growing[:limit]
+    )
+
+
+def peak_rss_kb() -> Optional[int]:
+    """Höchster Speicherbedarf (RSS) des Prozesses in KiB; ``None`` ohne ``resource`` (Windows)."""
+
+    if resource is None:  # pragma: no cover
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS meldet Bytes, Linux Kilobytes.
+    return int(peak // 1024) if sys.platform == "darwin" else int(peak)
+
+
+__all__ = [
+    "AllocationSite",
+    "PROFILE_FORMAT",
+    "PROFILE_VERSION",
+    "Profiler",
+    "StageProfile",
+    "peak_rss_kb",
+    "profile_stage",
+]
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+"""Maschinenlesbare Fortschrittsmeldungen für lang laufende Pipeline-Schritte."""
+
+import json
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Callable, ContextManager, Dict, Iterator, List, Optional, TextIO
+
+ProgressRecord = Dict[str, object]
+
+
+class ProgressReporter:
+    """Meldet Beginn und Ende von Schritten sowie Zwischenstände an ``write``.
+
+    Jede Meldung ist ein flaches Dictionary mit ``event`` und ``elapsed``
+    (Sekunden seit dem Start des Reporters). Verschachtelte Schritte werden
+    mit Punkt getrennt benannt, z. B. ``corpus.load``. Zähler über
+    :meth:`count` werden höchstens alle ``min_interval`` Sekunden gemeldet,
+    der Endstand immer.
+    """
+
+    def __init__(
+        self,
+        write: Callable[[ProgressRecord], None],
+        *,
+        min_interval: float = 0.5,
+        clock: Callable[[], float] = time.perf_counter,
+    ) -> None:
+        self._write = write
+        self._min_interval = min_interval
+        self._clock = clock
+        self._started = clock()
+        self._stack: List[str] = []
+        self._last_count: Dict[str, float] = {}
+
+    @classmethod
+    def ndjson(cls, stream: Optional[TextIO] = None, **kwargs: object) -> "ProgressReporter":
+        """Schreibt jede Meldung als JSON-Zeile und leert den Puffer sofort."""
+
+        target = stream if stream is not None else sys.stdout
+
+        def write(record: ProgressRecord) -> None:
+            target.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+            target.flush()
+
+        return cls(write, **kwargs)  # type: ignore[arg-type]
+
+    @property
+    def current_stage(self) -> Optional[str]:
+        return self._stack[-1] if self._stack else None
+
+    def emit(self, event: str, **fields: object) -> None:
+        record: ProgressRecord = {"event": event, "elapsed": round(self._clock() - self._started, 6)}
+        if self._stack and "stage" not in fields:
+            record["stage"] = self._stack[-1]
+        record.update(fields)
+        self._write(record)
+
+    def count(self, event: str, value: int, *, total: Optional[int] = None, final: bool = False) -> None:
+        now = self._clock()
+        last = self._last_count.get(event)
+        if not final and last is not None and now - last < self._min_interval:
+            return
+        self._last_count[event] = now
+        fields: Dict[str, object] = {"count": value}
+        if total is not None:
+            fields["total"] = total
+        self.emit(event, **fields)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        qualified = f"{self._stack[-1]}.{name}" if self._stack else name
+        self.emit("stage_start", stage=qualified)
+        self._stack.append(qualified)
+        started = self._clock()
+        status = "error"
+        try:
+            yield
+            status = "ok"
+        finally:
+            self._stack.pop()
+            self.emit("stage_end", stage=qualified, seconds=round(self._clock() - started, 6), status=status)
+
+
+def progress_stage(progress: Optional[ProgressReporter], name: str) -> ContextManager[None]:
+    """``progress.stage(name)`` oder ein wirkungsloser Kontext ohne Reporter."""
+
+    if progress is None:
+        return nullcontext()
+    return progress.stage(name)
+
+
+__all__ = ["ProgressRecord", "ProgressReporter", "progress_stage"]
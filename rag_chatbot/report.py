@@ -2,31 +2,80 @@ from __future__ import annotations
 
 """Auswertung von Gesprächsprotokollen für den RAG-Chatbot."""
 
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
 from pathlib import Path
-from statistics import mean
-from typing import Dict, List, Tuple
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import glob
 import json
-
-from .transcript import ChatTranscript, TranscriptStats
+import os
+
+from .chat import TIMING_STAGES
+from .sketch import QuantileSketch
+from .transcript import (
+    ChatTranscript,
+    StatsAccumulator,
+    TranscriptStats,
+    TranscriptTurn,
+    iter_transcript_turns,
+    source_key,
+)
+
+TRANSCRIPT_GLOB = "*transcript*.json*"
+_TRANSCRIPT_SUFFIXES = (".json", ".jsonl")
+
+STAGE_LABELS = {
+    "vectorise": "Vektorisierung",
+    "search": "Suche",
+    "prompt": "Prompt-Aufbau",
+    "responder": "Antwortgenerator",
+}
 
 
 @dataclass(frozen=True)
 class SourceReport:
-    """Kennzahlen für eine Quelle innerhalb eines Transkripts."""
+    """Kennzahlen für eine Quelle innerhalb eines Transkripts.
+
+    ``median_score`` ist nur gesetzt, wenn der Bericht mit ``median=True``
+    erstellt wurde; sonst fehlt der Schlüssel auch in :meth:`to_dict`.
+    """
 
     source: str
     hits: int
     average_score: float
     max_score: float
+    median_score: Optional[float] = None
 
     def to_dict(self) -> Dict[str, object]:
-        return {
+        payload: Dict[str, object] = {
             "source": self.source,
             "hits": self.hits,
             "average_score": self.average_score,
             "max_score": self.max_score,
         }
+        if self.median_score is not None:
+            payload["median_score"] = self.median_score
+        return payload
+
+
+@dataclass(frozen=True)
+class StageLatency:
+    """Perzentile der Dauer eines Verarbeitungsschritts in Sekunden."""
+
+    stage: str
+    samples: int
+    p50: float
+    p90: float
+    p99: float
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            "stage": self.stage,
+            "samples": self.samples,
+            "p50": self.p50,
+            "p90": self.p90,
+            "p99": self.p99,
+        }
 
 
 @dataclass(frozen=True)
@@ -35,42 +84,144 @@ class TranscriptReport:
 
     stats: TranscriptStats
     sources: Tuple[SourceReport, ...]
+    latencies: Tuple[StageLatency, ...] = ()
 
     def to_dict(self) -> Dict[str, object]:
-        return {
+        payload: Dict[str, object] = {
             "stats": self.stats.to_dict(),
             "sources": [source.to_dict() for source in self.sources],
         }
+        if self.latencies:
+            payload["latencies"] = [latency.to_dict() for latency in self.latencies]
+        return payload
 
 
-def build_report(transcript: ChatTranscript) -> TranscriptReport:
+def build_report(transcript: ChatTranscript, *, median: bool = False) -> TranscriptReport:
     """Erstellt einen Bericht mit Kennzahlen zu einem Transcript."""
 
-    stats = transcript.stats()
-    if stats.turns == 0:
-        return TranscriptReport(stats=stats, sources=tuple())
-
-    buckets: Dict[str, List[float]] = {}
-    for turn in transcript.turns:
-        for idx, context in enumerate(turn.context):
-            source = str(context.metadata.get("source") or context.metadata.get("title") or context.chunk_id)
-            buckets.setdefault(source, []).append(context.score)
-
-    sources = tuple(
-        SourceReport(
-            source=source,
-            hits=len(scores),
-            average_score=round(mean(scores), 6),
-            max_score=round(max(scores), 6),
-        )
-        for source, scores in sorted(
-            buckets.items(),
-            key=lambda item: (len(item[1]), mean(item[1])),
+    return build_report_from_turns(transcript.turns, median=median)
+
+
+def build_report_from_turns(turns: Iterable[TranscriptTurn], *, median: bool = False) -> TranscriptReport:
+    """Erstellt den Bericht in einem Durchlauf über einen Strom von Runden."""
+
+    aggregator = ReportAggregator()
+    for turn in turns:
+        aggregator.add(turn)
+    return aggregator.report(median=median)
+
+
+class _SourceAggregate:
+    __slots__ = ("hits", "score_sum", "max_score", "sketch")
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.score_sum = 0.0
+        self.max_score = float("-inf")
+        self.sketch = QuantileSketch()
+
+    def add(self, score: float) -> None:
+        self.hits += 1
+        self.score_sum += score
+        if score > self.max_score:
+            self.max_score = score
+        self.sketch.add(max(score, 0.0))
+
+    def merge(self, other: "_SourceAggregate") -> None:
+        self.hits += other.hits
+        self.score_sum += other.score_sum
+        self.max_score = max(self.max_score, other.max_score)
+        self.sketch.merge(other.sketch)
+
+    @property
+    def mean(self) -> float:
+        return self.score_sum / self.hits
+
+
+class ReportAggregator(StatsAccumulator):
+    """Laufende Kennzahlen für :class:`TranscriptReport` ohne Liste aller Treffer.
+
+    Pro Quelle werden nur Anzahl, Summe, Maximum und eine
+    :class:`QuantileSketch` gehalten, pro Verarbeitungsschritt eine weitere
+    Skizze für die Laufzeiten. Der Speicherbedarf wächst damit mit der Zahl der
+    Quellen, nicht mit der Zahl der Runden. Teilergebnisse lassen sich über
+    :meth:`merge` zusammenführen.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._sources: Dict[str, _SourceAggregate] = {}
+        self._stages: Dict[str, QuantileSketch] = {}
+
+    def add(self, turn: TranscriptTurn) -> None:
+        super().add(turn)
+        for item in turn.context:
+            source = source_key(item)
+            aggregate = self._sources.get(source)
+            if aggregate is None:
+                aggregate = self._sources[source] = _SourceAggregate()
+            aggregate.add(item.score)
+        if turn.timings is not None:
+            for stage in TIMING_STAGES:
+                value = getattr(turn.timings, stage)
+                if value is not None:
+                    self._stage_sketch(stage).add(max(value, 0.0))
+
+    def merge(self, other: "ReportAggregator") -> None:
+        self.turns += other.turns
+        self.context_items += other.context_items
+        self.score_sum += other.score_sum
+        self.sources.update(other.sources)
+        self.prompt_tokens += other.prompt_tokens
+        self.max_prompt_tokens = max(self.max_prompt_tokens, other.max_prompt_tokens)
+        for source, aggregate in other._sources.items():
+            existing = self._sources.get(source)
+            if existing is None:
+                existing = self._sources[source] = _SourceAggregate()
+            existing.merge(aggregate)
+        for stage, sketch in other._stages.items():
+            self._stage_sketch(stage).merge(sketch)
+
+    def report(self, *, median: bool = False) -> TranscriptReport:
+        """Erstellt den Bericht; ``median`` ergänzt je Quelle den geschätzten Median-Score."""
+
+        stats = self.result()
+        if stats.turns == 0:
+            return TranscriptReport(stats=stats, sources=tuple())
+
+        ranked = sorted(
+            self._sources.items(),
+            key=lambda item: (item[1].hits, item[1].mean),
             reverse=True,
         )
-    )
+        sources = tuple(
+            SourceReport(
+                source=source,
+                hits=aggregate.hits,
+                average_score=round(aggregate.mean, 6),
+                max_score=round(aggregate.max_score, 6),
+                median_score=round(aggregate.sketch.quantile(0.5), 6) if median else None,
+            )
+            for source, aggregate in ranked
+        )
+        latencies = tuple(
+            StageLatency(
+                stage=stage,
+                samples=sketch.count,
+                p50=round(sketch.quantile(0.5), 6),
+                p90=round(sketch.quantile(0.9), 6),
+                p99=round(sketch.quantile(0.99), 6),
+            )
+            for stage in TIMING_STAGES
+            if (sketch := self._stages.get(stage)) is not None
+        )
+        return TranscriptReport(stats=stats, sources=sources, latencies=latencies)
 
-    return TranscriptReport(stats=stats, sources=sources)
+    def _stage_sketch(self, stage: str) -> QuantileSketch:
+        sketch = self._stages.get(stage)
+        if sketch is None:
+            sketch = self._stages[stage] = QuantileSketch()
+        return sketch
 
 
 def format_report(report: TranscriptReport, *, top_k: int = 5) -> str:
@@ -83,6 +234,8 @@ def format_report(report: TranscriptReport, *, top_k: int = 5) -> str:
         f"- Kontexttreffer: {stats.context_items}",
         f"- Durchschnittlicher Score: {stats.average_score}",
         f"- Einzigartige Quellen: {stats.unique_sources}",
+        f"- Prompt-Tokens (geschätzt): {stats.prompt_tokens} "
+        f"(⌀ {stats.average_prompt_tokens} pro Runde, Max: {stats.max_prompt_tokens})",
     ]
 
     if report.sources:
@@ -92,11 +245,22 @@ def format_report(report: TranscriptReport, *, top_k: int = 5) -> str:
             lines.append(
                 f"{position}. {source.source} – "
                 f"Treffer: {source.hits}, ⌀ Score: {source.average_score}, Max: {source.max_score}"
+                + (f", Median: {source.median_score}" if source.median_score is not None else "")
             )
     else:
         lines.append("")
         lines.append("Keine Kontexte im Protokoll vorhanden.")
 
+    if report.latencies:
+        lines.append("")
+        lines.append("Laufzeiten pro Schritt (ms):")
+        for latency in report.latencies:
+            label = STAGE_LABELS.get(latency.stage, latency.stage)
+            lines.append(
+                f"- {label}: p50 {latency.p50 * 1000:.2f}, p90 {latency.p90 * 1000:.2f}, "
+                f"p99 {latency.p99 * 1000:.2f} (n={latency.samples})"
+            )
+
     return "\n".join(lines)
 
 
@@ -106,11 +270,80 @@ def load_transcript(path: Path) -> ChatTranscript:
     return ChatTranscript.load(path)
 
 
-def load_report(path: Path) -> TranscriptReport:
-    """Lädt ein Transcript und gibt dessen Bericht zurück."""
+def load_report(path: Path, *, median: bool = False) -> TranscriptReport:
+    """Liest ein Transcript Runde für Runde und gibt dessen Bericht zurück."""
 
-    transcript = load_transcript(path)
-    return build_report(transcript)
+    return build_report_from_turns(iter_transcript_turns(path), median=median)
+
+
+def aggregate_transcript(path: Path) -> ReportAggregator:
+    """Liest ein Transcript und liefert dessen zusammenführbares Teilergebnis."""
+
+    aggregator = ReportAggregator()
+    for turn in iter_transcript_turns(path):
+        aggregator.add(turn)
+    return aggregator
+
+
+def load_reports(
+    paths: Sequence[Path],
+    *,
+    workers: Optional[int] = None,
+    median: bool = False,
+) -> TranscriptReport:
+    """Erstellt einen gemeinsamen Bericht über mehrere Transcripts.
+
+    Jede Datei wird in einem eigenen Prozess zu einem :class:`ReportAggregator`
+    verdichtet; die Teilergebnisse werden in der Reihenfolge von ``paths``
+    zusammengeführt, damit der Bericht unabhängig von der Prozessanzahl ist.
+    ``workers`` (Standard: Anzahl der CPU-Kerne) von 1 rechnet im aktuellen
+    Prozess. ``median`` wie bei :meth:`ReportAggregator.report`.
+    """
+
+    if not paths:
+        raise ValueError("Es wurde kein Transcript angegeben.")
+    if workers is not None and workers <= 0:
+        raise ValueError("workers muss größer als 0 sein.")
+    workers = min(workers or os.cpu_count() or 1, len(paths))
+
+    total = ReportAggregator()
+    if workers == 1:
+        for path in paths:
+            total.merge(aggregate_transcript(path))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for partial in executor.map(aggregate_transcript, paths):
+                total.merge(partial)
+    return total.report(median=median)
+
+
+def expand_transcript_paths(patterns: Iterable[str], *, pattern: str = TRANSCRIPT_GLOB) -> List[Path]:
+    """Löst Dateien, Verzeichnisse und Glob-Muster zu einer Liste von Transcripts auf.
+
+    Verzeichnisse werden rekursiv nach ``pattern`` durchsucht. Jede Datei
+    erscheint höchstens einmal, in sortierter Reihenfolge je Eintrag.
+    """
+
+    resolved: List[Path] = []
+    seen = set()
+    for entry in patterns:
+        path = Path(entry)
+        if path.is_dir():
+            matches = sorted(
+                candidate
+                for candidate in path.rglob(pattern)
+                if candidate.is_file() and candidate.suffix in _TRANSCRIPT_SUFFIXES
+            )
+        elif glob.has_magic(entry):
+            matches = sorted(Path(match) for match in glob.glob(entry, recursive=True) if Path(match).is_file())
+        else:
+            matches = [path]
+        for match in matches:
+            key = os.path.abspath(match)
+            if key not in seen:
+                seen.add(key)
+                resolved.append(match)
+    return resolved
 
 
 def report_from_json(text: str) -> TranscriptReport:
@@ -124,11 +357,18 @@ def report_from_json(text: str) -> TranscriptReport:
 
 
 __all__ = [
+    "ReportAggregator",
     "SourceReport",
+    "StageLatency",
+    "TRANSCRIPT_GLOB",
     "TranscriptReport",
+    "aggregate_transcript",
     "build_report",
+    "build_report_from_turns",
+    "expand_transcript_paths",
     "format_report",
     "load_transcript",
     "load_report",
+    "load_reports",
     "report_from_json",
 ]
@@ -2,19 +2,30 @@ from __future__ import annotations
 
 import json
 import math
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Tuple
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
 
 from .index_builder import TOKEN_RE
 
 
+@dataclass(frozen=True)
+class TermMatch:
+    """Fundstelle eines Suchterms im Chunk-Text (Zeichen-Offsets)."""
+
+    start: int
+    end: int
+    term: int
+    weight: float
+
+
 @dataclass(frozen=True)
 class SearchResult:
     chunk_id: str
     score: float
     text: str
     metadata: Dict[str, Any]
+    matches: Tuple[TermMatch, ...] = field(default=(), compare=False, repr=False)
 
 
 class SemanticIndex:
@@ -37,7 +48,22 @@ class SemanticIndex:
         return tuple(self._vocabulary)
 
     def search(self, query: str, *, top_k: int = 5, min_score: float = 0.0) -> List[SearchResult]:
-        query_vector = self._vectorise(query)
+        return self.search_vector(self.vectorise(query), top_k=top_k, min_score=min_score)
+
+    def vectorise(self, query: str) -> Dict[int, float]:
+        """Gewichteter TF-IDF-Vektor der Anfrage (Term-Index -> Gewicht)."""
+
+        return self._vectorise(query)
+
+    def search_vector(
+        self,
+        query_vector: Dict[int, float],
+        *,
+        top_k: int = 5,
+        min_score: float = 0.0,
+    ) -> List[SearchResult]:
+        """Sucht mit einem bereits über :meth:`vectorise` erzeugten Anfragevektor."""
+
         if not query_vector:
             return []
 
@@ -45,7 +71,7 @@ class SemanticIndex:
         if query_norm == 0.0:
             return []
 
-        results: List[SearchResult] = []
+        hits: List[Tuple[float, _IndexedChunk]] = []
         for chunk in self._chunks:
             if chunk.norm == 0.0:
                 continue
@@ -54,17 +80,19 @@ class SemanticIndex:
                 continue
             similarity = score / (chunk.norm * query_norm)
             if similarity >= min_score:
-                results.append(
-                    SearchResult(
-                        chunk_id=chunk.chunk_id,
-                        score=round(similarity, 6),
-                        text=chunk.text,
-                        metadata=dict(chunk.metadata),
-                    )
-                )
-
-        results.sort(key=lambda item: item.score, reverse=True)
-        return results[:top_k]
+                hits.append((round(similarity, 6), chunk))
+
+        hits.sort(key=lambda item: item[0], reverse=True)
+        return [
+            SearchResult(
+                chunk_id=chunk.chunk_id,
+                score=score,
+                text=chunk.text,
+                metadata=dict(chunk.metadata),
+                matches=chunk.matches(query_vector),
+            )
+            for score, chunk in hits[:top_k]
+        ]
 
     def _vectorise(self, text: str) -> Dict[int, float]:
         tokens = [token.lower() for token in TOKEN_RE.findall(text)]
@@ -92,6 +120,7 @@ class _IndexedChunk:
     metadata: Dict[str, Any]
     vector: Dict[int, float]
     norm: float
+    spans: Sequence[Sequence[int]] = ()
 
     @classmethod
     def from_payload(cls, payload: Dict[str, Any]) -> "_IndexedChunk":
@@ -109,6 +138,7 @@ class _IndexedChunk:
             metadata=dict(payload.get("metadata", {})),
             vector=vector,
             norm=float(payload.get("norm", 0.0)),
+            spans=payload.get("spans") or (),
         )
 
     def dot(self, other: Dict[int, float]) -> float:
@@ -118,3 +148,24 @@ class _IndexedChunk:
                 score += self.vector[index] * weight
         return score
 
+    def matches(self, query_vector: Dict[int, float]) -> Tuple[TermMatch, ...]:
+        """Fundstellen der Query-Terme aus den beim Indexieren gespeicherten Spannen.
+
+        Indizes ohne ``spans`` (ohne ``term_offsets`` gebaut oder älter)
+        liefern keine Fundstellen.
+        """
+
+        found: List[TermMatch] = []
+        text_length = len(self.text)
+        for entry in self.spans:
+            if not entry:
+                continue
+            term = int(entry[0])
+            weight = query_vector.get(term)
+            if weight is None:
+                continue
+            for position in range(1, len(entry) - 1, 2):
+                start, end = int(entry[position]), int(entry[position + 1])
+                found.append(TermMatch(start, min(end, text_length), term, weight))
+        found.sort(key=lambda item: item.start)
+        return tuple(found)
@@ -0,0 +1,287 @@
+from __future__ import annotations
+
+"""Verwaltung vieler Chat-Sitzungen mit Leerlauf-TTL, LRU-Verdrängung und optionaler Persistenz."""
+
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Generic, Iterable, List, Optional, Sequence, TypeVar
+
+from .chat import AsyncChatSession, BaseChatSession, ChatMessage, ChatSession, ChatTurn
+
+SessionT = TypeVar("SessionT", bound=BaseChatSession)
+
+
+@dataclass(frozen=True)
+class SessionStoreStats:
+    """Kennzahlen für das Monitoring eines :class:`ChatSessionStore`."""
+
+    sessions: int
+    bytes: int
+    evictions: Dict[str, int]
+    restored: int
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            "sessions": self.sessions,
+            "bytes": self.bytes,
+            "evictions": dict(self.evictions),
+            "restored": self.restored,
+        }
+
+
+@dataclass
+class _Entry(Generic[SessionT]):
+    session: SessionT
+    last_used: float
+    size: int = 0
+
+
+@dataclass
+class _Counters:
+    evictions: Dict[str, int] = field(default_factory=lambda: {"idle": 0, "capacity": 0, "bytes": 0})
+    restored: int = 0
+
+
+class ChatSessionStore(Generic[SessionT]):
+    """Hält Chat-Sitzungen pro Session-ID und verdrängt ungenutzte Sitzungen.
+
+    Sitzungen werden über ``factory`` erzeugt. Im Speicher bleiben höchstens
+    ``max_sessions`` Sitzungen bzw. ``max_bytes`` Verlaufstext; darüber hinaus
+    und nach ``idle_ttl`` Sekunden ohne Zugriff werden die am längsten
+    ungenutzten Sitzungen entfernt. Mit ``persist_path`` wird der Verlauf nach
+    jeder Runde kompakt in SQLite geschrieben und beim nächsten Zugriff
+    wiederhergestellt – auch nach einem Neustart. :meth:`asend` schreibt dabei
+    in einem Worker-Thread, damit die Event-Loop nicht auf den Commit wartet.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], SessionT],
+        *,
+        idle_ttl: Optional[float] = 1800.0,
+        max_sessions: Optional[int] = 1000,
+        max_bytes: Optional[int] = None,
+        persist_path: Optional[Path] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if idle_ttl is not None and idle_ttl <= 0:
+            raise ValueError("idle_ttl muss größer als 0 sein.")
+        if max_sessions is not None and max_sessions <= 0:
+            raise ValueError("max_sessions muss größer als 0 sein.")
+        if max_bytes is not None and max_bytes <= 0:
+            raise ValueError("max_bytes muss größer als 0 sein.")
+
+        self._factory = factory
+        self._idle_ttl = idle_ttl
+        self._max_sessions = max_sessions
+        self._max_bytes = max_bytes
+        self._clock = clock
+        self._entries: "OrderedDict[str, _Entry[SessionT]]" = OrderedDict()
+        self._bytes = 0
+        self._counters = _Counters()
+        self._lock = threading.Lock()
+        # Eigene Sperre für SQLite, damit ein laufender Commit keine Zugriffe auf den Speicher blockiert.
+        self._db_lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        if persist_path is not None:
+            persist_path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(persist_path), check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS chat_sessions ("
+                "id TEXT PRIMARY KEY, history TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, session_id: object) -> bool:
+        return session_id in self._entries
+
+    def get(self, session_id: str) -> SessionT:
+        """Liefert die Sitzung zu ``session_id`` und legt sie bei Bedarf an."""
+
+        if not session_id:
+            raise ValueError("Die Session-ID darf nicht leer sein.")
+        with self._lock:
+            now = self._clock()
+            self._evict_idle(now)
+            entry = self._entries.get(session_id)
+            if entry is not None:
+                entry.last_used = now
+                self._entries.move_to_end(session_id)
+                return entry.session
+
+            session = self._factory()
+            history = self._load_persisted(session_id)
+            if history:
+                session.load_history(history)
+                self._counters.restored += 1
+            entry = _Entry(session=session, last_used=now, size=_history_size(session.history))
+            self._entries[session_id] = entry
+            self._bytes += entry.size
+            self._enforce_limits(keep=session_id)
+            return session
+
+    def send(self, session_id: str, user_message: str) -> ChatTurn:
+        """Schickt eine Nachricht über eine synchrone :class:`ChatSession`."""
+
+        session = self.get(session_id)
+        if not isinstance(session, ChatSession):
+            raise TypeError("send() erfordert eine ChatSession; für AsyncChatSession asend() verwenden.")
+        turn = session.send(user_message)
+        self._persist(session_id, self._after_turn(session_id, session), time.time())
+        return turn
+
+    async def asend(self, session_id: str, user_message: str) -> ChatTurn:
+        """Schickt eine Nachricht über eine :class:`AsyncChatSession`."""
+
+        session = self.get(session_id)
+        if not isinstance(session, AsyncChatSession):
+            raise TypeError("asend() erfordert eine AsyncChatSession; für ChatSession send() verwenden.")
+        turn = await session.asend(user_message)
+        history = self._after_turn(session_id, session)
+        if self._db is not None:
+            await asyncio.to_thread(self._persist, session_id, history, time.time())
+        return turn
+
+    def discard(self, session_id: str) -> None:
+        """Entfernt eine Sitzung aus Speicher und Persistenz."""
+
+        with self._lock:
+            entry = self._entries.pop(session_id, None)
+            if entry is not None:
+                self._bytes -= entry.size
+        with self._db_lock:
+            if self._db is not None:
+                self._db.execute("DELETE FROM chat_sessions WHERE id = ?", (session_id,))
+                self._db.commit()
+
+    def prune(self, *, persisted_older_than: Optional[float] = None) -> None:
+        """Verdrängt abgelaufene Sitzungen; optional auch alte persistierte Verläufe (Sekunden)."""
+
+        with self._lock:
+            self._evict_idle(self._clock())
+        with self._db_lock:
+            if self._db is not None and persisted_older_than is not None:
+                self._db.execute(
+                    "DELETE FROM chat_sessions WHERE updated_at < ?",
+                    (time.time() - persisted_older_than,),
+                )
+                self._db.commit()
+
+    def stats(self) -> SessionStoreStats:
+        with self._lock:
+            return SessionStoreStats(
+                sessions=len(self._entries),
+                bytes=self._bytes,
+                evictions=dict(self._counters.evictions),
+                restored=self._counters.restored,
+            )
+
+    def close(self) -> None:
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def _after_turn(self, session_id: str, session: SessionT) -> Sequence[ChatMessage]:
+        """Aktualisiert Größe und LRU-Position und liefert den Verlauf für :meth:`_persist`."""
+
+        history = session.history
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is not None and entry.session is session:
+                size = _history_size(history)
+                self._bytes += size - entry.size
+                entry.size = size
+                entry.last_used = self._clock()
+                self._entries.move_to_end(session_id)
+            self._enforce_limits(keep=session_id)
+        return history
+
+    def _persist(self, session_id: str, history: Sequence[ChatMessage], updated_at: float) -> None:
+        with self._db_lock:
+            if self._db is None:
+                return
+            # Schreibvorgänge aus Worker-Threads können sich überholen; ein älterer Stand gewinnt nie.
+            self._db.execute(
+                "INSERT INTO chat_sessions (id, history, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET history = excluded.history, updated_at = excluded.updated_at "
+                "WHERE excluded.updated_at >= chat_sessions.updated_at",
+                (session_id, _encode_history(history), updated_at),
+            )
+            self._db.commit()
+
+    def _evict_idle(self, now: float) -> None:
+        if self._idle_ttl is None:
+            return
+        while self._entries:
+            session_id, entry = next(iter(self._entries.items()))
+            if now - entry.last_used < self._idle_ttl:
+                break
+            self._evict(session_id, "idle")
+
+    def _enforce_limits(self, *, keep: str) -> None:
+        while self._max_sessions is not None and len(self._entries) > self._max_sessions:
+            if not self._evict_oldest(keep, "capacity"):
+                break
+        while self._max_bytes is not None and self._bytes > self._max_bytes:
+            if not self._evict_oldest(keep, "bytes"):
+                break
+
+    def _evict_oldest(self, keep: str, reason: str) -> bool:
+        for session_id in self._entries:
+            if session_id != keep:
+                self._evict(session_id, reason)
+                return True
+        return False
+
+    def _evict(self, session_id: str, reason: str) -> None:
+        entry = self._entries.pop(session_id)
+        self._bytes -= entry.size
+        self._counters.evictions[reason] += 1
+
+    def _load_persisted(self, session_id: str) -> List[ChatMessage]:
+        with self._db_lock:
+            if self._db is None:
+                return []
+            row = self._db.execute("SELECT history FROM chat_sessions WHERE id = ?", (session_id,)).fetchone()
+        if row is None:
+            return []
+        return _decode_history(row[0])
+
+
+def _history_size(history: Iterable[ChatMessage]) -> int:
+    return sum(len(message.role) + len(message.content.encode("utf-8")) for message in history)
+
+
+def _encode_history(history: Iterable[ChatMessage]) -> str:
+    return json.dumps(
+        [[message.role, message.content] for message in history],
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+
+
+def _decode_history(raw: str) -> List[ChatMessage]:
+    try:
+        items = json.loads(raw)
+    except json.JSONDecodeError:
+        return []
+    if not isinstance(items, list):
+        return []
+    return [
+        ChatMessage(role=str(item[0]), content=str(item[1]))
+        for item in items
+        if isinstance(item, list) and len(item) == 2
+    ]
+
+
+__all__ = ["ChatSessionStore", "SessionStoreStats"]
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+"""Mergebare Quantil-Skizze mit begrenztem Speicherbedarf."""
+
+import math
+from typing import Dict, Optional
+
+
+class QuantileSketch:
+    """Schätzt Quantile nicht-negativer Werte mit relativem Fehler ``relative_accuracy``.
+
+    Werte landen in logarithmisch wachsenden Buckets (wie bei DDSketch); zwei
+    Skizzen lassen sich durch Addieren der Bucket-Zähler verlustfrei
+    zusammenführen. Übersteigt die Anzahl der Buckets ``max_buckets``, werden
+    die kleinsten Buckets zusammengelegt, sodass nur die unteren Quantile an
+    Genauigkeit verlieren.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01, max_buckets: int = 2048) -> None:
+        if not 0.0 < relative_accuracy < 1.0:
+            raise ValueError("relative_accuracy muss zwischen 0 und 1 liegen.")
+        if max_buckets < 2:
+            raise ValueError("max_buckets muss mindestens 2 sein.")
+        self.relative_accuracy = relative_accuracy
+        self.max_buckets = max_buckets
+        self._gamma = (1.0 + relative_accuracy) / (1.0 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self._buckets: Dict[int, int] = {}
+        self._zeros = 0
+        self.count = 0
+        self.minimum: Optional[float] = None
+        self.maximum: Optional[float] = None
+
+    def add(self, value: float) -> None:
+        if value < 0 or math.isnan(value):
+            raise ValueError("QuantileSketch erwartet nicht-negative Werte.")
+        self.count += 1
+        self.minimum = value if self.minimum is None else min(self.minimum, value)
+        self.maximum = value if self.maximum is None else max(self.maximum, value)
+        if value == 0.0:
+            self._zeros += 1
+            return
+        key = math.ceil(math.log(value) / self._log_gamma)
+        self._buckets[key] = self._buckets.get(key, 0) + 1
+        if len(self._buckets) > self.max_buckets:
+            self._collapse()
+
+    def merge(self, other: "QuantileSketch") -> None:
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Nur Skizzen mit gleicher Genauigkeit lassen sich zusammenführen.")
+        for key, count in other._buckets.items():
+            self._buckets[key] = self._buckets.get(key, 0) + count
+        self._zeros += other._zeros
+        self.count += other.count
+        if other.minimum is not None:
+            self.minimum = other.minimum if self.minimum is None else min(self.minimum, other.minimum)
+        if other.maximum is not None:
+            self.maximum = other.maximum if self.maximum is None else max(self.maximum, other.maximum)
+        if len(self._buckets) > self.max_buckets:
+            self._collapse()
+
+    def quantile(self, q: float) -> float:
+        """Quantil ``q`` (0–1) nach der Nearest-Rank-Methode; 0.0 für leere Skizzen."""
+
+        if not 0.0 <= q <= 1.0:
+            raise ValueError("q muss zwischen 0 und 1 liegen.")
+        if self.count == 0:
+            return 0.0
+        rank = max(1, math.ceil(q * self.count))
+        if rank == self.count:
+            return self.maximum or 0.0
+        if rank <= self._zeros:
+            return 0.0
+        seen = self._zeros
+        for key in sorted(self._buckets):
+            seen += self._buckets[key]
+            if seen >= rank:
+                estimate = 2.0 * self._gamma ** key / (self._gamma + 1.0)
+                # Die exakten Extremwerte sind bekannt und schärfen die Ränder.
+                return min(max(estimate, self.minimum or 0.0), self.maximum or estimate)
+        return self.maximum or 0.0
+
+    def _collapse(self) -> None:
+        keys = sorted(self._buckets)
+        excess = len(keys) - self.max_buckets
+        target = keys[excess]
+        for key in keys[:excess]:
+            self._buckets[target] += self._buckets.pop(key)
+
+
+__all__ = ["QuantileSketch"]
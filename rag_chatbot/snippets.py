@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+"""Auswahl des Textausschnitts, der die Suchanfrage am besten abdeckt."""
+
+from typing import Dict, Sequence
+
+from .retrieval import TermMatch
+
+DEFAULT_SNIPPET_CHARS = 420
+
+_REPEAT_FACTOR = 0.1
+_ELLIPSIS = "…"
+
+
+def extract_snippet(text: str, matches: Sequence[TermMatch], budget: int = DEFAULT_SNIPPET_CHARS) -> str:
+    """Liefert höchstens ``budget`` Zeichen aus ``text`` rund um die Fundstellen.
+
+    Bewertet wird jedes Fenster nach den Gewichten der enthaltenen Query-Terme;
+    jeder Term zählt beim ersten Vorkommen voll und danach nur noch zu einem
+    Bruchteil, damit Fenster mit vielen verschiedenen Termen gewinnen. Die
+    ``matches`` müssen nach ``start`` sortiert sein. Passt der Text nach dem
+    Zusammenfassen der Leerzeichen ins Budget, wird er ganz zurückgegeben.
+    Ohne Fundstellen wird wie bisher der Anfang des Textes verwendet.
+    """
+
+    if budget <= 0:
+        raise ValueError("budget muss größer als 0 sein.")
+    condensed = _condense(text)
+    if len(condensed) <= budget:
+        return condensed
+    if not matches:
+        return _clip(text, 0, budget - 1, leading=False)
+
+    window = budget - 2  # Platz für Auslassungszeichen an beiden Enden
+    best_score = -1.0
+    best_first = best_last = 0
+    counts: Dict[int, int] = {}
+    score = 0.0
+    first = 0
+    for last, match in enumerate(matches):
+        score += _add(counts, match)
+        while matches[first].start < match.end - window:
+            score -= _remove(counts, matches[first])
+            first += 1
+        if score > best_score:
+            best_score, best_first, best_last = score, first, last
+
+    span_start = matches[best_first].start
+    span_end = matches[best_last].end
+    # Den Rest des Budgets gleichmäßig vor und hinter die Fundstellen legen.
+    start = max(0, span_start - (window - (span_end - span_start)) // 2)
+    end = min(len(text), start + window)
+    start = max(0, end - window)
+    return _clip(text, start, end, leading=start > 0)
+
+
+def _add(counts: Dict[int, int], match: TermMatch) -> float:
+    seen = counts.get(match.term, 0)
+    counts[match.term] = seen + 1
+    return match.weight if seen == 0 else match.weight * _REPEAT_FACTOR
+
+
+def _remove(counts: Dict[int, int], match: TermMatch) -> float:
+    seen = counts[match.term] - 1
+    counts[match.term] = seen
+    return match.weight if seen == 0 else match.weight * _REPEAT_FACTOR
+
+
+def _clip(text: str, start: int, end: int, *, leading: bool) -> str:
+    """Schneidet an Wortgrenzen und kennzeichnet Auslassungen."""
+
+    if leading:
+        while start < end and not text[start - 1].isspace():
+            start += 1
+    trailing = end < len(text)
+    if trailing:
+        boundary = end
+        while boundary > start and not text[boundary].isspace():
+            boundary -= 1
+        if boundary > start:
+            end = boundary
+    snippet = _condense(text[start:end])
+    if leading:
+        snippet = _ELLIPSIS + snippet
+    if trailing:
+        snippet += _ELLIPSIS
+    return snippet
+
+
+def _condense(text: str) -> str:
+    return " ".join(text.split())
+
+
+__all__ = ["DEFAULT_SNIPPET_CHARS", "extract_snippet"]
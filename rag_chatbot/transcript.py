@@ -2,12 +2,15 @@ from __future__ import annotations
 
 """Werkzeuge zum Aufzeichnen und Auswerten von Chatverläufen."""
 
+import hashlib
 import json
+import os
+import threading
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, Iterable, List, Mapping, Sequence, Set, Tuple
+from typing import IO, Dict, Iterable, Iterator, List, Mapping, Optional, Protocol, Sequence, Set, Tuple
 
-from .chat import ChatMessage, ChatTurn
+from .chat import ChatMessage, ChatTurn, TurnTimings, estimate_tokens
 from .retrieval import SearchResult
 
 
@@ -38,11 +41,11 @@ class TranscriptContext:
         }
 
     @classmethod
-    def from_dict(cls, data: Mapping[str, object]) -> "TranscriptContext":
+    def from_dict(cls, data: Mapping[str, object], table: Optional["_InternTable"] = None) -> "TranscriptContext":
         try:
             chunk_id = str(data["chunk_id"])
             score = float(data["score"])
-            text = str(data["text"])
+            text = _resolve_text(data["text"], table)
         except KeyError as exc:  # pragma: no cover - defensive programming
             raise KeyError(f"Fehlender Schlüssel im Kontext: {exc}") from exc
         metadata_raw = data.get("metadata")
@@ -61,6 +64,9 @@ class TranscriptTurn:
     response: str
     context: Tuple[TranscriptContext, ...]
     prompt_messages: Tuple[ChatMessage, ...]
+    prompt_chars: int = 0
+    prompt_tokens: int = 0
+    timings: Optional[TurnTimings] = None
 
     @classmethod
     def from_prompt(cls, question: str, turn: ChatTurn) -> "TranscriptTurn":
@@ -75,10 +81,13 @@ class TranscriptTurn:
             response=turn.response,
             context=context,
             prompt_messages=prompt_messages,
+            prompt_chars=turn.prompt.chars,
+            prompt_tokens=turn.prompt.estimated_tokens,
+            timings=turn.timings,
         )
 
     def to_dict(self) -> Dict[str, object]:
-        return {
+        payload: Dict[str, object] = {
             "question": self.question,
             "response": self.response,
             "context": [item.to_dict() for item in self.context],
@@ -89,13 +98,20 @@ class TranscriptTurn:
                 }
                 for message in self.prompt_messages
             ],
+            "prompt_chars": self.prompt_chars,
+            "prompt_tokens": self.prompt_tokens,
         }
+        if self.timings is not None:
+            payload["timings"] = self.timings.to_dict()
+        return payload
 
     @classmethod
-    def from_dict(cls, data: Mapping[str, object]) -> "TranscriptTurn":
+    def from_dict(cls, data: Mapping[str, object], table: Optional["_InternTable"] = None) -> "TranscriptTurn":
+        """Liest eine Runde; mit ``table`` dürfen Texte und Nachrichten als IDs referenziert sein."""
+
         try:
-            question = str(data["question"])
-            response = str(data["response"])
+            question = _resolve_text(data["question"], table)
+            response = _resolve_text(data["response"], table)
         except KeyError as exc:  # pragma: no cover - defensive programming
             raise KeyError(f"Fehlender Schlüssel in TranscriptTurn: {exc}") from exc
 
@@ -105,24 +121,38 @@ class TranscriptTurn:
             context_items = [item for item in raw_context if isinstance(item, Mapping)]
         else:
             context_items = []
-        context = tuple(TranscriptContext.from_dict(item) for item in context_items)
+        context = tuple(TranscriptContext.from_dict(item, table) for item in context_items)
 
-        prompt_items: Sequence[Mapping[str, object]]
+        prompt_messages: List[ChatMessage] = []
         raw_prompt = data.get("prompt", [])
         if isinstance(raw_prompt, Sequence):
-            prompt_items = [item for item in raw_prompt if isinstance(item, Mapping)]
-        else:
-            prompt_items = []
-        prompt_messages = tuple(
-            ChatMessage(role=str(item.get("role", "")), content=str(item.get("content", "")))
-            for item in prompt_items
-        )
+            for item in raw_prompt:
+                if isinstance(item, Mapping):
+                    prompt_messages.append(
+                        ChatMessage(role=str(item.get("role", "")), content=str(item.get("content", "")))
+                    )
+                elif isinstance(item, int) and table is not None:
+                    prompt_messages.append(table.message(item))
+
+        # Ältere Transkripte enthalten keine Prompt-Größen; sie lassen sich aus dem Prompt ableiten.
+        prompt_chars = _optional_int(data.get("prompt_chars"))
+        if prompt_chars is None:
+            prompt_chars = sum(len(message.content) for message in prompt_messages)
+        prompt_tokens = _optional_int(data.get("prompt_tokens"))
+        if prompt_tokens is None:
+            prompt_tokens = sum(estimate_tokens(message.content) for message in prompt_messages)
+
+        raw_timings = data.get("timings")
+        timings = TurnTimings.from_dict(raw_timings) if isinstance(raw_timings, Mapping) else None
 
         return cls(
             question=question,
             response=response,
             context=context,
-            prompt_messages=prompt_messages,
+            prompt_messages=tuple(prompt_messages),
+            prompt_chars=prompt_chars,
+            prompt_tokens=prompt_tokens,
+            timings=timings,
         )
 
 
@@ -134,6 +164,9 @@ class TranscriptStats:
     context_items: int
     average_score: float
     unique_sources: int
+    prompt_tokens: int = 0
+    average_prompt_tokens: float = 0.0
+    max_prompt_tokens: int = 0
 
     def to_dict(self) -> Dict[str, object]:
         return {
@@ -141,6 +174,9 @@ class TranscriptStats:
             "context_items": self.context_items,
             "average_score": self.average_score,
             "unique_sources": self.unique_sources,
+            "prompt_tokens": self.prompt_tokens,
+            "average_prompt_tokens": self.average_prompt_tokens,
+            "max_prompt_tokens": self.max_prompt_tokens,
         }
 
 
@@ -165,41 +201,43 @@ class ChatTranscript:
         self._turns.clear()
 
     def stats(self) -> TranscriptStats:
-        if not self._turns:
-            return TranscriptStats(turns=0, context_items=0, average_score=0.0, unique_sources=0)
-
-        scores: List[float] = []
-        sources: Set[str] = set()
+        accumulator = StatsAccumulator()
         for turn in self._turns:
-            for item in turn.context:
-                scores.append(item.score)
-                metadata = item.metadata
-                source = str(
-                    metadata.get("source")
-                    or metadata.get("title")
-                    or item.chunk_id
-                )
-                sources.add(source)
-
-        average = sum(scores) / len(scores) if scores else 0.0
-        return TranscriptStats(
-            turns=len(self._turns),
-            context_items=len(scores),
-            average_score=round(average, 6),
-            unique_sources=len(sources),
-        )
-
-    def to_dict(self, *, include_stats: bool = True) -> Dict[str, object]:
-        payload: Dict[str, object] = {
-            "turns": [turn.to_dict() for turn in self._turns],
-        }
+            accumulator.add(turn)
+        return accumulator.result()
+
+    def to_dict(self, *, include_stats: bool = True, compact: bool = False) -> Dict[str, object]:
+        """Serialisiert das Transcript.
+
+        Mit ``compact=True`` werden Nachrichten und Texte, die in mehreren
+        Runden vorkommen (System-Prompt, Verlauf, Chunk-Texte), nur einmal in
+        den Tabellen ``texts`` und ``messages`` abgelegt und in den Runden per
+        Index referenziert. :meth:`from_dict` liest beide Varianten verlustfrei.
+        """
+
+        if compact:
+            interner = _Interner()
+            turns = [interner.encode_turn(turn) for turn in self._turns]
+            definitions = interner.take_definitions()
+            payload: Dict[str, object] = {
+                "format": TRANSCRIPT_FORMAT,
+                "version": TRANSCRIPT_COMPACT_VERSION,
+                "texts": definitions["texts"],
+                "messages": definitions["messages"],
+                "turns": turns,
+            }
+        else:
+            payload = {"turns": [turn.to_dict() for turn in self._turns]}
         if include_stats:
             payload["stats"] = self.stats().to_dict()
         return payload
 
-    def save(self, path: Path, *, include_stats: bool = True) -> None:
-        payload = self.to_dict(include_stats=include_stats)
-        text = json.dumps(payload, ensure_ascii=False, indent=2)
+    def save(self, path: Path, *, include_stats: bool = True, compact: bool = False) -> None:
+        payload = self.to_dict(include_stats=include_stats, compact=compact)
+        if compact:
+            text = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+        else:
+            text = json.dumps(payload, ensure_ascii=False, indent=2)
         path.write_text(text + "\n", encoding="utf-8")
 
     @classmethod
@@ -207,9 +245,13 @@ class ChatTranscript:
         raw_turns = data.get("turns")
         if not isinstance(raw_turns, Sequence):
             raise ValueError("Ungültiges Transcript: 'turns' fehlt oder hat das falsche Format.")
+        table: Optional[_InternTable] = None
+        if "texts" in data or "messages" in data:
+            table = _InternTable()
+            table.define(data)
         transcript = cls()
         transcript.extend(
-            TranscriptTurn.from_dict(item)
+            TranscriptTurn.from_dict(item, table)
             for item in raw_turns
             if isinstance(item, Mapping)
         )
@@ -217,15 +259,428 @@ class ChatTranscript:
 
     @classmethod
     def load(cls, path: Path) -> "ChatTranscript":
-        data = json.loads(path.read_text(encoding="utf-8"))
+        """Lädt ein Transcript im JSON- oder JSONL-Format (siehe :func:`iter_transcript_turns`)."""
+
+        transcript = cls()
+        transcript.extend(iter_transcript_turns(path))
+        return transcript
+
+
+class TranscriptSink(Protocol):
+    """Ziel für protokollierte Chat-Runden, z. B. :class:`ChatTranscript` oder :class:`TranscriptWriter`."""
+
+    def record(self, question: str, turn: ChatTurn) -> None:  # pragma: no cover - Signatur
+        ...
+
+
+TRANSCRIPT_FORMAT = "rag-transcript"
+TRANSCRIPT_VERSION = 1
+TRANSCRIPT_COMPACT_VERSION = 2
+
+
+class TranscriptWriter:
+    """Schreibt jede Runde sofort als kompakte JSON-Zeile an eine JSONL-Datei an.
+
+    Die erste Zeile ist ein Kopfdatensatz mit Format und Version. Zeilen werden
+    gepuffert und nach ``flush_every`` Runden gemeinsam geschrieben und (mit
+    ``fsync=True``) auf den Datenträger gebracht; bei einem Absturz gehen also
+    höchstens die Runden seit dem letzten Flush verloren. Im Speicher bleiben
+    nur laufende Kennzahlen, nicht die Runden selbst.
+
+    Mit ``compact=True`` (Standard) werden wiederkehrende Nachrichten und
+    Texte nur beim ersten Auftreten in einer Definitionszeile geschrieben und
+    danach per Index referenziert; gemerkt werden dafür nur Hashes.
+
+    :meth:`write`, :meth:`flush` und :meth:`close` dürfen aus mehreren Threads
+    aufgerufen werden, z. B. von :class:`AsyncChatSession` über
+    ``asyncio.to_thread``.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        *,
+        append: bool = False,
+        flush_every: int = 16,
+        fsync: bool = True,
+        compact: bool = True,
+    ) -> None:
+        if flush_every <= 0:
+            raise ValueError("flush_every muss größer als 0 sein.")
+        self._path = path
+        self._flush_every = flush_every
+        self._fsync = fsync
+        self._lock = threading.RLock()
+        self._pending: List[str] = []
+        self._pending_turns = 0
+        self._stats = StatsAccumulator()
+        self._interner: Optional[_Interner] = _Interner() if compact else None
+        path.parent.mkdir(parents=True, exist_ok=True)
+        has_content = append and path.exists() and path.stat().st_size > 0
+        if has_content and self._interner is not None:
+            # Neue Referenzen müssen an die Tabellen der vorhandenen Datei anschließen.
+            self._interner.prime(path)
+        self._handle: Optional[IO[str]] = path.open("a" if append else "w", encoding="utf-8")
+        if not has_content:
+            version = TRANSCRIPT_COMPACT_VERSION if compact else TRANSCRIPT_VERSION
+            self._handle.write(_dump_line({"format": TRANSCRIPT_FORMAT, "version": version}))
+            self._handle.flush()
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    def record(self, question: str, turn: ChatTurn) -> None:
+        self.write(TranscriptTurn.from_prompt(question, turn))
+
+    def write(self, turn: TranscriptTurn) -> None:
+        with self._lock:
+            if self._handle is None:
+                raise ValueError("Der TranscriptWriter wurde bereits geschlossen.")
+            if self._interner is not None:
+                record = self._interner.encode_turn(turn)
+                definitions = self._interner.take_definitions()
+                if definitions["texts"] or definitions["messages"]:
+                    self._pending.append(_dump_line(definitions))
+                self._pending.append(_dump_line(record))
+            else:
+                self._pending.append(_dump_line(turn.to_dict()))
+            self._stats.add(turn)
+            self._pending_turns += 1
+            if self._pending_turns >= self._flush_every:
+                self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._handle is None or not self._pending:
+                return
+            self._handle.write("".join(self._pending))
+            self._pending.clear()
+            self._pending_turns = 0
+            self._handle.flush()
+            if self._fsync:
+                os.fsync(self._handle.fileno())
+
+    def stats(self) -> TranscriptStats:
+        """Kennzahlen über alle in dieser Sitzung geschriebenen Runden."""
+
+        return self._stats.result()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._handle is None:
+                return
+            self.flush()
+            self._handle.close()
+            self._handle = None
+
+    def __enter__(self) -> "TranscriptWriter":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+
+def iter_transcript_turns(path: Path) -> Iterator[TranscriptTurn]:
+    """Liest die Runden eines Transcripts nacheinander, ohne die Datei als Ganzes zu parsen.
+
+    Unterstützt werden das JSONL-Format des :class:`TranscriptWriter` und das
+    bisherige JSON-Format von :meth:`ChatTranscript.save`.
+    """
+
+    with path.open("r", encoding="utf-8") as handle:
+        first_line = ""
+        for line in handle:
+            if line.strip():
+                first_line = line
+                break
+        if not first_line:
+            raise ValueError("Die Transcript-Datei ist leer.")
+        try:
+            first = json.loads(first_line)
+        except json.JSONDecodeError:
+            first = None
+
+        if isinstance(first, Mapping) and "turns" not in first:
+            yield from _iter_jsonl_turns(first, handle)
+            return
+
+        handle.seek(0)
+        yield from _iter_json_turns(handle)
+
+
+def _iter_jsonl_turns(first: Mapping[str, object], handle: IO[str]) -> Iterator[TranscriptTurn]:
+    table = _InternTable()
+    for record in _iter_jsonl_records(first, handle):
+        if "question" in record:
+            yield TranscriptTurn.from_dict(record, table)
+        else:
+            table.define(record)
+
+
+def _iter_jsonl_records(first: Mapping[str, object], handle: IO[str]) -> Iterator[Mapping[str, object]]:
+    records: Iterable[object] = (json.loads(line) for line in handle if line.strip())
+    for record in _prepend(first, records):
+        if not isinstance(record, Mapping):
+            raise ValueError("Ungültige Transcript-Zeile: JSON-Objekt erwartet.")
+        if "format" in record:
+            if record.get("format") != TRANSCRIPT_FORMAT:
+                raise ValueError(f"Unbekanntes Transcript-Format: {record.get('format')!r}")
+            continue
+        yield record
+
+
+def _prepend(first: object, rest: Iterable[object]) -> Iterator[object]:
+    yield first
+    yield from rest
+
+
+_READ_SIZE = 1 << 16
+
+
+def _iter_json_turns(handle: IO[str]) -> Iterator[TranscriptTurn]:
+    """Dekodiert das ``turns``-Array eines JSON-Transcripts Element für Element."""
+
+    stream = _JsonStream(handle)
+    if not (stream.consume("{") and stream.consume('"turns"') and stream.consume(":") and stream.consume("[")):
+        # Unerwartete Struktur, z. B. andere Schlüsselreihenfolge: klassisch komplett laden.
+        handle.seek(0)
+        data = json.load(handle)
         if not isinstance(data, Mapping):
             raise ValueError("Die Transcript-Datei enthält kein JSON-Objekt.")
-        return cls.from_dict(data)
+        yield from ChatTranscript.from_dict(data).turns
+        return
+
+    if stream.consume("]"):
+        return
+    while True:
+        item = stream.decode()
+        if isinstance(item, Mapping):
+            yield TranscriptTurn.from_dict(item)
+        if stream.consume(","):
+            continue
+        if stream.consume("]"):
+            return
+        raise ValueError("Ungültiges Transcript: ',' oder ']' im Array 'turns' erwartet.")
+
+
+class _JsonStream:
+    """Minimaler Lesepuffer für schrittweises Dekodieren großer JSON-Dateien."""
+
+    def __init__(self, handle: IO[str]) -> None:
+        self._handle = handle
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._position = 0
+        self._eof = False
+
+    def _fill(self) -> bool:
+        if self._eof:
+            return False
+        chunk = self._handle.read(_READ_SIZE)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buffer = self._buffer[self._position:] + chunk
+        self._position = 0
+        return True
+
+    def _skip_whitespace(self) -> None:
+        while True:
+            while self._position < len(self._buffer) and self._buffer[self._position].isspace():
+                self._position += 1
+            if self._position < len(self._buffer) or not self._fill():
+                return
+
+    def consume(self, literal: str) -> bool:
+        self._skip_whitespace()
+        while len(self._buffer) - self._position < len(literal) and self._fill():
+            pass
+        if self._buffer.startswith(literal, self._position):
+            self._position += len(literal)
+            return True
+        return False
+
+    def decode(self) -> object:
+        self._skip_whitespace()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._position)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            self._position = end
+            return value
+
+
+class _InternTable:
+    """Tabellen eines kompakten Transcripts beim Lesen: Texte und Nachrichten nach Index."""
+
+    def __init__(self) -> None:
+        self.texts: List[str] = []
+        self.messages: List[ChatMessage] = []
+
+    def define(self, record: Mapping[str, object]) -> None:
+        texts = record.get("texts")
+        if isinstance(texts, Sequence) and not isinstance(texts, str):
+            self.texts.extend(str(text) for text in texts)
+        messages = record.get("messages")
+        if isinstance(messages, Sequence) and not isinstance(messages, str):
+            for item in messages:
+                if not isinstance(item, Sequence) or len(item) != 2:
+                    raise ValueError("Ungültiger Nachrichteneintrag im kompakten Transcript.")
+                # Gemeinsame Instanzen sparen beim Laden Speicher und Zeit.
+                self.messages.append(ChatMessage(role=str(item[0]), content=self.text(item[1])))
+
+    def text(self, index: object) -> str:
+        if isinstance(index, bool) or not isinstance(index, int) or not 0 <= index < len(self.texts):
+            raise ValueError(f"Unbekannte Text-Referenz im Transcript: {index!r}")
+        return self.texts[index]
+
+    def message(self, index: int) -> ChatMessage:
+        if not 0 <= index < len(self.messages):
+            raise ValueError(f"Unbekannte Nachrichten-Referenz im Transcript: {index!r}")
+        return self.messages[index]
+
+
+class _Interner:
+    """Vergibt beim Schreiben Indizes für Texte und Nachrichten.
+
+    Für bereits bekannte Texte wird nur ein 16-Byte-Hash gehalten, nicht der
+    Text selbst; neue Einträge sammeln sich bis :meth:`take_definitions`.
+    """
+
+    def __init__(self) -> None:
+        self._texts: Dict[bytes, int] = {}
+        self._messages: Dict[Tuple[str, int], int] = {}
+        self._new_texts: List[str] = []
+        self._new_messages: List[List[object]] = []
+
+    def text(self, value: str) -> int:
+        key = hashlib.blake2b(value.encode("utf-8"), digest_size=16).digest()
+        index = self._texts.get(key)
+        if index is None:
+            index = len(self._texts)
+            self._texts[key] = index
+            self._new_texts.append(value)
+        return index
+
+    def message(self, message: ChatMessage) -> int:
+        key = (message.role, self.text(message.content))
+        index = self._messages.get(key)
+        if index is None:
+            index = len(self._messages)
+            self._messages[key] = index
+            self._new_messages.append([message.role, key[1]])
+        return index
+
+    def encode_turn(self, turn: TranscriptTurn) -> Dict[str, object]:
+        payload = turn.to_dict()
+        payload["question"] = self.text(turn.question)
+        payload["response"] = self.text(turn.response)
+        payload["context"] = [
+            {**item.to_dict(), "text": self.text(item.text)}
+            for item in turn.context
+        ]
+        payload["prompt"] = [self.message(message) for message in turn.prompt_messages]
+        return payload
+
+    def take_definitions(self) -> Dict[str, List[object]]:
+        definitions: Dict[str, List[object]] = {"texts": list(self._new_texts), "messages": list(self._new_messages)}
+        self._new_texts.clear()
+        self._new_messages.clear()
+        return definitions
+
+    def prime(self, path: Path) -> None:
+        """Übernimmt die Tabellen einer vorhandenen kompakten JSONL-Datei."""
+
+        table = _InternTable()
+        with path.open("r", encoding="utf-8") as handle:
+            for line in handle:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if isinstance(record, Mapping) and "question" not in record and "format" not in record:
+                    table.define(record)
+        for text in table.texts:
+            self.text(text)
+        for message in table.messages:
+            self.message(message)
+        self.take_definitions()
+
+
+def _resolve_text(value: object, table: Optional[_InternTable]) -> str:
+    if table is not None and isinstance(value, int) and not isinstance(value, bool):
+        return table.text(value)
+    return str(value)
+
+
+class StatsAccumulator:
+    """Berechnet :class:`TranscriptStats` laufend, ohne die Runden aufzubewahren.
+
+    Basis für weitere laufende Auswertungen wie
+    :class:`~rag_chatbot.report.ReportAggregator`.
+    """
+
+    def __init__(self) -> None:
+        self.turns = 0
+        self.context_items = 0
+        self.score_sum = 0.0
+        self.sources: Set[str] = set()
+        self.prompt_tokens = 0
+        self.max_prompt_tokens = 0
+
+    def add(self, turn: TranscriptTurn) -> None:
+        self.turns += 1
+        for item in turn.context:
+            self.context_items += 1
+            self.score_sum += item.score
+            self.sources.add(source_key(item))
+        self.prompt_tokens += turn.prompt_tokens
+        self.max_prompt_tokens = max(self.max_prompt_tokens, turn.prompt_tokens)
+
+    def result(self) -> TranscriptStats:
+        if self.turns == 0:
+            return TranscriptStats(turns=0, context_items=0, average_score=0.0, unique_sources=0)
+        average = self.score_sum / self.context_items if self.context_items else 0.0
+        return TranscriptStats(
+            turns=self.turns,
+            context_items=self.context_items,
+            average_score=round(average, 6),
+            unique_sources=len(self.sources),
+            prompt_tokens=self.prompt_tokens,
+            average_prompt_tokens=round(self.prompt_tokens / self.turns, 2),
+            max_prompt_tokens=self.max_prompt_tokens,
+        )
+
+
+def source_key(item: TranscriptContext) -> str:
+    """Quelle eines Kontexttreffers: ``source``, ersatzweise ``title`` oder die Chunk-ID."""
+
+    metadata = item.metadata
+    return str(metadata.get("source") or metadata.get("title") or item.chunk_id)
+
+
+def _dump_line(payload: Mapping[str, object]) -> str:
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+
+def _optional_int(value: object) -> Optional[int]:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return int(value)
 
 
 __all__ = [
     "ChatTranscript",
+    "StatsAccumulator",
+    "TRANSCRIPT_FORMAT",
     "TranscriptContext",
+    "TranscriptSink",
     "TranscriptStats",
     "TranscriptTurn",
+    "TranscriptWriter",
+    "iter_transcript_turns",
+    "source_key",
 ]
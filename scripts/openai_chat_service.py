@@ -5,24 +5,265 @@ our Symfony application.  It validates the bearer token, enriches the prompt
 with the retrieved context chunks and forwards the request to OpenAI's chat
 completions API.  The result is returned in a format that
 ``HttpChatResponder->respond()`` understands.
+
+Context items may omit their ``text`` and only carry an ``id`` (plus an
+optional ``domain``).  Such items are resolved from the local corpus files in
+``RAG_CHAT_SERVICE_DATA_DIR`` so callers do not have to ship chunk texts.
+
+Request, context and upstream timings as well as token usage are exposed in
+Prometheus text format under ``/metrics``.
+
+Optionally a second, identical upstream call is fired when the first one has
+not answered within a percentile of recently observed upstream latencies
+(``RAG_CHAT_SERVICE_HEDGE_PERCENTILE``); the first answer wins.  Hedges count
+against ``RAG_CHAT_SERVICE_MAX_CONCURRENCY`` and are skipped when no slot is
+free.  Callers can pass an overall budget in seconds through the
+``X-Request-Timeout`` header; it also bounds the wait for a free slot.
+
+``/chat/batch`` accepts many independent chat requests at once and streams
+the answers back as NDJSON in completion order, tagged with their index.
+
+Clients that keep their prompt prefix stable across turns send a
+``prefix_fingerprint``; the context message is then placed right before the
+last user message instead of in front of the conversation, so upstream prefix
+caching keeps working.  The fingerprint changes every turn and is only used
+for diagnostics.  With ``RAG_CHAT_SERVICE_PROMPT_CACHE_KEY`` enabled the
+client's ``cache_key`` (stable for a whole session) is forwarded as
+``prompt_cache_key``, so all turns of a session are routed to the same cache.
+
+Request bodies may be gzip-compressed (``Content-Encoding: gzip``); larger
+responses are compressed for clients that send ``Accept-Encoding: gzip``.
 """
 from __future__ import annotations
 
+import asyncio
 import json
 import logging
 import os
-from typing import Any, Callable, Dict, List, Optional, Tuple
-
-from fastapi import Depends, FastAPI, Header, HTTPException, status
-from fastapi.responses import JSONResponse
+import threading
+import time
+import zlib
+from collections import deque
+from dataclasses import dataclass
+from functools import lru_cache, partial
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+from weakref import WeakKeyDictionary
+
+from fastapi import Depends, FastAPI, Header, HTTPException, Request, status
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from openai import APIConnectionError, APIError, APITimeoutError, AuthenticationError, BadRequestError
 from openai import OpenAI
 from pydantic import BaseModel, Field, validator
 
+from rag_chatbot.chunk_store import ChunkStore
+from rag_chatbot.metrics import MetricsRegistry, parse_buckets
+
 LOGGER = logging.getLogger(__name__)
 
 app = FastAPI(title="edocs RAG Chat Service")
 
+MAX_DECOMPRESSED_BODY_BYTES = 16 * 1024 * 1024
+
+
+class GzipRequestMiddleware:
+    """Transparently inflate request bodies sent with ``Content-Encoding: gzip``."""
+
+    def __init__(self, app: Any, max_size: int = MAX_DECOMPRESSED_BODY_BYTES) -> None:
+        self.app = app
+        self.max_size = max_size
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable[[], Any], send: Callable[[Any], Any]) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = [(name, value) for name, value in scope["headers"]]
+        encoding = next((value for name, value in headers if name == b"content-encoding"), b"")
+        if encoding.strip().lower() != b"gzip":
+            await self.app(scope, receive, send)
+            return
+
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        chunks: List[bytes] = []
+        size = 0
+        more_body = True
+        try:
+            while more_body:
+                message = await receive()
+                if message["type"] != "http.request":
+                    await self.app(scope, receive, send)
+                    return
+                more_body = message.get("more_body", False)
+                chunk = decompressor.decompress(message.get("body", b""), self.max_size - size + 1)
+                size += len(chunk)
+                if size > self.max_size or decompressor.unconsumed_tail:
+                    await _send_plain_error(send, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, b"Request body too large")
+                    return
+                chunks.append(chunk)
+            chunks.append(decompressor.flush())
+        except zlib.error:
+            await _send_plain_error(send, status.HTTP_400_BAD_REQUEST, b"Invalid gzip request body")
+            return
+
+        body = b"".join(chunks)
+        scope = dict(scope)
+        scope["headers"] = [
+            (name, value)
+            for name, value in headers
+            if name not in (b"content-encoding", b"content-length")
+        ] + [(b"content-length", str(len(body)).encode("ascii"))]
+        delivered = False
+
+        async def replay() -> Dict[str, Any]:
+            nonlocal delivered
+            if not delivered:
+                delivered = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        await self.app(scope, replay, send)
+
+
+async def _send_plain_error(send: Callable[[Any], Any], status_code: int, detail: bytes) -> None:
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status_code,
+            "headers": [(b"content-type", b"text/plain"), (b"content-length", str(len(detail)).encode("ascii"))],
+        }
+    )
+    await send({"type": "http.response.body", "body": detail})
+
+
+app.add_middleware(GzipRequestMiddleware)
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
+_REQUEST_BUCKETS = parse_buckets(os.environ.get("RAG_CHAT_SERVICE_METRICS_BUCKETS"))
+_UPSTREAM_BUCKETS = parse_buckets(os.environ.get("RAG_CHAT_SERVICE_UPSTREAM_BUCKETS"), _REQUEST_BUCKETS)
+
+METRICS = MetricsRegistry()
+REQUEST_DURATION = METRICS.histogram(
+    "rag_chat_request_duration_seconds",
+    "Total time spent handling chat requests, including body parsing.",
+    _REQUEST_BUCKETS,
+)
+CONTEXT_DURATION = METRICS.histogram(
+    "rag_chat_context_duration_seconds",
+    "Time spent resolving context items and building the context message.",
+    _REQUEST_BUCKETS,
+)
+UPSTREAM_DURATION = METRICS.histogram(
+    "rag_chat_upstream_duration_seconds",
+    "Time spent waiting for the upstream chat completion.",
+    _UPSTREAM_BUCKETS,
+)
+RESPONSES_TOTAL = METRICS.counter(
+    "rag_chat_responses_total",
+    "Chat responses by path and HTTP status code.",
+    ("path", "status"),
+)
+UPSTREAM_ERRORS_TOTAL = METRICS.counter(
+    "rag_chat_upstream_errors_total",
+    "Failed upstream calls by error class.",
+    ("error",),
+)
+PROMPT_TOKENS_TOTAL = METRICS.counter(
+    "rag_chat_prompt_tokens_total",
+    "Prompt tokens reported by the upstream completion usage.",
+)
+COMPLETION_TOKENS_TOTAL = METRICS.counter(
+    "rag_chat_completion_tokens_total",
+    "Completion tokens reported by the upstream completion usage.",
+)
+REQUESTS_IN_FLIGHT = METRICS.gauge(
+    "rag_chat_requests_in_flight",
+    "Chat requests currently being handled.",
+)
+UPSTREAM_IN_FLIGHT = METRICS.gauge(
+    "rag_chat_upstream_in_flight",
+    "Upstream chat completions currently awaiting an answer.",
+)
+
+HEDGES_TOTAL = METRICS.counter(
+    "rag_chat_hedges_total",
+    "Hedged upstream calls fired because the first call was slow.",
+)
+HEDGE_WINS_TOTAL = METRICS.counter(
+    "rag_chat_hedge_wins_total",
+    "Hedged upstream calls that answered before the original call.",
+)
+HEDGES_SKIPPED_TOTAL = METRICS.counter(
+    "rag_chat_hedges_skipped_total",
+    "Hedged upstream calls not fired because every upstream slot was busy.",
+)
+HEDGE_WASTED_TOTAL = METRICS.counter(
+    "rag_chat_hedge_wasted_total",
+    "Upstream calls whose answer was discarded because the other call won.",
+)
+DEADLINE_EXCEEDED_TOTAL = METRICS.counter(
+    "rag_chat_deadline_exceeded_total",
+    "Chat requests aborted because their latency budget ran out.",
+)
+
+INSTRUMENTED_PATHS = frozenset({"/chat", "/chat/batch"})
+
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_MAX_BATCH_SIZE = 500
+
+_CONCURRENCY_LIMITS: "WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = WeakKeyDictionary()
+
+
+def _get_concurrency_limit() -> asyncio.Semaphore:
+    """Semaphore bounding concurrent upstream completions on the running loop.
+
+    Every upstream call, hedges included, holds one slot until its worker
+    thread has finished.
+    """
+
+    loop = asyncio.get_running_loop()
+    limit = _CONCURRENCY_LIMITS.get(loop)
+    if limit is None:
+        configured = _load_int_option("RAG_CHAT_SERVICE_MAX_CONCURRENCY")
+        limit = asyncio.Semaphore(configured if configured is not None and configured > 0 else DEFAULT_MAX_CONCURRENCY)
+        _CONCURRENCY_LIMITS[loop] = limit
+    return limit
+
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next: Callable[[Request], Any]) -> Response:
+    path = request.url.path
+    if path not in INSTRUMENTED_PATHS:
+        return await call_next(request)
+
+    REQUESTS_IN_FLIGHT.inc()
+    started = time.perf_counter()
+
+    def finish(status_code: int) -> None:
+        REQUEST_DURATION.observe(time.perf_counter() - started)
+        RESPONSES_TOTAL.inc(path, str(status_code))
+        REQUESTS_IN_FLIGHT.dec()
+
+    try:
+        response = await call_next(request)
+    except BaseException:
+        finish(status.HTTP_500_INTERNAL_SERVER_ERROR)
+        raise
+
+    # The body may still be streaming (``/chat/batch``); count the request as
+    # finished only once the last chunk has been sent.
+    body_iterator = response.body_iterator
+
+    async def observed_body() -> AsyncIterator[bytes]:
+        try:
+            async for chunk in body_iterator:
+                yield chunk
+        finally:
+            finish(response.status_code)
+
+    response.body_iterator = observed_body()
+    return response
+
 
 class ChatMessage(BaseModel):
     role: str = Field(..., description="Role of the speaker, e.g. system/user/assistant")
@@ -41,6 +282,7 @@ class ContextItem(BaseModel):
     text: Optional[str] = Field(default=None)
     score: Optional[float] = Field(default=None)
     metadata: Optional[Dict[str, Any]] = Field(default=None)
+    domain: Optional[str] = Field(default=None, description="Domain whose corpus resolves id-only items")
 
     class Config:
         extra = "allow"
@@ -49,6 +291,21 @@ class ContextItem(BaseModel):
 class ChatRequest(BaseModel):
     messages: List[ChatMessage]
     context: List[ContextItem] = Field(default_factory=list)
+    domain: Optional[str] = Field(default=None, description="Default domain for id-only context items")
+    prefix_fingerprint: Optional[str] = Field(
+        default=None,
+        max_length=128,
+        description="Hash of the message prefix that stays identical across turns",
+    )
+    cache_key: Optional[str] = Field(
+        default=None,
+        max_length=128,
+        description="Routing key that stays the same for the whole session, e.g. a session id",
+    )
+
+
+class ChatBatchRequest(BaseModel):
+    requests: List[ChatRequest] = Field(..., description="Independent chat requests answered concurrently")
 
 
 def require_authorisation(authorization: Optional[str] = Header(default=None)) -> None:
@@ -96,6 +353,13 @@ OPTION_MAP: Dict[str, Tuple[str, Callable[[str], Optional[Any]]]] = {
 }
 
 
+def _load_bool_option(env_key: str) -> bool:
+    raw = os.environ.get(env_key)
+    if raw is None:
+        return False
+    return raw.strip().lower() in {"1", "true", "yes", "on"}
+
+
 def _build_openai_options() -> Dict[str, Any]:
     options: Dict[str, Any] = {}
     for env_key, (payload_key, loader) in OPTION_MAP.items():
@@ -105,6 +369,46 @@ def _build_openai_options() -> Dict[str, Any]:
     return options
 
 
+DEFAULT_DATA_DIR = Path(__file__).resolve().parent.parent / "data" / "rag-chatbot"
+
+
+@lru_cache(maxsize=1)
+def _get_chunk_store() -> ChunkStore:
+    data_dir = os.environ.get("RAG_CHAT_SERVICE_DATA_DIR")
+    cache_size = _load_int_option("RAG_CHAT_SERVICE_CHUNK_CACHE_SIZE")
+    return ChunkStore(
+        Path(data_dir) if data_dir else DEFAULT_DATA_DIR,
+        cache_size=cache_size if cache_size is not None and cache_size >= 0 else 2048,
+    )
+
+
+def _needs_resolution(context: List[ContextItem]) -> bool:
+    return any(item.id and not item.text for item in context)
+
+
+def _resolve_context(context: List[ContextItem], default_domain: Optional[str]) -> List[ContextItem]:
+    """Fill in text and metadata for items that only reference a chunk ID.
+
+    Lookups may read corpus files, so async callers run this in a worker thread.
+    """
+
+    resolved: List[ContextItem] = []
+    for item in context:
+        if item.text or not item.id:
+            resolved.append(item)
+            continue
+        domain = item.domain or default_domain
+        try:
+            chunk = _get_chunk_store().resolve(item.id, domain)
+        except ValueError as exc:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+        if chunk is None:
+            LOGGER.warning("Unknown context chunk %s (domain: %s)", item.id, domain or "-")
+            continue
+        resolved.append(item.model_copy(update={"text": chunk.text, "metadata": item.metadata or chunk.metadata}))
+    return resolved
+
+
 def _build_context_message(context: List[ContextItem]) -> Optional[Dict[str, str]]:
     if not context:
         return None
@@ -143,14 +447,244 @@ def _build_context_message(context: List[ContextItem]) -> Optional[Dict[str, str
     return {"role": "system", "content": content}
 
 
-def _augment_messages(messages: List[ChatMessage], context_message: Optional[Dict[str, str]]) -> List[Dict[str, str]]:
-    augmented: List[Dict[str, str]] = []
-    if context_message:
-        augmented.append(context_message)
-    augmented.extend({"role": msg.role, "content": msg.content} for msg in messages)
+def _augment_messages(
+    messages: List[ChatMessage],
+    context_message: Optional[Dict[str, str]],
+    stable_prefix: bool = False,
+) -> List[Dict[str, str]]:
+    augmented: List[Dict[str, str]] = [{"role": msg.role, "content": msg.content} for msg in messages]
+    if not context_message:
+        return augmented
+    if stable_prefix:
+        # Keep everything before the current question byte-identical across turns.
+        position = len(augmented) - 1 if augmented[-1]["role"] == "user" else len(augmented)
+        augmented.insert(position, context_message)
+    else:
+        augmented.insert(0, context_message)
     return augmented
 
 
+def _record_usage(completion: Any) -> None:
+    usage = getattr(completion, "usage", None)
+    if usage is None:
+        return
+    prompt_tokens = getattr(usage, "prompt_tokens", None)
+    completion_tokens = getattr(usage, "completion_tokens", None)
+    if isinstance(prompt_tokens, int):
+        PROMPT_TOKENS_TOTAL.inc(amount=prompt_tokens)
+    if isinstance(completion_tokens, int):
+        COMPLETION_TOKENS_TOTAL.inc(amount=completion_tokens)
+
+
+class DeadlineExceeded(Exception):
+    """Raised when the latency budget of a request has been used up."""
+
+
+class _LatencyWindow:
+    """Rolling window of successful upstream latencies for hedge delays."""
+
+    def __init__(self, size: int = 256) -> None:
+        self._samples: deque[float] = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def add(self, value: float) -> None:
+        with self._lock:
+            self._samples.append(value)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._samples.clear()
+
+    def percentile(self, percentile: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        rank = min(len(samples) - 1, max(0, int(round(percentile / 100.0 * len(samples))) - 1))
+        return samples[rank]
+
+
+UPSTREAM_LATENCIES = _LatencyWindow()
+
+
+@dataclass(frozen=True)
+class HedgeSettings:
+    percentile: float
+    initial_delay: float
+    min_delay: float
+    min_samples: int
+
+    def delay(self, window: _LatencyWindow) -> float:
+        if len(window) < self.min_samples:
+            return self.initial_delay
+        observed = window.percentile(self.percentile)
+        if observed is None:
+            return self.initial_delay
+        return max(self.min_delay, observed)
+
+
+def _load_hedge_settings() -> Optional[HedgeSettings]:
+    percentile = _load_float_option("RAG_CHAT_SERVICE_HEDGE_PERCENTILE")
+    if percentile is None or not 0.0 < percentile < 100.0:
+        return None
+    initial_delay = _load_float_option("RAG_CHAT_SERVICE_HEDGE_INITIAL_DELAY")
+    min_delay = _load_float_option("RAG_CHAT_SERVICE_HEDGE_MIN_DELAY")
+    min_samples = _load_int_option("RAG_CHAT_SERVICE_HEDGE_MIN_SAMPLES")
+    return HedgeSettings(
+        percentile=percentile,
+        initial_delay=initial_delay if initial_delay is not None and initial_delay >= 0 else 2.0,
+        min_delay=min_delay if min_delay is not None and min_delay >= 0 else 0.05,
+        min_samples=min_samples if min_samples is not None and min_samples >= 0 else 20,
+    )
+
+
+def _resolve_deadline(header_value: Optional[str]) -> Optional[float]:
+    """Turn the ``X-Request-Timeout`` budget (seconds) into a monotonic deadline."""
+
+    budget: Optional[float] = None
+    if header_value is not None and header_value.strip() != "":
+        try:
+            budget = float(header_value)
+        except ValueError as exc:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="X-Request-Timeout must be a number of seconds",
+            ) from exc
+    else:
+        budget = _load_float_option("RAG_CHAT_SERVICE_REQUEST_TIMEOUT")
+    if budget is None:
+        return None
+    if budget <= 0:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="X-Request-Timeout must be positive")
+    return time.monotonic() + budget
+
+
+def _remaining(deadline: Optional[float]) -> Optional[float]:
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def _call_upstream(
+    client: OpenAI,
+    model: str,
+    messages: List[Dict[str, str]],
+    options: Dict[str, Any],
+    deadline: Optional[float] = None,
+) -> Any:
+    remaining = _remaining(deadline)
+    if remaining is not None:
+        if remaining <= 0:
+            raise DeadlineExceeded()
+        # Retries would overrun the budget, so bounded calls fail fast instead.
+        client = client.with_options(timeout=remaining, max_retries=0)
+
+    UPSTREAM_IN_FLIGHT.inc()
+    started = time.perf_counter()
+    try:
+        completion = client.chat.completions.create(model=model, messages=messages, **options)
+    except Exception as exc:
+        UPSTREAM_ERRORS_TOTAL.inc(type(exc).__name__)
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        UPSTREAM_DURATION.observe(elapsed)
+        UPSTREAM_IN_FLIGHT.dec()
+    UPSTREAM_LATENCIES.add(elapsed)
+    _record_usage(completion)
+    return completion
+
+
+def _discard_result(task: "asyncio.Future[Any]") -> None:
+    if not task.cancelled():
+        task.exception()
+
+
+async def _acquire_slot(limit: asyncio.Semaphore, deadline: Optional[float]) -> None:
+    """Wait for an upstream slot, but no longer than the request budget allows."""
+
+    remaining = _remaining(deadline)
+    if remaining is None:
+        await limit.acquire()
+        return
+    if remaining <= 0:
+        raise DeadlineExceeded()
+    try:
+        await asyncio.wait_for(limit.acquire(), timeout=remaining)
+    except asyncio.TimeoutError as exc:
+        raise DeadlineExceeded() from exc
+
+
+def _start_upstream(call: Callable[[], Any], limit: asyncio.Semaphore) -> "asyncio.Future[Any]":
+    """Run ``call`` in a worker thread; the held slot is released when the thread ends."""
+
+    task = asyncio.ensure_future(asyncio.to_thread(call))
+    task.add_done_callback(lambda _: limit.release())
+    return task
+
+
+async def _complete_with_hedging(
+    client: OpenAI,
+    model: str,
+    messages: List[Dict[str, str]],
+    options: Dict[str, Any],
+    deadline: Optional[float],
+) -> Any:
+    """Run the upstream call in a worker thread and hedge it when it is slow.
+
+    Both calls count against the concurrency limit.  A losing call keeps its
+    slot until its thread returns; a hedge is only fired when a slot is free.
+    """
+
+    limit = _get_concurrency_limit()
+    await _acquire_slot(limit, deadline)
+    call = partial(_call_upstream, client, model, messages, options, deadline)
+    primary = _start_upstream(call, limit)
+    pending = {primary}
+
+    settings = _load_hedge_settings()
+    if settings is not None:
+        delay = settings.delay(UPSTREAM_LATENCIES)
+        remaining = _remaining(deadline)
+        if remaining is None or delay < remaining:
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if not done and limit.locked():
+                HEDGES_SKIPPED_TOTAL.inc()
+            elif not done:
+                await limit.acquire()
+                HEDGES_TOTAL.inc()
+                pending.add(_start_upstream(call, limit))
+
+    error: Optional[BaseException] = None
+    while pending:
+        done, pending = await asyncio.wait(
+            pending,
+            timeout=_remaining(deadline),
+            return_when=asyncio.FIRST_COMPLETED,
+        )
+        if not done:
+            for task in pending:
+                task.add_done_callback(_discard_result)
+            raise DeadlineExceeded()
+        for task in done:
+            exc = task.exception()
+            if exc is not None:
+                error = error or exc
+                continue
+            if task is not primary:
+                HEDGE_WINS_TOTAL.inc()
+            for loser in pending:
+                HEDGE_WASTED_TOTAL.inc()
+                loser.add_done_callback(_discard_result)
+            return task.result()
+
+    assert error is not None
+    raise error
+
+
 def _get_openai_client() -> OpenAI:
     api_key = os.environ.get("OPENAI_API_KEY")
     if not api_key:
@@ -158,27 +692,45 @@ def _get_openai_client() -> OpenAI:
     return OpenAI(api_key=api_key)
 
 
-@app.post("/chat", response_class=JSONResponse)
-async def create_chat_completion(
-    request: ChatRequest,
-    _: None = Depends(require_authorisation),
-) -> JSONResponse:
+async def _answer(request: ChatRequest, deadline: Optional[float]) -> str:
     if not request.messages:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="messages must not be empty")
 
-    context_message = _build_context_message(request.context)
-    payload_messages = _augment_messages(request.messages, context_message)
+    context_started = time.perf_counter()
+    context = request.context
+    if _needs_resolution(context):
+        context = await asyncio.to_thread(_resolve_context, context, request.domain)
+    context_message = _build_context_message(context)
+    payload_messages = _augment_messages(request.messages, context_message, bool(request.prefix_fingerprint))
+    CONTEXT_DURATION.observe(time.perf_counter() - context_started)
 
     model = os.environ.get("RAG_CHAT_SERVICE_MODEL", "gpt-4o-mini")
     options = _build_openai_options()
+    if request.cache_key and _load_bool_option("RAG_CHAT_SERVICE_PROMPT_CACHE_KEY"):
+        options["prompt_cache_key"] = request.cache_key
 
     client = _get_openai_client()
     try:
-        completion = client.chat.completions.create(model=model, messages=payload_messages, **options)
+        completion = await _complete_with_hedging(client, model, payload_messages, options, deadline)
+    except DeadlineExceeded as exc:
+        DEADLINE_EXCEEDED_TOTAL.inc()
+        LOGGER.warning("Chat request exceeded its latency budget")
+        raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail="Request deadline exceeded") from exc
     except (AuthenticationError, BadRequestError) as exc:
         LOGGER.error("OpenAI rejected the request: %s", exc)
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
-    except (APITimeoutError, APIConnectionError) as exc:
+    except APITimeoutError as exc:
+        if deadline is not None:
+            # Bounded calls use the remaining budget as their client timeout.
+            DEADLINE_EXCEEDED_TOTAL.inc()
+            LOGGER.warning("Chat request exceeded its latency budget")
+            raise HTTPException(
+                status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                detail="Request deadline exceeded",
+            ) from exc
+        LOGGER.error("OpenAI request failed due to network/timeout: %s", exc)
+        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="OpenAI request failed") from exc
+    except APIConnectionError as exc:
         LOGGER.error("OpenAI request failed due to network/timeout: %s", exc)
         raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="OpenAI request failed") from exc
     except APIError as exc:
@@ -196,7 +748,62 @@ async def create_chat_completion(
     if not answer:
         raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="OpenAI did not return a message")
 
-    return JSONResponse({"answer": answer.strip()})
+    return answer.strip()
+
+
+@app.post("/chat", response_class=JSONResponse)
+async def create_chat_completion(
+    request: ChatRequest,
+    _: None = Depends(require_authorisation),
+    request_timeout: Optional[str] = Header(default=None, alias="X-Request-Timeout"),
+) -> JSONResponse:
+    deadline = _resolve_deadline(request_timeout)
+    answer = await _answer(request, deadline)
+    return JSONResponse({"answer": answer})
+
+
+async def _answer_batch_item(index: int, request: ChatRequest, deadline: Optional[float]) -> Dict[str, Any]:
+    try:
+        answer = await _answer(request, deadline)
+    except HTTPException as exc:
+        return {"index": index, "status": exc.status_code, "error": exc.detail}
+    except Exception as exc:  # pragma: no cover - defensive branch
+        LOGGER.exception("Batch item %d failed", index)
+        return {"index": index, "status": status.HTTP_500_INTERNAL_SERVER_ERROR, "error": str(exc)}
+    return {"index": index, "status": status.HTTP_200_OK, "answer": answer}
+
+
+async def _stream_batch(requests: List[ChatRequest], deadline: Optional[float]) -> AsyncIterator[bytes]:
+    tasks = [
+        asyncio.ensure_future(_answer_batch_item(index, item, deadline))
+        for index, item in enumerate(requests)
+    ]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            result = await finished
+            yield (json.dumps(result, ensure_ascii=False) + "\n").encode("utf-8")
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+@app.post("/chat/batch")
+async def create_chat_completion_batch(
+    request: ChatBatchRequest,
+    _: None = Depends(require_authorisation),
+    request_timeout: Optional[str] = Header(default=None, alias="X-Request-Timeout"),
+) -> StreamingResponse:
+    if not request.requests:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="requests must not be empty")
+    max_batch_size = _load_int_option("RAG_CHAT_SERVICE_MAX_BATCH_SIZE") or DEFAULT_MAX_BATCH_SIZE
+    if len(request.requests) > max_batch_size:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"batch must not contain more than {max_batch_size} requests",
+        )
+    deadline = _resolve_deadline(request_timeout)
+    _get_openai_client()
+    return StreamingResponse(_stream_batch(request.requests, deadline), media_type="application/x-ndjson")
 
 
 @app.get("/healthz", response_class=JSONResponse)
@@ -204,6 +811,11 @@ async def health() -> JSONResponse:
     return JSONResponse({"status": "ok"})
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics() -> PlainTextResponse:
+    return PlainTextResponse(METRICS.render(), media_type=MetricsRegistry.CONTENT_TYPE)
+
+
 if __name__ == "__main__":
     import uvicorn
 
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+"""Misst Aufbau und Suche des RAG-Index auf synthetischen Korpora verschiedener Größe.
+
+Skalierung 1 entspricht etwa dem Umfang von ``docs/``. Das Ergebnis wird als
+JSON ausgegeben und kann zwischen Commits verglichen werden.
+"""
+
+import argparse
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import List, Optional
+
+from rag_chatbot.benchmark import SEARCH_MODES, BenchmarkOptions, dump_benchmark, parse_scales, run_benchmark
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark für Loader, Chunker, Index und Suche.")
+    parser.add_argument("--scales", default="1,10", help="Kommagetrennte Skalierungen, z. B. 1,10,100,1000")
+    parser.add_argument("--output", type=Path, default=None, help="JSON-Datei für das Ergebnis (Standard: stdout)")
+    parser.add_argument(
+        "--workdir",
+        type=Path,
+        default=None,
+        help="Arbeitsverzeichnis für Korpora und Indizes (Standard: temporär)",
+    )
+    parser.add_argument("--seed", type=int, default=1, help="Startwert für Dokumente und Fragen")
+    parser.add_argument("--questions", type=int, default=50, help="Anzahl der erzeugten Fragen")
+    parser.add_argument(
+        "--question-file",
+        type=Path,
+        default=None,
+        help="Feste Fragenliste (eine pro Zeile) statt erzeugter Fragen",
+    )
+    parser.add_argument("--top-k", type=int, default=4, help="k für Suche und recall@k")
+    parser.add_argument("--min-score", type=float, default=0.05, help="Mindestscore für Treffer")
+    parser.add_argument(
+        "--mode",
+        action="append",
+        choices=sorted(SEARCH_MODES),
+        default=None,
+        help="Suchverfahren für recall@k (mehrfach angebbar)",
+    )
+    parser.add_argument(
+        "--no-isolate",
+        action="store_true",
+        help="Alle Stufen im selben Prozess messen (schneller, Spitzen-RSS dann kumulativ)",
+    )
+    return parser.parse_args()
+
+
+def load_questions(path: Optional[Path]) -> List[str]:
+    if path is None:
+        return []
+    lines = (line.strip() for line in path.read_text(encoding="utf-8").splitlines())
+    return [line for line in lines if line and not line.startswith("#")]
+
+
+def current_commit() -> Optional[str]:
+    try:
+        completed = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return completed.stdout.strip() or None
+
+
+def main() -> int:
+    args = parse_args()
+    try:
+        scales = parse_scales(args.scales)
+        questions = load_questions(args.question_file)
+    except (OSError, ValueError) as exc:
+        print(f"Fehler: {exc}", file=sys.stderr)
+        return 1
+
+    with tempfile.TemporaryDirectory(prefix="rag-benchmark-") as temporary:
+        options = BenchmarkOptions(
+            scales=scales,
+            workdir=args.workdir or Path(temporary),
+            seed=args.seed,
+            questions=args.questions,
+            top_k=args.top_k,
+            min_score=args.min_score,
+            modes=tuple(args.mode or ("search",)),
+            isolate=not args.no_isolate,
+            query_list=questions,
+        )
+        result = run_benchmark(options, progress=lambda message: print(message, file=sys.stderr))
+
+    result["commit"] = current_commit()
+    text = dump_benchmark(result, args.output)
+    if args.output is None:
+        print(text)
+    else:
+        print(f"Ergebnis gespeichert in {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover - Skript-Einstiegspunkt
+    sys.exit(main())
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import json
+import signal
+import sys
+import threading
+from pathlib import Path
+from typing import Dict
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from rag_chatbot.progress import ProgressReporter
+from rag_chatbot.daemon import DEFAULT_HISTORY, BuildClient, BuildDaemon, BuildServer, DaemonError
+from rag_chatbot.loader import DEFAULT_CACHE_BYTES
+
+DEFAULT_SOCKET = Path("data/rag-chatbot/build.sock")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description=(
+            "Startet den Build-Daemon, der Wissensbasis und Index auf Anfrage über einen "
+            "Unix-Socket neu aufbaut (Client: rag_pipeline.py --daemon)."
+        ),
+    )
+    parser.add_argument(
+        "--socket",
+        type=Path,
+        default=DEFAULT_SOCKET,
+        help="Pfad des Unix-Sockets",
+    )
+    parser.add_argument(
+        "--root",
+        type=Path,
+        default=Path.cwd(),
+        help="Nur Quellen und Ausgabepfade unterhalb dieses Ordners annehmen (Standard: aktuelles Verzeichnis)",
+    )
+    parser.add_argument(
+        "--history",
+        type=int,
+        default=DEFAULT_HISTORY,
+        help="Anzahl abgeschlossener Aufträge, die für Statusabfragen vorgehalten werden",
+    )
+    parser.add_argument(
+        "--cache-mb",
+        type=int,
+        default=DEFAULT_CACHE_BYTES // (1024 * 1024),
+        help="Obergrenze des Caches für geparste Quelldokumente in MiB (0 schaltet ihn ab)",
+    )
+    parser.add_argument(
+        "--log",
+        choices=("text", "json"),
+        default="text",
+        help="Format der Auftragsmeldungen auf stdout",
+    )
+    action = parser.add_mutually_exclusive_group()
+    action.add_argument(
+        "--status",
+        action="store_true",
+        help="Status eines laufenden Daemons als JSON ausgeben, statt einen zu starten",
+    )
+    action.add_argument(
+        "--stop",
+        action="store_true",
+        help="Laufenden Daemon beenden (wartende Aufträge werden noch abgearbeitet)",
+    )
+    return parser
+
+
+def main() -> None:
+    parser = build_parser()
+    args = parser.parse_args()
+    if args.history < 0:
+        parser.error("--history darf nicht negativ sein.")
+    if args.cache_mb < 0:
+        parser.error("--cache-mb darf nicht negativ sein.")
+
+    if args.status or args.stop:
+        client = BuildClient(args.socket, timeout=10.0)
+        try:
+            if args.stop:
+                client.shutdown()
+            else:
+                print(json.dumps(client.status(), ensure_ascii=False, indent=2))
+        except (OSError, DaemonError) as exc:
+            print(f"Build-Daemon unter {args.socket} ist nicht erreichbar: {exc}", file=sys.stderr)
+            raise SystemExit(1) from exc
+        return
+
+    events = ProgressReporter.ndjson(sys.stdout) if args.log == "json" else ProgressReporter(print_event)
+    try:
+        daemon = BuildDaemon(history=args.history, events=events, cache_bytes=args.cache_mb * 1024 * 1024)
+        server = BuildServer(args.socket, daemon, root=args.root)
+    except DaemonError as exc:
+        print(exc, file=sys.stderr)
+        raise SystemExit(1) from exc
+
+    def stop(signum: int, frame: object) -> None:
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    events.emit("listening", socket=str(args.socket))
+    server.serve()
+    events.emit("stopped")
+
+
+def print_event(record: Dict[str, object]) -> None:
+    event = record["event"]
+    if event == "listening":
+        line = f"Build-Daemon wartet auf {record['socket']}"
+    elif event == "stopped":
+        line = "Build-Daemon beendet."
+    elif event == "job_queued":
+        merged = " (zusammengefasst)" if record.get("merged") else ""
+        line = f"Auftrag {record['job']} eingereiht{merged}: {record['index']}"
+    elif event == "job_start":
+        line = f"Auftrag {record['job']} gestartet nach {record['queue_seconds']:.2f} s Wartezeit"
+    elif event == "job_end":
+        state = "fertig" if record["state"] == "done" else "fehlgeschlagen"
+        line = f"Auftrag {record['job']} {state} nach {record['build_seconds']:.2f} s"
+        if record.get("error"):
+            line += f": {record['error']}"
+    else:
+        line = json.dumps(record, ensure_ascii=False)
+    print(line, flush=True)
+
+
+if __name__ == "__main__":  # pragma: no cover - Skripteintrittspunkt
+    main()
@@ -2,31 +2,97 @@
 from __future__ import annotations
 
 import argparse
+import gzip
+import http.client
 import json
 import os
+import socket
+import ssl
 import sys
-import urllib.error
-import urllib.request
+import threading
+import time
+import urllib.parse
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 from rag_chatbot import ChatPrompt, ChatSession, ChatTurn, SemanticIndex
+from rag_chatbot.compaction import HistoryCompactor
+
+
+class _ConnectionPool:
+    """Hält wiederverwendbare Keep-Alive-Verbindungen zu einem Endpunkt."""
+
+    def __init__(
+        self,
+        scheme: str,
+        host: str,
+        port: Optional[int],
+        *,
+        connect_timeout: float,
+        max_idle: int = 4,
+    ) -> None:
+        self._scheme = scheme
+        self._host = host
+        self._port = port
+        self._connect_timeout = connect_timeout
+        self._max_idle = max_idle
+        self._idle: List[http.client.HTTPConnection] = []
+        self._lock = threading.Lock()
+        self.connections_opened = 0
+
+    def acquire(self) -> Tuple[http.client.HTTPConnection, bool]:
+        with self._lock:
+            if self._idle:
+                return self._idle.pop(), True
+            self.connections_opened += 1
+        if self._scheme == "https":
+            connection: http.client.HTTPConnection = http.client.HTTPSConnection(
+                self._host,
+                self._port,
+                timeout=self._connect_timeout,
+                context=ssl.create_default_context(),
+            )
+        else:
+            connection = http.client.HTTPConnection(self._host, self._port, timeout=self._connect_timeout)
+        return connection, False
+
+    def release(self, connection: http.client.HTTPConnection) -> None:
+        with self._lock:
+            if len(self._idle) < self._max_idle:
+                self._idle.append(connection)
+                return
+        connection.close()
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
 
 
 class ChatServiceResponder:
-    """Reicht Prompts an den konfigurierten Chat-Service weiter."""
+    """Reicht Prompts an den konfigurierten Chat-Service weiter.
+
+    Verbindungen werden per Keep-Alive wiederverwendet; ist ein Socket
+    zwischenzeitlich vom Server geschlossen worden, wird einmal neu verbunden.
+    """
 
     NO_CONTEXT_MESSAGE = (
         "Ich konnte keine passenden Informationen in der Dokumentation finden. "
         "Bitte stelle deine Frage anders oder schränke das Thema ein."
     )
 
+    GZIP_MIN_BYTES = 1024
+
     def __init__(
         self,
         endpoint: Optional[str] = None,
         *,
         timeout: float = 30.0,
         api_key: Optional[str] = None,
+        connect_timeout: Optional[float] = None,
+        read_timeout: Optional[float] = None,
+        compress: bool = False,
     ) -> None:
         self._endpoint = endpoint or os.environ.get("RAG_CHAT_SERVICE_URL")
         if not self._endpoint:
@@ -35,8 +101,38 @@ class ChatServiceResponder:
                 "RAG_CHAT_SERVICE_URL oder übergib einen Endpunkt an den "
                 "ChatServiceResponder."
             )
+        parts = urllib.parse.urlsplit(self._endpoint)
+        if parts.scheme not in {"http", "https"} or not parts.hostname:
+            raise RuntimeError(f"Ungültige Chat-Service-URL: {self._endpoint}")
+        self._path = parts.path or "/"
+        if parts.query:
+            self._path = f"{self._path}?{parts.query}"
         self._timeout = timeout
+        self._connect_timeout = min(connect_timeout, timeout) if connect_timeout is not None else timeout
+        self._read_timeout = min(read_timeout, timeout) if read_timeout is not None else timeout
+        self._compress = compress
         self._api_key = api_key or os.environ.get("RAG_CHAT_SERVICE_TOKEN")
+        self._pool = _ConnectionPool(
+            parts.scheme,
+            parts.hostname,
+            parts.port,
+            connect_timeout=self._connect_timeout,
+        )
+
+    @property
+    def connections_opened(self) -> int:
+        """Anzahl der bisher aufgebauten TCP-Verbindungen."""
+
+        return self._pool.connections_opened
+
+    def close(self) -> None:
+        self._pool.close()
+
+    def __enter__(self) -> "ChatServiceResponder":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
 
     def __call__(self, prompt: ChatPrompt) -> str:
         if not prompt.context:
@@ -49,24 +145,15 @@ class ChatServiceResponder:
             ],
             "context": [self._normalise_context_item(item) for item in prompt.context],
         }
+        if prompt.layout == "stable":
+            payload["prefix_fingerprint"] = prompt.prefix_fingerprint
+            payload["cache_key"] = prompt.cache_key
 
-        request = urllib.request.Request(
-            self._endpoint,
-            data=json.dumps(payload).encode("utf-8"),
-            headers={"Content-Type": "application/json"},
-        )
-        if self._api_key:
-            request.add_header("Authorization", f"Bearer {self._api_key}")
-
-        try:
-            with urllib.request.urlopen(request, timeout=self._timeout) as response:
-                body = response.read()
-        except urllib.error.URLError as exc:  # pragma: no cover - Netzwerkausfälle sind schwer zu testen
-            raise RuntimeError(f"Chat-Service nicht erreichbar: {exc}") from exc
+        body = self._post(json.dumps(payload).encode("utf-8"))
 
         try:
             data = json.loads(body.decode("utf-8"))
-        except json.JSONDecodeError as exc:  # pragma: no cover - Netzwerkdaten schwer zu simulieren
+        except (json.JSONDecodeError, UnicodeDecodeError) as exc:  # pragma: no cover - Netzwerkdaten schwer zu simulieren
             raise RuntimeError("Ungültige Antwort vom Chat-Service erhalten.") from exc
 
         answer = self._extract_answer(data)
@@ -74,6 +161,62 @@ class ChatServiceResponder:
             raise RuntimeError("Der Chat-Service hat keine Antwort geliefert.")
         return answer.strip()
 
+    def _post(self, body: bytes) -> bytes:
+        headers = {
+            "Content-Type": "application/json",
+            "Accept-Encoding": "gzip",
+            "Connection": "keep-alive",
+        }
+        if self._compress and len(body) >= self.GZIP_MIN_BYTES:
+            body = gzip.compress(body)
+            headers["Content-Encoding"] = "gzip"
+        if self._api_key:
+            headers["Authorization"] = f"Bearer {self._api_key}"
+
+        deadline = time.monotonic() + self._timeout
+        while True:
+            connection, reused = self._pool.acquire()
+            try:
+                if connection.sock is None:
+                    connection.connect()
+                    # Header und Body gehen getrennt raus; ohne TCP_NODELAY bremst Nagle jede Anfrage aus.
+                    connection.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                connection.sock.settimeout(self._socket_timeout(deadline))
+                connection.request("POST", self._path, body=body, headers=headers)
+                response = connection.getresponse()
+                connection.sock.settimeout(self._socket_timeout(deadline))
+                data = response.read()
+            except (ConnectionResetError, BrokenPipeError, http.client.BadStatusLine) as exc:
+                connection.close()
+                if reused:
+                    # Der Server hat die Keep-Alive-Verbindung inzwischen geschlossen.
+                    continue
+                raise RuntimeError(f"Chat-Service nicht erreichbar: {exc}") from exc
+            except (OSError, http.client.HTTPException) as exc:
+                connection.close()
+                raise RuntimeError(f"Chat-Service nicht erreichbar: {exc}") from exc
+            break
+
+        if response.will_close:
+            connection.close()
+        else:
+            self._pool.release(connection)
+
+        if response.getheader("Content-Encoding", "").lower() == "gzip":
+            try:
+                data = gzip.decompress(data)
+            except (OSError, EOFError) as exc:
+                raise RuntimeError("Ungültige Antwort vom Chat-Service erhalten.") from exc
+        if response.status >= 400:
+            raise RuntimeError(f"Chat-Service antwortete mit HTTP {response.status}.")
+        return data
+
+    def _socket_timeout(self, deadline: float) -> float:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise socket.timeout("Gesamtzeitlimit für den Chat-Service überschritten")
+        return min(self._read_timeout, remaining)
+
     @staticmethod
     def _normalise_context_item(item: Any) -> Dict[str, Any]:
         return {
@@ -131,6 +274,24 @@ def build_parser() -> argparse.ArgumentParser:
         default=4,
         help="Anzahl der vorangegangenen Benutzer/Assistenten-Paare, die behalten werden",
     )
+    parser.add_argument(
+        "--history-tokens",
+        type=int,
+        default=None,
+        help="Token-Budget für den Verlauf; ältere Runden werden zusammengefasst statt abgeschnitten",
+    )
+    parser.add_argument(
+        "--prompt-layout",
+        choices=("default", "stable"),
+        default="default",
+        help="'stable' hält System-Prompt und Verlauf über die Runden unverändert (für Prefix-Caches)",
+    )
+    parser.add_argument(
+        "--snippet-chars",
+        type=int,
+        default=420,
+        help="Maximale Länge des Ausschnitts pro Kontextpassage (Zeichen)",
+    )
     parser.add_argument(
         "--chat-url",
         type=str,
@@ -144,7 +305,24 @@ def build_parser() -> argparse.ArgumentParser:
         "--chat-timeout",
         type=float,
         default=30.0,
-        help="Zeitlimit für Anfragen an den Chat-Service (in Sekunden)",
+        help="Gesamtzeitlimit für Anfragen an den Chat-Service (in Sekunden)",
+    )
+    parser.add_argument(
+        "--chat-connect-timeout",
+        type=float,
+        default=None,
+        help="Zeitlimit für den Verbindungsaufbau (Standard: Gesamtzeitlimit)",
+    )
+    parser.add_argument(
+        "--chat-read-timeout",
+        type=float,
+        default=None,
+        help="Zeitlimit zwischen zwei empfangenen Datenpaketen (Standard: Gesamtzeitlimit)",
+    )
+    parser.add_argument(
+        "--chat-gzip",
+        action="store_true",
+        help="Anfragen an den Chat-Service gzip-komprimiert senden",
     )
     parser.add_argument(
         "--chat-token",
@@ -168,37 +346,44 @@ def main() -> None:
             endpoint=args.chat_url,
             timeout=args.chat_timeout,
             api_key=args.chat_token,
+            connect_timeout=args.chat_connect_timeout,
+            read_timeout=args.chat_read_timeout,
+            compress=args.chat_gzip,
         )
     except RuntimeError as exc:
         print(f"Fehler: {exc}", file=sys.stderr)
         return
-    session = ChatSession(
-        index,
-        responder=responder,
-        history_limit=args.history_limit,
-        top_k=args.top_k,
-        min_score=args.min_score,
-    )
+    with responder:
+        session = ChatSession(
+            index,
+            responder=responder,
+            history_limit=args.history_limit,
+            top_k=args.top_k,
+            min_score=args.min_score,
+            compactor=HistoryCompactor(args.history_tokens) if args.history_tokens else None,
+            prompt_layout=args.prompt_layout,
+            snippet_chars=args.snippet_chars,
+        )
 
-    print("edocs RAG-Chatbot – Tippe 'quit' oder 'exit' zum Beenden.")
-    while True:
-        try:
-            user_input = input("Du: ")
-        except (KeyboardInterrupt, EOFError):
-            print()
-            break
-        if user_input.strip().lower() in {"quit", "exit"}:
-            break
-        if not user_input.strip():
-            continue
+        print("edocs RAG-Chatbot – Tippe 'quit' oder 'exit' zum Beenden.")
+        while True:
+            try:
+                user_input = input("Du: ")
+            except (KeyboardInterrupt, EOFError):
+                print()
+                break
+            if user_input.strip().lower() in {"quit", "exit"}:
+                break
+            if not user_input.strip():
+                continue
 
-        try:
-            turn = session.send(user_input)
-        except RuntimeError as exc:
-            print(f"Fehler beim Abruf der Antwort: {exc}")
-            continue
+            try:
+                turn = session.send(user_input)
+            except RuntimeError as exc:
+                print(f"Fehler beim Abruf der Antwort: {exc}")
+                continue
 
-        print(_format_turn(turn))
+            print(_format_turn(turn))
 
 
 def _format_turn(turn: ChatTurn) -> str:
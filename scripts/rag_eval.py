@@ -1,19 +1,29 @@
 #!/usr/bin/env python3
 from __future__ import annotations
 
-"""Batch-Auswertung für den RAG-Chatbot."""
+"""Batch-Auswertung für den RAG-Chatbot.
+
+Mit ``--independent`` wird jede Frage ohne Verlauf beantwortet; dann lassen
+sich die Fragen über ``--workers`` parallel abarbeiten. Jeder Thread hält eine
+eigene Sitzung über denselben, nur gelesenen Index, und das Protokoll wird in
+der ursprünglichen Reihenfolge der Fragen geschrieben.
+"""
 
 import argparse
 import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from pathlib import Path
-from typing import List
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple, Union
 
-from rag_chatbot.chat import ChatPrompt, ChatSession
+from rag_chatbot.chat import ChatPrompt, ChatSession, ChatTurn
+from rag_chatbot.compaction import HistoryCompactor
 from rag_chatbot.retrieval import SemanticIndex
-from rag_chatbot.transcript import ChatTranscript
+from rag_chatbot.transcript import ChatTranscript, TranscriptWriter
 
 DEFAULT_INDEX_PATH = Path("data/rag-chatbot/index.json")
-DEFAULT_OUTPUT_PATH = Path("data/rag-chatbot/transcript.json")
+DEFAULT_OUTPUT_PATH = Path("data/rag-chatbot/transcript.jsonl")
 
 
 def parse_args() -> argparse.Namespace:
@@ -28,12 +38,49 @@ def parse_args() -> argparse.Namespace:
         "--output",
         type=Path,
         default=DEFAULT_OUTPUT_PATH,
-        help="JSON-Datei für das Gesprächsprotokoll",
+        help=(
+            "Datei für das Gesprächsprotokoll. Standard ist JSONL (eine Zeile pro Runde, "
+            "laufend geschrieben); mit der Endung .json wird wie bisher am Ende eine JSON-Datei erzeugt."
+        ),
     )
     parser.add_argument("--top-k", type=int, default=4, help="Maximale Anzahl an Kontexttreffern")
     parser.add_argument("--min-score", type=float, default=0.05, help="Mindestscore für Treffer")
     parser.add_argument("--history-limit", type=int, default=6, help="Maximale Gesprächslänge in Runden")
-    return parser.parse_args()
+    parser.add_argument(
+        "--history-tokens",
+        type=int,
+        default=None,
+        help="Token-Budget für den Verlauf; ältere Runden werden zusammengefasst statt abgeschnitten",
+    )
+    parser.add_argument(
+        "--prompt-layout",
+        choices=("default", "stable"),
+        default="default",
+        help="'stable' hält System-Prompt und Verlauf über die Runden unverändert (für Prefix-Caches)",
+    )
+    parser.add_argument(
+        "--snippet-chars",
+        type=int,
+        default=420,
+        help="Maximale Länge des Ausschnitts pro Kontextpassage (Zeichen)",
+    )
+    parser.add_argument(
+        "--independent",
+        action="store_true",
+        help="Jede Frage ohne bisherigen Verlauf beantworten",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Anzahl paralleler Sitzungen (erfordert --independent)",
+    )
+    args = parser.parse_args()
+    if args.workers <= 0:
+        parser.error("--workers muss größer als 0 sein.")
+    if args.workers > 1 and not args.independent:
+        parser.error("--workers > 1 erfordert --independent, da sonst jede Frage vom Verlauf abhängt.")
+    return args
 
 
 def load_questions(path: Path) -> List[str]:
@@ -67,6 +114,77 @@ def ensure_directory(path: Path) -> None:
         path.parent.mkdir(parents=True, exist_ok=True)
 
 
+class Progress:
+    """Gibt Fortschritt und Durchsatz laufend auf stderr aus."""
+
+    def __init__(self, total: int, *, clock: Callable[[], float] = time.perf_counter) -> None:
+        self.total = total
+        self.done = 0
+        self._clock = clock
+        self._started = clock()
+
+    def advance(self) -> None:
+        self.done += 1
+        elapsed = max(self._clock() - self._started, 1e-9)
+        end = "\n" if self.done == self.total else ""
+        print(
+            f"\r[{self.done}/{self.total}] {self.done / elapsed:.1f} Fragen/s",
+            end=end,
+            file=sys.stderr,
+            flush=True,
+        )
+
+
+def run_sequential(
+    session: ChatSession,
+    questions: List[str],
+    *,
+    independent: bool = False,
+) -> Iterator[Tuple[str, ChatTurn]]:
+    for question in questions:
+        if independent:
+            session.load_history(())
+        yield question, session.send(question)
+
+
+def run_parallel(
+    make_session: Callable[[], ChatSession],
+    questions: List[str],
+    *,
+    workers: int,
+) -> Iterator[Tuple[str, ChatTurn]]:
+    """Beantwortet unabhängige Fragen parallel und liefert sie in Eingabereihenfolge.
+
+    Fertige Runden werden zurückgehalten, bis alle vorherigen Fragen beantwortet
+    sind; höchstens ``2 * workers`` Fragen sind gleichzeitig in Arbeit.
+    """
+
+    local = threading.local()
+
+    def answer(question: str) -> ChatTurn:
+        session: Optional[ChatSession] = getattr(local, "session", None)
+        if session is None:
+            session = local.session = make_session()
+        session.load_history(())
+        return session.send(question)
+
+    finished: Dict[int, ChatTurn] = {}
+    running: Dict[Future, int] = {}
+    submitted = 0
+    emitted = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while emitted < len(questions):
+            while submitted < len(questions) and len(running) + len(finished) < workers * 2:
+                running[executor.submit(answer, questions[submitted])] = submitted
+                submitted += 1
+            done: Set[Future] = wait(running, return_when=FIRST_COMPLETED).done
+            for future in done:
+                finished[running.pop(future)] = future.result()
+            while emitted in finished:
+                yield questions[emitted], finished.pop(emitted)
+                emitted += 1
+
+
 def main() -> int:
     args = parse_args()
 
@@ -82,24 +200,46 @@ def main() -> int:
         print(f"Fehler beim Laden der Fragen: {exc}", file=sys.stderr)
         return 1
 
-    transcript = ChatTranscript()
-    session = ChatSession(
-        index,
-        responder=default_responder,
-        history_limit=args.history_limit,
-        top_k=args.top_k,
-        min_score=args.min_score,
-        transcript=transcript,
-    )
+    transcript: Union[ChatTranscript, TranscriptWriter]
+    if args.output and args.output.suffix != ".json":
+        transcript = TranscriptWriter(args.output)
+    else:
+        transcript = ChatTranscript()
+
+    def make_session() -> ChatSession:
+        return ChatSession(
+            index,
+            responder=default_responder,
+            history_limit=args.history_limit,
+            top_k=args.top_k,
+            min_score=args.min_score,
+            compactor=HistoryCompactor(args.history_tokens) if args.history_tokens else None,
+            prompt_layout=args.prompt_layout,
+            snippet_chars=args.snippet_chars,
+            record_timings=True,
+        )
 
-    for question in questions:
-        turn = session.send(question)
-        print(f"Frage: {question}")
-        print(f"Antwort:\n{turn.response}\n")
+    if args.workers > 1:
+        turns = run_parallel(make_session, questions, workers=args.workers)
+    else:
+        turns = run_sequential(make_session(), questions, independent=args.independent)
+
+    progress = Progress(len(questions))
+    try:
+        for question, turn in turns:
+            # Das Protokoll wird hier statt in der Sitzung geschrieben, damit die Reihenfolge stimmt.
+            transcript.record(question, turn)
+            progress.advance()
+            print(f"Frage: {question}")
+            print(f"Antwort:\n{turn.response}\n")
+    finally:
+        if isinstance(transcript, TranscriptWriter):
+            transcript.close()
 
     if args.output:
-        ensure_directory(args.output)
-        transcript.save(args.output)
+        if isinstance(transcript, ChatTranscript):
+            ensure_directory(args.output)
+            transcript.save(args.output)
         stats = transcript.stats()
         print(
             f"Gesprächsprotokoll gespeichert in {args.output}"
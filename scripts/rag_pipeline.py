@@ -4,12 +4,17 @@ from __future__ import annotations
 import argparse
 import sys
 from pathlib import Path
+from typing import List, Optional
 
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
 if str(PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(PROJECT_ROOT))
 
-from rag_chatbot import PipelineOptions, run_pipeline
+from rag_chatbot import PipelineOptions, PipelineResult, run_pipeline
+from rag_chatbot.daemon import BuildClient, DaemonError
+from rag_chatbot.domains import DomainResult, discover_domains, rebuild_domains
+from rag_chatbot.profiling import Profiler
+from rag_chatbot.progress import ProgressReporter
 
 DEFAULT_SOURCES = [
     Path("README.md"),
@@ -67,11 +72,89 @@ def build_parser() -> argparse.ArgumentParser:
         default=2,
         help="Minimale Länge eines Terms für das Vokabular",
     )
+    parser.add_argument(
+        "--term-offsets",
+        action="store_true",
+        help=(
+            "Fundstellen der Terme je Chunk im Index speichern (für die Snippet-Auswahl von "
+            "rag_chat.py/rag_eval.py; vergrößert den Index um etwa 50 %%)"
+        ),
+    )
     parser.add_argument(
         "--force",
         action="store_true",
         help="Erzwingt den Neuaufbau unabhängig von Zeitstempeln",
     )
+    parser.add_argument(
+        "--fused",
+        action="store_true",
+        help="Wissensbasis und Index in einem Durchlauf erzeugen, ohne das JSONL erneut einzulesen",
+    )
+    parser.add_argument(
+        "--no-corpus",
+        action="store_true",
+        help="Kein JSONL schreiben, nur den Index (impliziert --fused); eine vorhandene Wissensbasis wird gelöscht",
+    )
+    parser.add_argument(
+        "--no-lock",
+        action="store_true",
+        help="Ohne Build-Lock arbeiten (parallele Aufrufe werden nicht zusammengefasst)",
+    )
+    # Domain-Stapel, Daemon-Auftrag und Profiling schließen sich gegenseitig aus.
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument(
+        "--profile-report",
+        type=Path,
+        default=None,
+        help="Schreibt Laufzeit, CPU-Zeit und Speicherspitzen je Schritt als JSON in diese Datei",
+    )
+    parser.add_argument(
+        "--profile-top",
+        type=int,
+        default=10,
+        help="Anzahl der Codezeilen mit dem größten Speicherzuwachs pro Schritt",
+    )
+    mode.add_argument(
+        "--domains-root",
+        type=Path,
+        default=None,
+        help=(
+            "Baut alle Domains unterhalb dieses Ordners (Layout von DomainDocumentStorage) "
+            "in einem Prozess neu, sofern sie veraltet sind; Quellen, --corpus und --index entfallen"
+        ),
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Anzahl paralleler Domain-Builds mit --domains-root (Standard: Anzahl der CPU-Kerne)",
+    )
+    mode.add_argument(
+        "--daemon",
+        type=Path,
+        default=None,
+        help=(
+            "Socket eines laufenden Build-Daemons (rag_build_daemon.py); der Aufbau läuft dort. "
+            "Ist kein Daemon erreichbar, wird lokal gebaut"
+        ),
+    )
+    parser.add_argument(
+        "--priority",
+        type=int,
+        default=0,
+        help="Priorität des Auftrags beim Daemon (höher wird zuerst gebaut)",
+    )
+    parser.add_argument(
+        "--no-wait",
+        action="store_true",
+        help="Mit --daemon nur einreihen und nicht auf das Ergebnis warten",
+    )
+    parser.add_argument(
+        "--progress",
+        choices=("text", "json"),
+        default="text",
+        help="'json' gibt statt der Zusammenfassung laufend NDJSON-Ereignisse auf stdout aus",
+    )
     return parser
 
 
@@ -88,9 +171,126 @@ def main() -> None:
         max_features=args.max_features,
         min_term_length=args.min_term_length,
         force=args.force,
+        lock=not args.no_lock,
+        fused=args.fused or args.no_corpus,
+        write_corpus=not args.no_corpus,
+        term_offsets=args.term_offsets,
     )
 
-    result = run_pipeline(options)
+    progress = ProgressReporter.ndjson(sys.stdout) if args.progress == "json" else None
+    if args.domains_root is not None:
+        sys.exit(run_domains(args, options, progress))
+
+    if args.daemon is not None:
+        try:
+            result = submit_to_daemon(args, options, progress)
+        except OSError as exc:
+            # Kein Daemon erreichbar: wie bisher im eigenen Prozess bauen.
+            print(f"Build-Daemon unter {args.daemon} nicht erreichbar ({exc}), baue lokal.", file=sys.stderr)
+        else:
+            if progress is None and result is not None:
+                print_summary(result)
+            return
+
+    profiler = Profiler(top=args.profile_top) if args.profile_report is not None else None
+    try:
+        result = run_pipeline(options, profiler=profiler, progress=progress)
+    except (OSError, ValueError) as exc:
+        if progress is None:
+            raise
+        progress.emit("error", message=str(exc), type=type(exc).__name__)
+        raise SystemExit(1) from exc
+    finally:
+        if profiler is not None:
+            profiler.close()
+            profiler.write(args.profile_report)
+            if progress is not None:
+                progress.emit("profile_written", path=str(args.profile_report))
+
+    if progress is None:
+        print_summary(result)
+        if args.profile_report is not None:
+            print(f"Profil gespeichert in {args.profile_report}")
+
+
+def submit_to_daemon(
+    args: argparse.Namespace,
+    options: PipelineOptions,
+    progress: Optional[ProgressReporter],
+) -> Optional[PipelineResult]:
+    client = BuildClient(args.daemon)
+    try:
+        response = client.submit(options, priority=args.priority, wait=not args.no_wait)
+    except DaemonError as exc:
+        if progress is not None:
+            progress.emit("error", message=str(exc), type=type(exc).__name__)
+            raise SystemExit(1) from exc
+        raise SystemExit(f"Build-Daemon: {exc}") from exc
+
+    job = response["job"]
+    assert isinstance(job, dict)
+    if progress is not None:
+        progress.emit("job", **job)
+    if args.no_wait:
+        if progress is None:
+            merged = " (mit wartendem Auftrag zusammengefasst)" if response.get("merged") else ""
+            print(f"Auftrag {job['id']} beim Build-Daemon eingereiht{merged}.")
+        return None
+    if job["state"] == "failed":
+        if progress is not None:
+            progress.emit("error", message=str(job.get("error")), type="DaemonJobError")
+            raise SystemExit(1)
+        raise SystemExit(f"Aufbau fehlgeschlagen: {job.get('error')}")
+    result = PipelineResult.from_dict(job["result"])  # type: ignore[arg-type]
+    if progress is not None:
+        progress.emit("finished", **result.to_dict())
+    return result
+
+
+def run_domains(args: argparse.Namespace, template: PipelineOptions, progress: Optional[ProgressReporter]) -> int:
+    try:
+        targets = discover_domains(args.domains_root)
+    except FileNotFoundError:
+        print(f"Domain-Verzeichnis {args.domains_root} wurde nicht gefunden.", file=sys.stderr)
+        return 1
+    results = rebuild_domains(targets, template, workers=args.workers, progress=progress)
+    failed = sum(1 for result in results if result.status == "failed")
+    if progress is not None:
+        progress.emit("finished", domains=[result.to_dict() for result in results], failed=failed)
+    else:
+        print_domain_summary(results)
+    return 1 if failed else 0
+
+
+def print_domain_summary(results: List[DomainResult]) -> None:
+    labels = {
+        "built": "neu aufgebaut",
+        "up_to_date": "aktuell",
+        "coalesced": "vorgemerkt (Aufbau läuft bereits)",
+        "skipped": "keine Dokumente – übersprungen (Index unverändert)",
+        "failed": "fehlgeschlagen",
+    }
+    width = max((len(result.domain) for result in results), default=0)
+    for result in results:
+        line = f"{result.domain.ljust(width)}  {labels.get(result.status, result.status)}"
+        if result.result is not None and result.result.corpus is not None:
+            corpus = result.result.corpus
+            line += f" – Dokumente: {corpus.documents}, Chunks: {corpus.chunks}"
+        if result.status in ("built", "failed"):
+            line += f" ({result.seconds:.2f} s)"
+        if result.error:
+            line += f": {result.error}"
+        print(line)
+    built = sum(1 for result in results if result.status == "built")
+    print(f"{len(results)} Domain(s) geprüft, {built} neu aufgebaut.")
+
+
+def print_summary(result: PipelineResult) -> None:
+    if result.coalesced:
+        print("Ein Neuaufbau läuft bereits – die Anfrage wurde für einen weiteren Durchlauf vorgemerkt.")
+        return
+    if result.passes > 1:
+        print(f"Während des Aufbaus gingen weitere Anfragen ein; Durchläufe: {result.passes}.")
 
     if result.corpus:
         corpus = result.corpus
@@ -99,7 +299,7 @@ def main() -> None:
             f"Dokumente: {corpus.documents}",
             f"Chunks: {corpus.chunks}",
             f"Ø Wörter pro Chunk: {corpus.average_words}",
-            f"Datei: {corpus.output_path}",
+            f"Datei: {corpus.output_path}" if corpus.written else "Datei: nicht geschrieben (--no-corpus)",
             sep="\n",
         )
     else:
@@ -1,26 +1,33 @@
 #!/usr/bin/env python3
 from __future__ import annotations
 
-"""Erzeugt eine Auswertung für gespeicherte RAG-Transkripte."""
+"""Erzeugt eine Auswertung für gespeicherte RAG-Transkripte.
+
+Mehrere Dateien, Verzeichnisse oder Glob-Muster werden parallel gelesen und
+zu einem gemeinsamen Bericht zusammengeführt.
+"""
 
 import argparse
 import json
 import sys
 from pathlib import Path
 
-from rag_chatbot.report import build_report, format_report, load_transcript
+from rag_chatbot.report import TRANSCRIPT_GLOB, expand_transcript_paths, format_report, load_reports
 
-DEFAULT_TRANSCRIPT_PATH = Path("data/rag-chatbot/transcript.json")
+DEFAULT_TRANSCRIPT_PATH = Path("data/rag-chatbot/transcript.jsonl")
+LEGACY_TRANSCRIPT_PATH = Path("data/rag-chatbot/transcript.json")
 
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Erstellt eine Zusammenfassung für ein RAG-Transcript.")
     parser.add_argument(
-        "transcript",
-        nargs="?",
-        default=DEFAULT_TRANSCRIPT_PATH,
-        type=Path,
-        help="Pfad zur Transcript-JSON-Datei",
+        "transcripts",
+        nargs="*",
+        metavar="transcript",
+        help=(
+            "Transcript-Dateien (JSONL oder JSON), Verzeichnisse oder Glob-Muster. "
+            f"Standard: {DEFAULT_TRANSCRIPT_PATH}"
+        ),
     )
     parser.add_argument("--top", type=int, default=5, help="Anzahl der aufzulistenden Top-Quellen")
     parser.add_argument(
@@ -28,23 +35,45 @@ def parse_args() -> argparse.Namespace:
         action="store_true",
         help="Bericht als JSON ausgeben",
     )
+    parser.add_argument(
+        "--median",
+        action="store_true",
+        help="Geschätzten Median-Score je Quelle ergänzen",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Anzahl paralleler Prozesse (Standard: Anzahl der CPU-Kerne)",
+    )
+    parser.add_argument(
+        "--pattern",
+        default=TRANSCRIPT_GLOB,
+        help=f"Dateimuster für Verzeichnisse (Standard: {TRANSCRIPT_GLOB})",
+    )
     return parser.parse_args()
 
 
 def main() -> int:
     args = parse_args()
+    if not args.transcripts:
+        use_legacy = not DEFAULT_TRANSCRIPT_PATH.exists() and LEGACY_TRANSCRIPT_PATH.exists()
+        args.transcripts = [str(LEGACY_TRANSCRIPT_PATH if use_legacy else DEFAULT_TRANSCRIPT_PATH)]
+
+    paths = expand_transcript_paths(args.transcripts, pattern=args.pattern)
+    if not paths:
+        print(f"Keine Transcript-Dateien gefunden: {', '.join(args.transcripts)}", file=sys.stderr)
+        return 1
 
     try:
-        transcript = load_transcript(Path(args.transcript))
-    except FileNotFoundError:
-        print(f"Transcript-Datei {args.transcript} wurde nicht gefunden.", file=sys.stderr)
+        report = load_reports(paths, workers=args.workers, median=args.median)
+    except FileNotFoundError as exc:
+        print(f"Transcript-Datei {exc.filename} wurde nicht gefunden.", file=sys.stderr)
         return 1
     except ValueError as exc:
         print(f"Fehler beim Laden des Transcripts: {exc}", file=sys.stderr)
         return 1
 
-    report = build_report(transcript)
-
     if args.json:
         payload = report.to_dict()
         print(json.dumps(payload, ensure_ascii=False, indent=2))
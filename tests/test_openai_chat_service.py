@@ -0,0 +1,446 @@
+from __future__ import annotations
+
+import asyncio
+import gzip
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+pytest.importorskip("fastapi")
+pytest.importorskip("openai")
+pytest.importorskip("httpx")
+
+from fastapi.testclient import TestClient
+
+from scripts import openai_chat_service as service
+
+
+class FakeCompletions:
+    def __init__(self, answer: str = "Antwort") -> None:
+        self.answer = answer
+        self.calls: List[Dict[str, Any]] = []
+
+    def create(self, **kwargs: Any) -> Any:
+        self.calls.append(kwargs)
+        message = SimpleNamespace(content=self.answer)
+        usage = SimpleNamespace(prompt_tokens=12, completion_tokens=3)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+
+@pytest.fixture
+def completions(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> FakeCompletions:
+    fake = FakeCompletions()
+    client = SimpleNamespace(chat=SimpleNamespace(completions=fake))
+    monkeypatch.setattr(service, "_get_openai_client", lambda: client)
+    monkeypatch.delenv("RAG_CHAT_SERVICE_TOKEN", raising=False)
+    monkeypatch.setenv("RAG_CHAT_SERVICE_DATA_DIR", str(tmp_path))
+    service._get_chunk_store.cache_clear()
+    yield fake
+    service._get_chunk_store.cache_clear()
+
+
+def _write_domain_corpus(base: Path, domain: str) -> None:
+    path = base / "domains" / domain / "corpus.jsonl"
+    path.parent.mkdir(parents=True)
+    entry = {
+        "id": "faq:0000",
+        "source": "uploads/faq.md",
+        "title": "FAQ",
+        "chunk_index": 0,
+        "word_count": 5,
+        "text": "Der Einlass beginnt um 18 Uhr.",
+    }
+    path.write_text(json.dumps(entry, ensure_ascii=False) + "\n", encoding="utf-8")
+
+
+def test_chat_resolves_id_only_context_items(completions: FakeCompletions, tmp_path: Path) -> None:
+    _write_domain_corpus(tmp_path, "example.com")
+    client = TestClient(service.app)
+
+    response = client.post(
+        "/chat",
+        json={
+            "messages": [{"role": "user", "content": "Wann ist Einlass?"}],
+            "context": [
+                {"id": "faq:0000", "score": 0.9, "domain": "example.com"},
+                {"id": "faq:4242", "domain": "example.com"},
+                {"id": "inline", "text": "Inline-Kontext bleibt erhalten."},
+            ],
+        },
+    )
+
+    assert response.status_code == 200
+    assert response.json() == {"answer": "Antwort"}
+    context_message = completions.calls[0]["messages"][0]["content"]
+    assert "Der Einlass beginnt um 18 Uhr." in context_message
+    assert "uploads/faq.md" in context_message
+    assert "Inline-Kontext bleibt erhalten." in context_message
+    assert "faq:4242" not in context_message
+
+
+def test_chat_resolves_context_outside_the_event_loop(
+    completions: FakeCompletions, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    loops: List[bool] = []
+
+    def resolve(store: Any, chunk_id: str, domain: Any) -> Any:
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            loops.append(False)
+        else:
+            loops.append(True)
+        return SimpleNamespace(text="Aufgelöster Text.", metadata={"source": "faq.md"})
+
+    monkeypatch.setattr(service.ChunkStore, "resolve", resolve)
+    client = TestClient(service.app)
+
+    response = client.post(
+        "/chat",
+        json={"messages": [{"role": "user", "content": "Frage"}], "context": [{"id": "faq:0000"}]},
+    )
+
+    assert response.status_code == 200
+    assert loops == [False]
+    assert "Aufgelöster Text." in completions.calls[0]["messages"][0]["content"]
+
+
+def test_chat_rejects_invalid_context_domain(completions: FakeCompletions) -> None:
+    client = TestClient(service.app)
+
+    response = client.post(
+        "/chat",
+        json={
+            "messages": [{"role": "user", "content": "Hallo"}],
+            "context": [{"id": "faq:0000"}],
+            "domain": "../etc",
+        },
+    )
+
+    assert response.status_code == 400
+    assert completions.calls == []
+
+
+def test_prefix_fingerprint_keeps_context_behind_stable_prefix(
+    completions: FakeCompletions, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv("RAG_CHAT_SERVICE_PROMPT_CACHE_KEY", "1")
+    client = TestClient(service.app)
+    messages = [
+        {"role": "system", "content": "System"},
+        {"role": "user", "content": "Erste Frage"},
+        {"role": "assistant", "content": "Erste Antwort"},
+        {"role": "user", "content": "Zweite Frage"},
+    ]
+
+    response = client.post(
+        "/chat",
+        json={
+            "messages": messages,
+            "context": [{"id": "inline", "text": "Inline-Kontext."}],
+            "prefix_fingerprint": "abc123",
+            "cache_key": "session-1",
+        },
+    )
+
+    assert response.status_code == 200
+    sent = completions.calls[0]["messages"]
+    assert sent[:3] == messages[:3]
+    assert "Inline-Kontext." in sent[3]["content"]
+    assert sent[4] == messages[3]
+    # Der Fingerprint wechselt jede Runde und taugt nicht als Routing-Schlüssel.
+    assert completions.calls[0]["prompt_cache_key"] == "session-1"
+
+    client.post(
+        "/chat",
+        json={
+            "messages": messages,
+            "context": [{"id": "inline", "text": "Inline-Kontext."}],
+            "prefix_fingerprint": "abc123",
+        },
+    )
+    assert "prompt_cache_key" not in completions.calls[1]
+
+
+def test_metrics_endpoint_reports_request_and_upstream_timings(completions: FakeCompletions) -> None:
+    client = TestClient(service.app)
+    before = service.UPSTREAM_DURATION.count
+    prompt_tokens = service.PROMPT_TOKENS_TOTAL.value()
+
+    client.post("/chat", json={"messages": [{"role": "user", "content": "Hallo"}]})
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert "# TYPE rag_chat_request_duration_seconds histogram" in body
+    assert 'rag_chat_responses_total{path="/chat",status="200"}' in body
+    assert "rag_chat_requests_in_flight 0" in body
+    assert service.UPSTREAM_DURATION.count == before + 1
+    assert service.PROMPT_TOKENS_TOTAL.value() == prompt_tokens + 12
+
+
+class FakeUpstream:
+    """Local OpenAI-compatible server answering after injected delays."""
+
+    def __init__(self, latencies: List[float]) -> None:
+        self.latencies = list(latencies)
+        self.calls = 0
+        self._lock = threading.Lock()
+        upstream = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self) -> None:  # noqa: N802 - http.server API
+                length = int(self.headers.get("Content-Length", "0"))
+                self.rfile.read(length)
+                with upstream._lock:
+                    upstream.calls += 1
+                    number = upstream.calls
+                    delay = upstream.latencies.pop(0) if upstream.latencies else 0.0
+                time.sleep(delay)
+                body = json.dumps(
+                    {
+                        "id": f"chatcmpl-{number}",
+                        "object": "chat.completion",
+                        "created": 0,
+                        "model": "fake",
+                        "choices": [
+                            {
+                                "index": 0,
+                                "finish_reason": "stop",
+                                "message": {"role": "assistant", "content": f"call-{number}"},
+                            }
+                        ],
+                        "usage": {"prompt_tokens": 5, "completion_tokens": 1, "total_tokens": 6},
+                    }
+                ).encode("utf-8")
+                try:
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def log_message(self, format: str, *args: Any) -> None:
+                return
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def __enter__(self) -> "FakeUpstream":
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def upstream_env(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.delenv("RAG_CHAT_SERVICE_TOKEN", raising=False)
+    monkeypatch.delenv("RAG_CHAT_SERVICE_REQUEST_TIMEOUT", raising=False)
+    monkeypatch.setenv("RAG_CHAT_SERVICE_DATA_DIR", str(tmp_path))
+    monkeypatch.setenv("RAG_CHAT_SERVICE_HEDGE_PERCENTILE", "95")
+    monkeypatch.setenv("RAG_CHAT_SERVICE_HEDGE_INITIAL_DELAY", "0.1")
+    monkeypatch.setenv("RAG_CHAT_SERVICE_HEDGE_MIN_SAMPLES", "1000")
+    service.UPSTREAM_LATENCIES.clear()
+
+
+def _post_question(client: TestClient, **headers: str) -> Any:
+    return client.post(
+        "/chat",
+        json={"messages": [{"role": "user", "content": "Hallo"}]},
+        headers=headers,
+    )
+
+
+def test_slow_upstream_call_is_hedged(upstream_env: None, monkeypatch: pytest.MonkeyPatch) -> None:
+    hedges = service.HEDGES_TOTAL.value()
+    wins = service.HEDGE_WINS_TOTAL.value()
+    wasted = service.HEDGE_WASTED_TOTAL.value()
+
+    with FakeUpstream([1.5, 0.0]) as upstream, TestClient(service.app) as client:
+        monkeypatch.setenv("OPENAI_BASE_URL", upstream.base_url)
+        started = time.monotonic()
+        response = _post_question(client)
+        elapsed = time.monotonic() - started
+
+    assert response.status_code == 200
+    assert response.json() == {"answer": "call-2"}
+    assert elapsed < 1.2
+    assert service.HEDGES_TOTAL.value() == hedges + 1
+    assert service.HEDGE_WINS_TOTAL.value() == wins + 1
+    assert service.HEDGE_WASTED_TOTAL.value() == wasted + 1
+
+
+def test_fast_upstream_call_is_not_hedged(upstream_env: None, monkeypatch: pytest.MonkeyPatch) -> None:
+    hedges = service.HEDGES_TOTAL.value()
+
+    with FakeUpstream([0.0]) as upstream:
+        monkeypatch.setenv("OPENAI_BASE_URL", upstream.base_url)
+        response = _post_question(TestClient(service.app))
+        calls = upstream.calls
+
+    assert response.json() == {"answer": "call-1"}
+    assert calls == 1
+    assert service.HEDGES_TOTAL.value() == hedges
+
+
+def test_request_deadline_header_bounds_upstream_wait(upstream_env: None, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.delenv("RAG_CHAT_SERVICE_HEDGE_PERCENTILE")
+    exceeded = service.DEADLINE_EXCEEDED_TOTAL.value()
+
+    with FakeUpstream([1.5]) as upstream, TestClient(service.app) as client:
+        monkeypatch.setenv("OPENAI_BASE_URL", upstream.base_url)
+        started = time.monotonic()
+        response = _post_question(client, **{"X-Request-Timeout": "0.2"})
+        elapsed = time.monotonic() - started
+
+    assert response.status_code == 504
+    assert elapsed < 1.2
+    assert service.DEADLINE_EXCEEDED_TOTAL.value() == exceeded + 1
+
+
+def test_hedge_is_skipped_when_no_upstream_slot_is_free(
+    upstream_env: None, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv("RAG_CHAT_SERVICE_MAX_CONCURRENCY", "1")
+    hedges = service.HEDGES_TOTAL.value()
+    skipped = service.HEDGES_SKIPPED_TOTAL.value()
+
+    with FakeUpstream([0.4, 0.0]) as upstream, TestClient(service.app) as client:
+        monkeypatch.setenv("OPENAI_BASE_URL", upstream.base_url)
+        response = _post_question(client)
+        calls = upstream.calls
+
+    assert response.json() == {"answer": "call-1"}
+    assert calls == 1
+    assert service.HEDGES_TOTAL.value() == hedges
+    assert service.HEDGES_SKIPPED_TOTAL.value() == skipped + 1
+
+
+def test_deadline_bounds_wait_for_an_upstream_slot() -> None:
+    async def scenario() -> float:
+        limit = asyncio.Semaphore(1)
+        await limit.acquire()
+        started = time.monotonic()
+        with pytest.raises(service.DeadlineExceeded):
+            await service._acquire_slot(limit, time.monotonic() + 0.1)
+        elapsed = time.monotonic() - started
+        limit.release()
+        await service._acquire_slot(limit, time.monotonic() + 0.1)
+        assert limit.locked()
+        return elapsed
+
+    assert asyncio.run(scenario()) < 0.5
+
+
+def test_hedge_delay_follows_observed_percentile() -> None:
+    window = service._LatencyWindow(size=100)
+    for value in range(1, 101):
+        window.add(value / 100)
+    settings = service.HedgeSettings(percentile=90, initial_delay=2.0, min_delay=0.05, min_samples=10)
+
+    assert settings.delay(window) == pytest.approx(0.9)
+    assert settings.delay(service._LatencyWindow()) == 2.0
+
+
+def test_batch_streams_ndjson_results_tagged_with_index(
+    completions: FakeCompletions, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+    original_create = completions.create
+
+    in_flight: List[float] = []
+
+    def slow_create(**kwargs: Any) -> Any:
+        nonlocal active, peak
+        with lock:
+            active += 1
+            peak = max(peak, active)
+        time.sleep(0.05)
+        in_flight.append(service.REQUESTS_IN_FLIGHT.value)
+        with lock:
+            active -= 1
+        return original_create(**kwargs)
+
+    monkeypatch.setattr(completions, "create", slow_create)
+    monkeypatch.setenv("RAG_CHAT_SERVICE_MAX_CONCURRENCY", "2")
+
+    questions = [{"messages": [{"role": "user", "content": f"Frage {i}"}]} for i in range(5)]
+    questions.insert(2, {"messages": []})
+
+    durations = service.REQUEST_DURATION.count
+    with TestClient(service.app) as client:
+        response = client.post("/chat/batch", json={"requests": questions})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    results = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(item["index"] for item in results) == list(range(6))
+    by_index = {item["index"]: item for item in results}
+    assert by_index[2]["status"] == 400
+    assert all(by_index[i] == {"index": i, "status": 200, "answer": "Antwort"} for i in (0, 1, 3, 4, 5))
+    assert len(completions.calls) == 5
+    assert peak <= 2
+    # The batch stays in flight until its stream has been fully sent.
+    assert in_flight == [1.0] * 5
+    assert service.REQUESTS_IN_FLIGHT.value == 0
+    assert service.REQUEST_DURATION.count == durations + 1
+
+
+def test_batch_rejects_oversized_requests(completions: FakeCompletions, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("RAG_CHAT_SERVICE_MAX_BATCH_SIZE", "1")
+    question = {"messages": [{"role": "user", "content": "Hallo"}]}
+
+    response = TestClient(service.app).post("/chat/batch", json={"requests": [question, question]})
+
+    assert response.status_code == 413
+    assert completions.calls == []
+
+
+def test_chat_accepts_gzip_request_body(completions: FakeCompletions) -> None:
+    payload = json.dumps({"messages": [{"role": "user", "content": "Hallo " * 400}]}).encode("utf-8")
+
+    response = TestClient(service.app).post(
+        "/chat",
+        content=gzip.compress(payload),
+        headers={"Content-Type": "application/json", "Content-Encoding": "gzip"},
+    )
+
+    assert response.status_code == 200
+    assert completions.calls[0]["messages"][0]["content"].startswith("Hallo Hallo")
+
+
+def test_chat_rejects_corrupt_gzip_request_body(completions: FakeCompletions) -> None:
+    response = TestClient(service.app).post(
+        "/chat",
+        content=b"kein gzip",
+        headers={"Content-Type": "application/json", "Content-Encoding": "gzip"},
+    )
+
+    assert response.status_code == 400
+    assert completions.calls == []
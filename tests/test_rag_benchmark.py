@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+import sys
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from rag_chatbot import PipelineOptions, SemanticIndex, run_pipeline
+from rag_chatbot.benchmark import (
+    BASE_DOCUMENTS,
+    SEARCH_MODES,
+    STAGES,
+    BenchmarkOptions,
+    TextGenerator,
+    dump_benchmark,
+    parse_scales,
+    recall_at_k,
+    run_benchmark,
+    write_corpus,
+)
+
+
+def test_synthetic_corpus_is_deterministic_and_scales(tmp_path: Path) -> None:
+    first = write_corpus(tmp_path / "a", 0.2, seed=3)
+    second = write_corpus(tmp_path / "b", 0.2, seed=3)
+    larger = write_corpus(tmp_path / "c", 0.4, seed=3)
+
+    assert first.documents == round(BASE_DOCUMENTS * 0.2)
+    assert [path.read_text(encoding="utf-8") for path in first.paths] == [
+        path.read_text(encoding="utf-8") for path in second.paths
+    ]
+    assert larger.documents == 2 * first.documents
+    assert first.paths[0].read_text(encoding="utf-8").startswith("# ")
+
+
+def test_questions_do_not_depend_on_scale() -> None:
+    assert TextGenerator(seed=5).questions(6) == TextGenerator(seed=5).questions(6)
+    assert TextGenerator(seed=5).questions(6) != TextGenerator(seed=6).questions(6)
+
+
+def test_benchmark_reports_all_stages(tmp_path: Path) -> None:
+    options = BenchmarkOptions(scales=[0.1], workdir=tmp_path, questions=10, isolate=False)
+    result = run_benchmark(options)
+
+    run = result["runs"][0]
+    assert result["format"] == "rag-benchmark"
+    assert tuple(run["stages"]) == STAGES
+    assert run["index_bytes"] > 0 and run["corpus_bytes"] > 0
+    assert run["stages"]["corpus"]["chunks"] == run["stages"]["chunk"]["chunks"]
+    query = run["stages"]["query"]
+    assert query["queries"] == 10
+    assert query["p50_ms"] <= query["p95_ms"] <= query["p99_ms"]
+    assert 0.0 <= query["recall_at_k"]["search"] <= 1.0
+    assert json.loads(dump_benchmark(result, tmp_path / "out.json")) == result
+
+
+def test_rejects_unknown_modes_and_scales(tmp_path: Path) -> None:
+    with pytest.raises(ValueError):
+        run_benchmark(BenchmarkOptions(scales=[1], workdir=tmp_path, modes=("hnsw",)))
+    with pytest.raises(ValueError):
+        parse_scales("1,-2")
+
+
+def test_exhaustive_search_has_full_recall_with_score_threshold(tmp_path: Path) -> None:
+    write_corpus(tmp_path / "sources", 0.2, seed=3)
+    options = PipelineOptions(
+        sources=[tmp_path / "sources"],
+        corpus_path=tmp_path / "corpus.jsonl",
+        index_path=tmp_path / "index.json",
+    )
+    run_pipeline(options)
+    index = SemanticIndex(options.index_path)
+    questions = TextGenerator(seed=3).questions(20)
+    min_score = 0.2
+
+    # Die Schwelle muss Treffer abschneiden, sonst prüft der Test nichts.
+    assert any(
+        0.0 < result.score < min_score
+        for question in questions
+        for result in index.search(question, top_k=5, min_score=0.0)
+    )
+    assert recall_at_k(index, questions, SEARCH_MODES["search"], top_k=5, min_score=min_score) == 1.0
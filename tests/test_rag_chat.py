@@ -1,5 +1,8 @@
 from __future__ import annotations
 
+import asyncio
+import threading
+import time
 from dataclasses import dataclass
 from pathlib import Path
 from typing import List
@@ -12,8 +15,9 @@ ROOT = Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
-from rag_chatbot.chat import ChatSession
+from rag_chatbot.chat import AsyncChatSession, ChatSession, prefix_fingerprint
 from rag_chatbot.retrieval import SearchResult
+from rag_chatbot.transcript import ChatTranscript
 
 
 @dataclass
@@ -94,3 +98,158 @@ def test_chat_session_rejects_empty_input() -> None:
 
     with pytest.raises(ValueError):
         session.send("   ")
+
+
+def _prefix_kept(previous, current) -> bool:
+    return current.messages[: previous.prefix_length] == previous.prefix
+
+
+def test_stable_prompt_layout_keeps_prefix_across_turns() -> None:
+    index = FakeIndex(
+        [SearchResult(chunk_id="doc:0001", score=0.9, text="edocs nutzt Slim.", metadata={"title": "README"})]
+    )
+    prompts: list = []
+
+    def responder(prompt):
+        prompts.append(prompt)
+        return f"Antwort {len(prompts)}"
+
+    session = ChatSession(index, responder=responder, history_limit=4, prompt_layout="stable")
+    for number in range(1, 9):
+        session.send(f"Frage {number}")
+
+    assert all(prompt.layout == "stable" for prompt in prompts)
+    assert prompts[0].messages[0].role == "system"
+    assert prompts[0].messages[-1].role == "user"
+    assert "Kontext aus der Wissensbasis" in prompts[0].messages[-1].content
+    assert prompts[0].messages[-1].content.endswith("Frage 1")
+    for prompt in prompts:
+        assert all("Kontext aus der Wissensbasis" not in message.content for message in prompt.prefix)
+
+    # Der Cache-Schlüssel bleibt über alle Runden gleich, der Fingerprint nicht.
+    assert {prompt.cache_key for prompt in prompts} == {prompts[0].cache_key} != {""}
+    assert len({prompt.prefix_fingerprint for prompt in prompts}) > 1
+
+    kept = [_prefix_kept(previous, current) for previous, current in zip(prompts, prompts[1:])]
+    # Nur das einmalige Kürzen nach Überschreiten des Limits bricht den Prefix.
+    assert kept.count(False) == 1
+    for previous, current in zip(prompts, prompts[1:]):
+        if _prefix_kept(previous, current):
+            assert current.prefix_length > previous.prefix_length
+            assert previous.prefix_fingerprint == prefix_fingerprint(current.messages[: previous.prefix_length])
+
+
+def test_default_prompt_layout_shifts_prefix_once_history_is_full() -> None:
+    prompts: list = []
+
+    def responder(prompt):
+        prompts.append(prompt)
+        return f"Antwort {len(prompts)}"
+
+    session = ChatSession(FakeIndex([]), responder=responder, history_limit=2)
+    for number in range(1, 7):
+        session.send(f"Frage {number}")
+
+    kept = [_prefix_kept(previous, current) for previous, current in zip(prompts, prompts[1:])]
+    assert kept == [True, True, False, False, False]
+    assert prompts[0].prefix_fingerprint == prefix_fingerprint(prompts[0].messages[:1])
+
+
+def test_chat_session_rejects_unknown_prompt_layout() -> None:
+    with pytest.raises(ValueError):
+        ChatSession(FakeIndex([]), responder=lambda prompt: "", prompt_layout="random")
+
+
+def test_async_chat_session_matches_sync_history_and_transcript() -> None:
+    results = [
+        SearchResult(
+            chunk_id="doc:0001",
+            score=0.8,
+            text="edocs ist eine Webanwendung für Quizrunden.",
+            metadata={"title": "README", "chunk_index": 0},
+        ),
+    ]
+    questions = ["Erste Frage", "Zweite Frage", "Dritte Frage"]
+
+    sync_transcript = ChatTranscript()
+    sync_session = ChatSession(
+        FakeIndex(results),
+        responder=lambda prompt: f"Antwort auf {prompt.messages[-1].content} ",
+        history_limit=1,
+        transcript=sync_transcript,
+    )
+    sync_turns = [sync_session.send(question) for question in questions]
+
+    async def responder(prompt):
+        await asyncio.sleep(0)
+        return f"Antwort auf {prompt.messages[-1].content} "
+
+    async_transcript = ChatTranscript()
+    async_session = AsyncChatSession(
+        FakeIndex(results),
+        responder=responder,
+        history_limit=1,
+        transcript=async_transcript,
+    )
+
+    async def run():
+        return [await async_session.asend(question) for question in questions]
+
+    async_turns = asyncio.run(run())
+
+    assert async_turns == sync_turns
+    assert async_session.history == sync_session.history
+    assert async_transcript.turns == sync_transcript.turns
+
+
+def test_async_chat_session_records_transcript_off_the_event_loop() -> None:
+    class ThreadRecordingTranscript(ChatTranscript):
+        def __init__(self) -> None:
+            super().__init__()
+            self.threads: List[int] = []
+
+        def record(self, question, turn) -> None:
+            self.threads.append(threading.get_ident())
+            super().record(question, turn)
+
+    async def responder(prompt):
+        return "Antwort"
+
+    transcript = ThreadRecordingTranscript()
+    session = AsyncChatSession(FakeIndex([]), responder=responder, transcript=transcript)
+
+    async def run() -> int:
+        await session.asend("Erste Frage")
+        await session.asend("Zweite Frage")
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(run())
+
+    assert [turn.question for turn in transcript.turns] == ["Erste Frage", "Zweite Frage"]
+    assert len(transcript.threads) == 2 and loop_thread not in transcript.threads
+
+
+def test_async_chat_sessions_share_one_event_loop() -> None:
+    results = [
+        SearchResult(chunk_id="doc:0001", score=0.8, text="Kontext", metadata={"title": "README"}),
+    ]
+    index = FakeIndex(results)
+    session_count = 1000
+    responder_delay = 0.05
+
+    async def responder(prompt):
+        await asyncio.sleep(responder_delay)
+        return "Antwort"
+
+    async def run():
+        sessions = [AsyncChatSession(index, responder=responder) for _ in range(session_count)]
+        started = time.perf_counter()
+        turns = await asyncio.gather(*(session.asend(f"Frage {i}") for i, session in enumerate(sessions)))
+        return turns, time.perf_counter() - started
+
+    turns, elapsed = asyncio.run(run())
+
+    assert len(turns) == session_count
+    assert all(turn.response == "Antwort" for turn in turns)
+    # Sequenziell wären es 1000 * 50 ms = 50 s.
+    assert elapsed < session_count * responder_delay / 10
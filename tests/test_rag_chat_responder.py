@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import gzip
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, List
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from rag_chatbot.chat import ChatMessage, ChatPrompt
+from rag_chatbot.retrieval import SearchResult
+from scripts.rag_chat import ChatServiceResponder
+
+
+class StubChatService:
+    """HTTP/1.1-Stub, der Verbindungen und Anfragen mitzählt."""
+
+    def __init__(self, *, close_after: int = 0, gzip_responses: bool = False, delay: float = 0.0) -> None:
+        self.connections = 0
+        self.requests: List[dict] = []
+        self.encodings: List[str] = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def setup(self) -> None:
+                super().setup()
+                stub.connections += 1
+
+            def do_POST(self) -> None:  # noqa: N802 - http.server API
+                body = self.rfile.read(int(self.headers.get("Content-Length", "0")))
+                encoding = self.headers.get("Content-Encoding", "")
+                stub.encodings.append(encoding)
+                if encoding == "gzip":
+                    body = gzip.decompress(body)
+                stub.requests.append(json.loads(body))
+                time.sleep(delay)
+                payload = json.dumps({"answer": f"Antwort {len(stub.requests)}"}).encode("utf-8")
+                if gzip_responses and "gzip" in self.headers.get("Accept-Encoding", ""):
+                    payload = gzip.compress(payload)
+                try:
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    if gzip_responses:
+                        self.send_header("Content-Encoding", "gzip")
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                except (BrokenPipeError, ConnectionResetError):
+                    # Der Client hat nach seinem Timeout bereits aufgelegt.
+                    self.close_connection = True
+                    return
+                if close_after and len(stub.requests) % close_after == 0:
+                    self.close_connection = True
+
+            def log_message(self, format: str, *args: Any) -> None:
+                return
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/chat"
+
+    def __enter__(self) -> "StubChatService":
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def _prompt(question: str = "Was ist edocs?") -> ChatPrompt:
+    context = (
+        SearchResult(
+            chunk_id="doc:0001",
+            score=0.8,
+            text="edocs ist eine Webanwendung für Quizrunden. " * 40,
+            metadata={"title": "README"},
+        ),
+    )
+    return ChatPrompt(messages=(ChatMessage("user", question),), context=context)
+
+
+def test_responder_reuses_keep_alive_connection() -> None:
+    with StubChatService() as stub:
+        responder = ChatServiceResponder(stub.url, timeout=5.0)
+        answers = [responder(_prompt()) for _ in range(5)]
+        responder.close()
+
+    assert answers == [f"Antwort {i}" for i in range(1, 6)]
+    assert stub.connections == 1
+    assert responder.connections_opened == 1
+
+
+def test_responder_reconnects_after_server_closed_connection() -> None:
+    with StubChatService(close_after=1) as stub:
+        responder = ChatServiceResponder(stub.url, timeout=5.0)
+        answers = [responder(_prompt()) for _ in range(3)]
+        responder.close()
+
+    assert answers == ["Antwort 1", "Antwort 2", "Antwort 3"]
+    assert stub.connections == 3
+
+
+def test_responder_compresses_request_and_inflates_response() -> None:
+    with StubChatService(gzip_responses=True) as stub:
+        responder = ChatServiceResponder(stub.url, timeout=5.0, compress=True)
+        answer = responder(_prompt())
+        responder.close()
+
+    assert answer == "Antwort 1"
+    assert stub.encodings == ["gzip"]
+    assert stub.requests[0]["context"][0]["id"] == "doc:0001"
+
+
+def test_responder_enforces_read_timeout() -> None:
+    with StubChatService(delay=0.5) as stub:
+        with ChatServiceResponder(stub.url, timeout=5.0, read_timeout=0.1) as responder:
+            started = time.monotonic()
+            with pytest.raises(RuntimeError):
+                responder(_prompt())
+            elapsed = time.monotonic() - started
+
+    assert elapsed < 0.45
+
+
+def test_responder_context_manager_closes_connections_on_error() -> None:
+    with StubChatService() as stub:
+        with pytest.raises(KeyboardInterrupt):
+            with ChatServiceResponder(stub.url, timeout=5.0) as responder:
+                responder(_prompt())
+                assert responder._pool._idle
+                raise KeyboardInterrupt
+
+    assert responder._pool._idle == []
@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import json
+import os
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from rag_chatbot.chunk_store import ChunkStore
+
+
+def _write_corpus(path: Path, entries: List[Dict[str, object]]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8") as handle:
+        for entry in entries:
+            json.dump(entry, handle, ensure_ascii=False)
+            handle.write("\n")
+
+
+def _entry(chunk_id: str, text: str) -> Dict[str, object]:
+    return {
+        "id": chunk_id,
+        "source": "docs/faq.md",
+        "title": "FAQ",
+        "chunk_index": int(chunk_id.split(":")[1]),
+        "word_count": len(text.split()),
+        "text": text,
+    }
+
+
+def test_chunk_store_resolves_domain_chunks(tmp_path: Path) -> None:
+    _write_corpus(
+        tmp_path / "domains" / "example.com" / "corpus.jsonl",
+        [_entry("faq:0000", "Öffnungszeiten ab 10 Uhr."), _entry("faq:0001", "Anmeldung per E-Mail.")],
+    )
+    store = ChunkStore(tmp_path)
+
+    chunk = store.resolve("faq:0001", "Example.com")
+
+    assert chunk is not None
+    assert chunk.text == "Anmeldung per E-Mail."
+    assert chunk.metadata == {"source": "docs/faq.md", "title": "FAQ", "chunk_index": 1, "word_count": 3}
+    assert store.resolve("faq:9999", "example.com") is None
+    assert store.resolve("faq:0000", "unknown.org") is None
+
+
+def test_chunk_store_cache_is_bounded_and_reloads_changed_corpus(tmp_path: Path) -> None:
+    corpus = tmp_path / "corpus.jsonl"
+    _write_corpus(corpus, [_entry(f"doc:{i:04d}", f"Text {i}") for i in range(5)])
+    store = ChunkStore(tmp_path, cache_size=2)
+
+    for i in range(5):
+        assert store.resolve(f"doc:{i:04d}") is not None
+    assert store.cached_chunks == 2
+
+    _write_corpus(corpus, [_entry("doc:0000", "Neuer Text")])
+    stat = corpus.stat()
+    os.utime(corpus, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    chunk = store.resolve("doc:0000")
+    assert chunk is not None and chunk.text == "Neuer Text"
+    assert store.resolve("doc:0004") is None
+
+
+def test_chunk_store_rejects_path_traversal(tmp_path: Path) -> None:
+    store = ChunkStore(tmp_path)
+    with pytest.raises(ValueError):
+        store.resolve("doc:0000", "../secrets")
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from rag_chatbot.chat import ChatMessage, ChatSession, estimate_tokens
+from rag_chatbot.compaction import SUMMARY_HEADER, ExtractiveSummariser, HistoryCompactor, split_summary
+from rag_chatbot.retrieval import SearchResult
+from rag_chatbot.transcript import ChatTranscript
+
+
+@dataclass
+class FakeIndex:
+    results: List[SearchResult]
+
+    def search(self, query: str, *, top_k: int, min_score: float):
+        return self.results[:top_k]
+
+
+def _long_answer(number: int) -> str:
+    return f"Antwort {number} beginnt hier. " + "Weitere ausführliche Details folgen. " * 20
+
+
+def test_compactor_keeps_history_within_token_budget() -> None:
+    compactor = HistoryCompactor(token_budget=300)
+    session = ChatSession(
+        FakeIndex([]),
+        responder=lambda prompt: _long_answer(len(prompt.messages)),
+        history_limit=50,
+        compactor=compactor,
+    )
+
+    for number in range(8):
+        session.send(f"Frage {number}?")
+        history_tokens = sum(estimate_tokens(message.content) for message in session.history)
+        assert history_tokens <= 300
+
+    summary, turns = split_summary(session.history)
+    assert summary is not None
+    assert "Nutzer: Frage" in summary
+    assert "Assistent: Antwort" in summary
+    assert turns[-2].content == "Frage 7?"
+    assert session.history[0].role == "system"
+
+
+def test_compactor_leaves_short_history_untouched() -> None:
+    compactor = HistoryCompactor(token_budget=1000)
+    history = [ChatMessage("user", "Hallo"), ChatMessage("assistant", "Hallo zurück")]
+
+    assert compactor.compact(history) == history
+
+
+def test_compactor_uses_pluggable_summariser() -> None:
+    calls = []
+
+    def summariser(previous, messages, budget):
+        calls.append((previous, [message.content for message in messages], budget))
+        return "kurz"
+
+    compactor = HistoryCompactor(token_budget=40, summary_budget=20, summariser=summariser)
+    history = [
+        ChatMessage("user", "a" * 80),
+        ChatMessage("assistant", "b" * 80),
+        ChatMessage("user", "c" * 20),
+        ChatMessage("assistant", "d" * 20),
+    ]
+
+    compacted = compactor.compact(history)
+
+    assert compacted[0] == ChatMessage("system", SUMMARY_HEADER + "kurz")
+    assert [message.content for message in compacted[1:]] == ["c" * 20, "d" * 20]
+    assert calls[0][0] is None
+    assert calls[0][1] == ["a" * 80, "b" * 80]
+
+
+def test_extractive_summariser_drops_oldest_lines_first() -> None:
+    summariser = ExtractiveSummariser()
+    messages = [ChatMessage("user", f"Frage Nummer {i}. Zusatz.") for i in range(20)]
+
+    summary = summariser(None, messages, budget=20)
+
+    assert estimate_tokens(summary) <= 20
+    assert summary.endswith("Nutzer: Frage Nummer 19.")
+
+
+def test_compactor_rejects_invalid_budget() -> None:
+    with pytest.raises(ValueError):
+        HistoryCompactor(token_budget=0)
+
+
+def test_transcript_records_prompt_size() -> None:
+    transcript = ChatTranscript()
+    session = ChatSession(
+        FakeIndex([]),
+        responder=lambda prompt: _long_answer(1),
+        history_limit=10,
+        transcript=transcript,
+        compactor=HistoryCompactor(token_budget=200),
+    )
+    for number in range(4):
+        session.send(f"Frage {number}?")
+
+    tokens = [turn.prompt_tokens for turn in transcript.turns]
+    assert tokens[0] > 0
+    assert all(turn.prompt_chars >= turn.prompt_tokens for turn in transcript.turns)
+    assert max(tokens) < 200 + tokens[0] + 50
+    stats = transcript.stats()
+    assert stats.prompt_tokens == sum(tokens)
+    assert stats.max_prompt_tokens == max(tokens)
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import os
+import stat
+import sys
+import tempfile
+import threading
+from dataclasses import replace
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from rag_chatbot import PipelineOptions
+from rag_chatbot.daemon import BuildClient, BuildDaemon, BuildQueue, BuildServer, DaemonError
+from rag_chatbot.pipeline import PipelineResult
+
+
+def make_options(tmp_path: Path, name: str = "a", **overrides: object) -> PipelineOptions:
+    docs = tmp_path / f"docs-{name}"
+    docs.mkdir(exist_ok=True)
+    (docs / "sample.md").write_text("# Titel\n\nDies ist ein Testdokument über Anmeldung.", encoding="utf-8")
+    values = dict(
+        sources=[docs],
+        corpus_path=tmp_path / name / "corpus.jsonl",
+        index_path=tmp_path / name / "index.json",
+    )
+    values.update(overrides)
+    return PipelineOptions(**values)  # type: ignore[arg-type]
+
+
+def test_options_and_result_round_trip_through_dicts(tmp_path: Path) -> None:
+    options = make_options(tmp_path, max_features=50, force=True)
+    assert PipelineOptions.from_dict(options.to_dict()) == options
+
+    result = PipelineResult(corpus=None, index=None, skipped=("corpus", "index"), coalesced=True, passes=0)
+    assert PipelineResult.from_dict(result.to_dict()) == result
+
+
+def test_queue_merges_waiting_jobs_and_orders_by_priority(tmp_path: Path) -> None:
+    queue = BuildQueue()
+    low, _ = queue.submit(make_options(tmp_path, "low"))
+    first, merged_first = queue.submit(make_options(tmp_path, "high"))
+    again, merged_again = queue.submit(make_options(tmp_path, "high", force=True), priority=5)
+
+    assert not merged_first and merged_again
+    assert again is first and first.requests == 2 and first.options.force
+    assert queue.pending() == 2
+
+    assert queue.next(timeout=0) is first
+    # Läuft der Index bereits, entsteht ein neuer Auftrag.
+    follow_up, merged = queue.submit(make_options(tmp_path, "high"))
+    assert not merged and follow_up is not first
+    assert queue.next(timeout=0) is low
+    queue.complete(first, error="kaputt")
+    assert first.state == "failed" and first.finished.is_set()
+    assert queue.next(timeout=0) is follow_up
+    assert queue.next(timeout=0) is None
+
+
+def test_daemon_builds_over_socket_and_keeps_parse_cache(tmp_path: Path) -> None:
+    # Unix-Socket-Pfade sind auf ~100 Zeichen begrenzt.
+    socket_path = Path(tempfile.mkdtemp(prefix="rag-")) / "build.sock"
+    server = BuildServer(socket_path, BuildDaemon(), root=tmp_path)
+    thread = threading.Thread(target=server.serve)
+    thread.start()
+    try:
+        assert stat.S_IMODE(socket_path.stat().st_mode) == 0o600
+        client = BuildClient(socket_path, timeout=30)
+        assert client.ping()["ok"]
+        options = make_options(tmp_path, force=True)
+
+        response = client.submit(options)
+        job = response["job"]
+        assert job["state"] == "done"
+        assert PipelineResult.from_dict(job["result"]).corpus.documents == 1  # type: ignore[arg-type, union-attr]
+        assert options.index_path.exists()
+
+        second = client.submit(options)["job"]
+        status = client.status()["daemon"]
+        assert status["completed"] == 2 and status["cache_hits"] == 1 and status["cache_misses"] == 1
+        assert client.status(second["id"])["job"]["build_seconds"] is not None  # type: ignore[index]
+
+        with pytest.raises(DaemonError):
+            client.status(999)
+        with pytest.raises(DaemonError):
+            client.request({"op": "submit", "options": {"sources": []}})
+        outside = Path(tempfile.gettempdir()).resolve().parent / "index.json"
+        for escaping in (
+            replace(options, index_path=outside),
+            replace(options, sources=[tmp_path / ".." / "etc"]),
+        ):
+            with pytest.raises(DaemonError, match="außerhalb"):
+                client.submit(escaping)
+    finally:
+        BuildClient(socket_path).shutdown()
+        thread.join(timeout=30)
+    assert not socket_path.exists()
+    os.rmdir(socket_path.parent)
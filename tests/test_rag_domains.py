@@ -0,0 +1,107 @@
+import io
+import json
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+import pytest
+
+from rag_chatbot import PipelineOptions
+from rag_chatbot import domains as domains_module
+from rag_chatbot.domains import discover_domains, rebuild_domains
+from rag_chatbot.progress import ProgressReporter
+
+TEMPLATE = PipelineOptions(sources=[], corpus_path=Path("unused"), index_path=Path("unused"), max_words=50, overlap=10)
+
+
+def create_domain(root: Path, name: str, *documents: str) -> Path:
+    uploads = root / name / "uploads"
+    uploads.mkdir(parents=True)
+    for position, text in enumerate(documents):
+        (uploads / f"doc-{position}.md").write_text(text, encoding="utf-8")
+    return uploads
+
+
+def test_discover_domains_follows_storage_layout(tmp_path: Path) -> None:
+    create_domain(tmp_path, "beta", "# Beta\n\nText")
+    create_domain(tmp_path, "alpha", "# Alpha\n\nText")
+    (tmp_path / "ohne-uploads").mkdir()
+
+    assert [target.name for target in discover_domains(tmp_path)] == ["alpha", "beta"]
+    assert discover_domains(tmp_path)[0].index_path == tmp_path / "alpha" / "index.json"
+
+
+def test_rebuild_domains_only_builds_stale_domains(tmp_path: Path) -> None:
+    create_domain(tmp_path, "alpha", "# Alpha\n\nErster Text über Anmeldung.")
+    beta = create_domain(tmp_path, "beta", "# Beta\n\nZweiter Text über Teams.")
+    create_domain(tmp_path, "leer")
+    (tmp_path / "leer" / "index.json").write_text("{}", encoding="utf-8")
+
+    first = rebuild_domains(discover_domains(tmp_path), TEMPLATE, workers=2)
+    assert [(result.domain, result.status) for result in first] == [
+        ("alpha", "built"),
+        ("beta", "built"),
+        ("leer", "skipped"),
+    ]
+    assert (tmp_path / "alpha" / "index.json").exists()
+
+    (beta / "doc-0.md").write_text("# Beta\n\nGeänderter Text über Teams.", encoding="utf-8")
+    stream = io.StringIO()
+    second = rebuild_domains(discover_domains(tmp_path), TEMPLATE, workers=1, progress=ProgressReporter.ndjson(stream))
+
+    assert [result.status for result in second] == ["up_to_date", "built", "skipped"]
+    assert second[1].result is not None and second[1].result.corpus is not None
+    events = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [event["domain"] for event in events if event["event"] == "domain_queued"] == ["beta"]
+
+
+def test_rebuild_domains_keeps_index_of_domain_without_uploads(tmp_path: Path) -> None:
+    create_domain(tmp_path, "wiki")
+    index = tmp_path / "wiki" / "index.json"
+    corpus = tmp_path / "wiki" / "corpus.jsonl"
+    index.write_text('{"chunks": []}', encoding="utf-8")
+    corpus.write_text("", encoding="utf-8")
+
+    results = rebuild_domains(discover_domains(tmp_path), TEMPLATE, workers=1)
+
+    assert [(result.domain, result.status) for result in results] == [("wiki", "skipped")]
+    assert index.read_text(encoding="utf-8") == '{"chunks": []}'
+    assert corpus.exists()
+
+
+class BrokenPoolExecutor:
+    """Ersatz für ``ProcessPoolExecutor``, dessen Pool beim zweiten Auftrag abstürzt."""
+
+    def __init__(self, max_workers: int) -> None:
+        self.submitted = 0
+
+    def __enter__(self) -> "BrokenPoolExecutor":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        return None
+
+    def submit(self, function, *args) -> Future:  # type: ignore[no-untyped-def]
+        self.submitted += 1
+        future: Future = Future()
+        if self.submitted == 2:
+            future.set_exception(BrokenProcessPool("Worker beendet"))
+        else:
+            future.set_result(function(*args))
+        return future
+
+
+def test_rebuild_domains_records_pool_failures_per_domain(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    create_domain(tmp_path, "alpha", "# Alpha\n\nErster Text über Anmeldung.")
+    create_domain(tmp_path, "beta", "# Beta\n\nZweiter Text über Teams.")
+    create_domain(tmp_path, "gamma", "# Gamma\n\nDritter Text über Kalender.")
+    monkeypatch.setattr(domains_module, "ProcessPoolExecutor", BrokenPoolExecutor)
+
+    results = rebuild_domains(discover_domains(tmp_path), TEMPLATE, workers=3)
+
+    assert [(result.domain, result.status) for result in results] == [
+        ("alpha", "built"),
+        ("beta", "failed"),
+        ("gamma", "built"),
+    ]
+    assert results[1].error == "Worker beendet"
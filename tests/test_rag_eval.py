@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from scripts.rag_eval import Progress, parse_args, run_parallel
+
+
+class FakeSession:
+    """Minimaler Ersatz für ``ChatSession``; ``send`` delegiert an ``answer``."""
+
+    def __init__(self, answer: Callable[[str], str]) -> None:
+        self._answer = answer
+        self.resets = 0
+
+    def load_history(self, turns: object) -> None:
+        self.resets += 1
+
+    def send(self, question: str) -> str:
+        return self._answer(question)
+
+
+def collect(generator: object, into: List[object], errors: List[BaseException]) -> threading.Thread:
+    def consume() -> None:
+        try:
+            into.extend(generator)  # type: ignore[arg-type]
+        except BaseException as exc:
+            errors.append(exc)
+
+    thread = threading.Thread(target=consume, daemon=True)
+    thread.start()
+    return thread
+
+
+def wait_until(condition: Callable[[], bool], timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("Bedingung nicht rechtzeitig erfüllt")
+        time.sleep(0.005)
+
+
+def test_run_parallel_yields_in_input_order_when_completions_are_out_of_order() -> None:
+    questions = ["a", "b", "c", "d"]
+    released: Dict[str, threading.Event] = {question: threading.Event() for question in questions}
+    completed: List[str] = []
+    lock = threading.Lock()
+
+    def answer(question: str) -> str:
+        assert released[question].wait(5.0)
+        with lock:
+            completed.append(question)
+        return f"Antwort {question}"
+
+    results: List[object] = []
+    errors: List[BaseException] = []
+    thread = collect(run_parallel(lambda: FakeSession(answer), questions, workers=4), results, errors)
+    for question in reversed(questions):
+        released[question].set()
+        wait_until(lambda: question in completed)
+    thread.join(5.0)
+
+    assert not errors
+    assert completed == ["d", "c", "b", "a"]
+    assert results == [(question, f"Antwort {question}") for question in questions]
+
+
+def test_run_parallel_bounds_work_in_flight_to_twice_the_workers() -> None:
+    questions = [f"frage-{position}" for position in range(12)]
+    first = threading.Event()
+    started: List[str] = []
+    lock = threading.Lock()
+
+    def answer(question: str) -> str:
+        with lock:
+            started.append(question)
+        if question == questions[0]:
+            assert first.wait(5.0)
+        return question.upper()
+
+    results: List[object] = []
+    errors: List[BaseException] = []
+    thread = collect(run_parallel(lambda: FakeSession(answer), questions, workers=2), results, errors)
+    wait_until(lambda: len(started) >= 4)
+    time.sleep(0.1)
+
+    assert len(started) == 4
+    assert results == []
+    first.set()
+    thread.join(5.0)
+    assert not errors
+    assert results == [(question, question.upper()) for question in questions]
+
+
+def test_run_parallel_propagates_worker_exceptions() -> None:
+    def answer(question: str) -> str:
+        if question == "kaputt":
+            raise RuntimeError("Antwortgenerator ausgefallen")
+        return question
+
+    with pytest.raises(RuntimeError, match="ausgefallen"):
+        list(run_parallel(lambda: FakeSession(answer), ["gut", "kaputt", "auch gut"], workers=2))
+
+
+def test_run_parallel_reuses_one_session_per_thread() -> None:
+    sessions: List[FakeSession] = []
+    lock = threading.Lock()
+
+    def make_session() -> FakeSession:
+        session = FakeSession(lambda question: question)
+        with lock:
+            sessions.append(session)
+        return session
+
+    results = list(run_parallel(make_session, [str(position) for position in range(20)], workers=3))
+
+    assert [question for question, _ in results] == [str(position) for position in range(20)]
+    assert 1 <= len(sessions) <= 3
+    assert sum(session.resets for session in sessions) == 20
+
+
+@pytest.mark.parametrize(
+    ("arguments", "accepted"),
+    [
+        (["--workers", "2"], False),
+        (["--workers", "0"], False),
+        (["--workers", "2", "--independent"], True),
+        (["--workers", "1"], True),
+    ],
+)
+def test_parse_args_requires_independent_for_parallel_workers(
+    monkeypatch: pytest.MonkeyPatch, arguments: List[str], accepted: bool
+) -> None:
+    monkeypatch.setattr(sys, "argv", ["rag_eval.py", "fragen.txt", *arguments])
+
+    if accepted:
+        assert parse_args().workers == int(arguments[1])
+    else:
+        with pytest.raises(SystemExit) as excinfo:
+            parse_args()
+        assert excinfo.value.code == 2
+
+
+def test_progress_reports_throughput(capsys: pytest.CaptureFixture) -> None:
+    ticks = iter([0.0, 1.0, 2.0])
+    progress = Progress(2, clock=lambda: next(ticks))
+
+    progress.advance()
+    progress.advance()
+
+    assert progress.done == 2
+    assert capsys.readouterr().err == "\r[1/2] 1.0 Fragen/s\r[2/2] 1.0 Fragen/s\n"
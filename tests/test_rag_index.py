@@ -98,3 +98,45 @@ def test_semantic_index_returns_best_match(tmp_path: Path) -> None:
     assert results[0].chunk_id == "doc:0000"
     assert "Python" in results[0].text
 
+
+
+def test_search_results_carry_term_offsets_from_index(tmp_path: Path) -> None:
+    corpus = tmp_path / "corpus.jsonl"
+    text = "Einleitung ohne Bezug. Der Einlass beginnt um 18 Uhr, der Einlass endet um 20 Uhr."
+    _write_corpus(corpus, [{"id": "faq:0000", "source": "faq.md", "chunk_index": 0, "text": text}])
+
+    output = tmp_path / "index.json"
+    build_index(IndexOptions(corpus_path=corpus, output_path=output, term_offsets=True))
+
+    results = SemanticIndex(output).search("Wann beginnt der Einlass?", top_k=1)
+
+    found = sorted((match.start, text[match.start:match.end]) for match in results[0].matches)
+    assert [word for _, word in found] == ["Der", "Einlass", "beginnt", "der", "Einlass"]
+    assert all(match.weight > 0 for match in results[0].matches)
+
+
+def test_term_spans_keep_original_token_length(tmp_path: Path) -> None:
+    corpus = tmp_path / "corpus.jsonl"
+    # "İ".lower() ist zwei Zeichen lang; das Ende muss trotzdem im Originaltext liegen.
+    text = "Reise nach İstanbul und zurück nach Bonn."
+    _write_corpus(corpus, [{"id": "reise:0000", "text": text}])
+
+    output = tmp_path / "index.json"
+    build_index(IndexOptions(corpus_path=corpus, output_path=output, term_offsets=True))
+
+    results = SemanticIndex(output).search("İstanbul Bonn", top_k=1)
+
+    assert [text[match.start:match.end] for match in results[0].matches] == ["İstanbul", "Bonn"]
+
+
+def test_index_omits_term_offsets_by_default(tmp_path: Path) -> None:
+    corpus = tmp_path / "corpus.jsonl"
+    _write_corpus(corpus, [{"id": "faq:0000", "text": "Der Einlass beginnt um 18 Uhr."}])
+
+    output = tmp_path / "index.json"
+    build_index(IndexOptions(corpus_path=corpus, output_path=output))
+
+    assert "spans" not in json.loads(output.read_text(encoding="utf-8"))["chunks"][0]
+    results = SemanticIndex(output).search("Einlass", top_k=1)
+    assert results[0].chunk_id == "faq:0000"
+    assert results[0].matches == ()
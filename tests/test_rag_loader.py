@@ -1,6 +1,6 @@
 from pathlib import Path
 
-from rag_chatbot.loader import iter_source_files, load_documents
+from rag_chatbot.loader import DocumentCache, iter_source_files, load_documents
 
 
 def test_iter_source_files_includes_txt(tmp_path: Path) -> None:
@@ -18,3 +18,28 @@ def test_iter_source_files_includes_txt(tmp_path: Path) -> None:
     assert documents[0].path == text_file
     assert "Textdokument" in documents[0].text
     assert documents[0].source.endswith("notizen.txt")
+
+
+def test_document_cache_evicts_least_recently_used_beyond_byte_limit(tmp_path: Path) -> None:
+    paths = []
+    for name in ("a", "b", "c"):
+        path = tmp_path / f"{name}.txt"
+        path.write_text(name * 100, encoding="utf-8")
+        paths.append(path)
+    cache = DocumentCache(max_bytes=250)
+
+    cache.parse(paths[0])
+    cache.parse(paths[1])
+    cache.parse(paths[0])
+    cache.parse(paths[2])
+
+    assert len(cache) == 2 and cache.bytes == 200 and cache.evictions == 1
+    cache.parse(paths[0])
+    assert cache.hits == 2
+    cache.parse(paths[1])
+    assert cache.misses == 4
+
+    oversized = tmp_path / "gross.txt"
+    oversized.write_text("x" * 300, encoding="utf-8")
+    assert "x" in cache.parse(oversized).text
+    assert cache.bytes <= 250
@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from rag_chatbot.metrics import DEFAULT_BUCKETS, MetricsRegistry, parse_buckets
+
+
+def test_registry_renders_prometheus_text() -> None:
+    registry = MetricsRegistry()
+    histogram = registry.histogram("demo_duration_seconds", "Demo timings.", (0.1, 1.0))
+    counter = registry.counter("demo_responses_total", "Demo responses.", ("status",))
+    gauge = registry.gauge("demo_in_flight", "Demo in flight.")
+
+    histogram.observe(0.05)
+    histogram.observe(0.1)
+    histogram.observe(3.0)
+    counter.inc("200")
+    counter.inc("200")
+    counter.inc("502")
+    gauge.inc()
+
+    lines = registry.render().splitlines()
+
+    assert "# TYPE demo_duration_seconds histogram" in lines
+    assert 'demo_duration_seconds_bucket{le="0.1"} 2' in lines
+    assert 'demo_duration_seconds_bucket{le="1"} 2' in lines
+    assert 'demo_duration_seconds_bucket{le="+Inf"} 3' in lines
+    assert "demo_duration_seconds_count 3" in lines
+    assert 'demo_responses_total{status="200"} 2' in lines
+    assert 'demo_responses_total{status="502"} 1' in lines
+    assert "demo_in_flight 1" in lines
+
+
+def test_registry_rejects_duplicates_and_wrong_labels() -> None:
+    registry = MetricsRegistry()
+    counter = registry.counter("demo_total", "Demo.", ("status",))
+    with pytest.raises(ValueError):
+        registry.counter("demo_total", "Demo.")
+    with pytest.raises(ValueError):
+        counter.inc()
+
+
+def test_parse_buckets_falls_back_on_invalid_input() -> None:
+    assert parse_buckets("2, 0.5,1") == (0.5, 1.0, 2.0)
+    assert parse_buckets(None) == DEFAULT_BUCKETS
+    assert parse_buckets("schnell") == DEFAULT_BUCKETS
+    assert parse_buckets("-1,0") == DEFAULT_BUCKETS
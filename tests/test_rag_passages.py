@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from rag_chatbot.chat import ChatSession
+from rag_chatbot.chunker import chunk_paragraphs
+from rag_chatbot.passages import merge_adjacent
+from rag_chatbot.retrieval import SearchResult, TermMatch
+
+
+def _chunks(source: str, words: int = 400) -> list:
+    text = " ".join(f"wort{number}" for number in range(words))
+    return [
+        SearchResult(
+            chunk_id=f"{source}:{index:04d}",
+            score=0.0,
+            text=chunk.text,
+            metadata={"source": source, "title": source.upper(), "chunk_index": index},
+        )
+        for index, chunk in enumerate(chunk_paragraphs([text], max_words=60, overlap=20))
+    ]
+
+
+def _scored(result: SearchResult, score: float) -> SearchResult:
+    return SearchResult(chunk_id=result.chunk_id, score=score, text=result.text, metadata=result.metadata)
+
+
+def test_merge_adjacent_stitches_neighbours_without_overlap() -> None:
+    chunks = _chunks("doc")
+    results = [_scored(chunks[4], 0.9), _scored(chunks[3], 0.8), _scored(chunks[5], 0.7)]
+
+    passages = merge_adjacent(results)
+
+    assert len(passages) == 1
+    passage = passages[0]
+    assert passage.chunk_indices == (3, 4, 5)
+    assert passage.score == 0.9
+    words = passage.text.split()
+    assert len(words) == len(set(words))
+    assert words[0] == chunks[3].text.split()[0]
+    assert words[-1] == chunks[5].text.split()[-1]
+
+
+def test_merge_adjacent_keeps_other_sources_and_gaps_apart() -> None:
+    doc = _chunks("doc")
+    faq = _chunks("faq")
+    results = [
+        _scored(doc[1], 0.9),
+        _scored(faq[2], 0.8),
+        _scored(doc[3], 0.7),
+        _scored(faq[1], 0.6),
+        SearchResult(chunk_id="inline", score=0.5, text="Ohne Metadaten.", metadata={}),
+    ]
+
+    passages = merge_adjacent(results)
+
+    assert [passage.results[0].chunk_id for passage in passages] == ["doc:0001", "faq:0001", "doc:0003", "inline"]
+    assert passages[1].chunk_indices == (1, 2)
+    assert passages[0].text == doc[1].text
+
+
+def test_chat_context_lists_merged_passage_once() -> None:
+    chunks = _chunks("doc")
+    results = [_scored(chunks[0], 0.9), _scored(chunks[1], 0.8)]
+
+    class Index:
+        def search(self, query: str, *, top_k: int, min_score: float):
+            return results
+
+    prompts: list = []
+    session = ChatSession(Index(), responder=lambda prompt: prompts.append(prompt) or "ok")
+    session.send("Frage")
+
+    context_message = prompts[0].messages[-2].content
+    assert "DOC (Abschnitte 0–1)" in context_message
+    assert "[2]" not in context_message
+    assert prompts[0].context == tuple(results)
+
+
+def test_merge_adjacent_shifts_term_matches_into_passage_text() -> None:
+    chunks = _chunks("doc")
+    results = []
+    for result in (chunks[2], chunks[3]):
+        start = result.text.rfind("wort150")
+        matches = (TermMatch(start, start + 7, 0, 1.0),) if start != -1 else ()
+        results.append(
+            SearchResult(result.chunk_id, 0.5, result.text, result.metadata, matches=matches)
+        )
+
+    passage = merge_adjacent(results)[0]
+
+    assert [passage.text[match.start:match.end] for match in passage.matches] == ["wort150"]
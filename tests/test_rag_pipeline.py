@@ -1,8 +1,18 @@
+import io
+import json
 import os
+import tracemalloc
 from dataclasses import replace
 from pathlib import Path
 
+import pytest
+
 from rag_chatbot import PipelineOptions, run_pipeline
+from rag_chatbot.pipeline import pipeline_is_stale
+from rag_chatbot.locking import BuildLock, atomic_output
+from rag_chatbot.profiling import Profiler
+from rag_chatbot.progress import ProgressReporter
+from scripts.rag_pipeline import build_parser
 
 
 def create_sample_source(tmp_path: Path, extension: str = ".md") -> Path:
@@ -57,14 +67,50 @@ def test_pipeline_rebuilds_when_source_changes(tmp_path: Path) -> None:
     run_pipeline(options)
 
     source_file = next(docs_dir.glob("*.md"))
-    stat = source_file.stat()
-    os.utime(source_file, (stat.st_atime, stat.st_mtime + 5))
+    source_file.write_text(source_file.read_text(encoding="utf-8") + " Neuer Satz.", encoding="utf-8")
 
     rebuilt = run_pipeline(options)
     assert rebuilt.corpus is not None
     assert rebuilt.index is not None
 
 
+def test_pipeline_manifest_tracks_content_options_and_deletions(tmp_path: Path) -> None:
+    docs_dir = create_sample_source(tmp_path)
+    (docs_dir / "extra.md").write_text("# Extra\n\nNoch ein Dokument.", encoding="utf-8")
+    options = PipelineOptions(
+        sources=[docs_dir],
+        corpus_path=tmp_path / "data" / "corpus.jsonl",
+        index_path=tmp_path / "data" / "index.json",
+        max_words=50,
+        overlap=10,
+    )
+    run_pipeline(options)
+    manifest = tmp_path / "data" / "index.json.manifest"
+    assert json.loads(manifest.read_text(encoding="utf-8"))["format"] == "rag-build-manifest"
+
+    # Nur berührt (z. B. durch git checkout): kein Neuaufbau, aber neue mtime im Manifest.
+    source_file = docs_dir / "sample.md"
+    stat = source_file.stat()
+    os.utime(source_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 5_000_000_000))
+    assert not pipeline_is_stale(options)
+    touched = run_pipeline(options)
+    assert touched.skipped == ("corpus", "index")
+    recorded = json.loads(manifest.read_text(encoding="utf-8"))["stages"]["corpus"]["inputs"]
+    assert recorded[str(source_file.resolve())]["mtime_ns"] == source_file.stat().st_mtime_ns
+
+    # Geänderte Chunk-Einstellungen bauen die Wissensbasis neu.
+    rechunked = run_pipeline(replace(options, max_words=40))
+    assert rechunked.corpus is not None
+
+    # Nur Index-Einstellungen geändert: die Wissensbasis bleibt.
+    reindexed = run_pipeline(replace(options, max_words=40, min_term_length=3))
+    assert reindexed.skipped == ("corpus",)
+
+    (docs_dir / "extra.md").unlink()
+    shrunk = run_pipeline(replace(options, max_words=40, min_term_length=3))
+    assert shrunk.corpus is not None and shrunk.corpus.documents == 1
+
+
 def test_pipeline_force_rebuilds(tmp_path: Path) -> None:
     docs_dir = create_sample_source(tmp_path)
     corpus_path = tmp_path / "data" / "corpus.jsonl"
@@ -122,3 +168,257 @@ def test_pipeline_requires_sources(tmp_path: Path) -> None:
         assert "Quellen" in str(exc)
     else:  # pragma: no cover - sollte nicht erreicht werden
         raise AssertionError("Pipeline hat fehlende Quellen nicht erkannt")
+
+
+def test_pipeline_profile_lists_nested_stages(tmp_path: Path) -> None:
+    docs_dir = create_sample_source(tmp_path)
+    options = PipelineOptions(
+        sources=[docs_dir],
+        corpus_path=tmp_path / "data" / "corpus.jsonl",
+        index_path=tmp_path / "data" / "index.json",
+    )
+
+    with Profiler(top=3) as profiler:
+        run_pipeline(options, profiler=profiler)
+    assert not tracemalloc.is_tracing()
+
+    report = profiler.report()
+    assert report["format"] == "rag-profile"
+    stages = {stage["name"]: stage for stage in report["stages"]}
+    assert list(stages) == ["corpus", "index"]
+    assert [child["name"] for child in stages["corpus"]["stages"]] == ["load", "chunk", "write"]
+    assert [child["name"] for child in stages["index"]["stages"]] == [
+        "read",
+        "tokenise",
+        "vocabulary",
+        "vectorise",
+        "write",
+    ]
+    for stage in stages.values():
+        assert stage["wall_seconds"] >= 0.0
+        assert stage["traced_peak_bytes"] >= max(child["traced_peak_bytes"] for child in stage["stages"])
+        assert len(stage["top_allocations"]) <= 3
+
+    profiler.write(tmp_path / "profile.json")
+    assert json.loads((tmp_path / "profile.json").read_text(encoding="utf-8"))["stages"] == report["stages"]
+
+
+def test_profiler_without_tracing_reports_times_only() -> None:
+    profiler = Profiler(trace=False)
+    with profiler.stage("outer"):
+        with profiler.stage("inner"):
+            sum(range(1000))
+
+    (outer,) = profiler.stages
+    assert outer.stages[0].name == "inner"
+    assert "traced_peak_bytes" not in outer.to_dict()
+    assert not tracemalloc.is_tracing()
+
+
+def test_pipeline_streams_progress_events(tmp_path: Path) -> None:
+    docs_dir = create_sample_source(tmp_path)
+    options = PipelineOptions(
+        sources=[docs_dir],
+        corpus_path=tmp_path / "data" / "corpus.jsonl",
+        index_path=tmp_path / "data" / "index.json",
+    )
+    stream = io.StringIO()
+
+    run_pipeline(options, progress=ProgressReporter.ndjson(stream))
+
+    events = [json.loads(line) for line in stream.getvalue().splitlines()]
+    names = [event["event"] for event in events]
+    assert names[0] == "stage_start" and events[0]["stage"] == "corpus"
+    assert names[-1] == "finished"
+    assert events[-1]["corpus"]["chunks"] == 1
+    assert events[-1]["skipped"] == []
+    by_name = {event["event"]: event for event in events}
+    assert by_name["files_scanned"]["count"] == 1
+    assert by_name["files_parsed"] == {**by_name["files_parsed"], "count": 1, "total": 1}
+    assert by_name["chunks_written"]["stage"] == "corpus.write"
+    assert by_name["postings_built"]["count"] > 0
+    ends = [event for event in events if event["event"] == "stage_end"]
+    assert {event["stage"] for event in ends} >= {"corpus", "corpus.load", "index", "index.vectorise"}
+    assert all(event["status"] == "ok" and event["seconds"] >= 0 for event in ends)
+
+    stream = io.StringIO()
+    run_pipeline(options, progress=ProgressReporter.ndjson(stream))
+    skipped = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [event["event"] for event in skipped] == ["stage_skipped", "stage_skipped", "finished"]
+
+
+def test_progress_counts_are_throttled() -> None:
+    now = [0.0]
+    records = []
+    progress = ProgressReporter(records.append, min_interval=1.0, clock=lambda: now[0])
+
+    for value in range(1, 6):
+        progress.count("files_parsed", value)
+        now[0] += 0.3
+    progress.count("files_parsed", 5, final=True)
+
+    assert [record["count"] for record in records] == [1, 5, 5]
+
+
+def test_pipeline_coalesces_requests_while_locked(tmp_path: Path) -> None:
+    docs_dir = create_sample_source(tmp_path)
+    index_path = tmp_path / "data" / "index.json"
+    options = PipelineOptions(
+        sources=[docs_dir],
+        corpus_path=tmp_path / "data" / "corpus.jsonl",
+        index_path=index_path,
+        force=True,
+    )
+
+    holder = BuildLock(index_path)
+    assert holder.request()
+    try:
+        first = run_pipeline(options)
+        second = run_pipeline(options)
+    finally:
+        holder.close()
+
+    assert first.coalesced and second.coalesced
+    assert first.passes == 0
+    assert not index_path.exists()
+    # Beide Anfragen landen in derselben Vormerkung: genau ein weiterer Durchlauf.
+    assert holder.take_pending()
+    assert not holder.take_pending()
+
+
+def test_requests_during_build_trigger_one_follow_up(tmp_path: Path) -> None:
+    docs_dir = create_sample_source(tmp_path)
+    index_path = tmp_path / "data" / "index.json"
+    options = PipelineOptions(
+        sources=[docs_dir],
+        corpus_path=tmp_path / "data" / "corpus.jsonl",
+        index_path=index_path,
+        force=True,
+    )
+    requests = []
+
+    def on_event(record: dict) -> None:
+        # Drei Uploads während des ersten Durchlaufs.
+        if record["event"] == "stage_end" and record["stage"] == "corpus" and not requests:
+            requests.extend(BuildLock(index_path).request() for _ in range(3))
+
+    result = run_pipeline(options, progress=ProgressReporter(on_event))
+
+    assert requests == [False, False, False]
+    assert result.passes == 2
+    assert not result.coalesced
+    assert index_path.exists()
+    assert not BuildLock(index_path).pending_path.exists()
+    assert not list(index_path.parent.glob("*.tmp"))
+
+
+def test_atomic_output_keeps_previous_file_on_error(tmp_path: Path) -> None:
+    target = tmp_path / "index.json"
+    target.write_text("alt", encoding="utf-8")
+
+    try:
+        with atomic_output(target) as handle:
+            handle.write("halb")
+            raise RuntimeError("Abbruch")
+    except RuntimeError:
+        pass
+
+    assert target.read_text(encoding="utf-8") == "alt"
+    assert list(tmp_path.iterdir()) == [target]
+
+    with atomic_output(target) as handle:
+        handle.write("neu")
+    assert target.read_text(encoding="utf-8") == "neu"
+
+
+def test_fused_pipeline_matches_separate_build_byte_for_byte(tmp_path: Path) -> None:
+    docs_dir = create_sample_source(tmp_path)
+    (docs_dir / "extra.md").write_text(
+        "# Anmeldung\n\n" + " ".join(f"Wort{i % 17} über Teams" for i in range(120)), encoding="utf-8"
+    )
+
+    def build(name: str, **overrides: object) -> PipelineOptions:
+        options = PipelineOptions(
+            sources=[docs_dir],
+            corpus_path=tmp_path / name / "corpus.jsonl",
+            index_path=tmp_path / name / "index.json",
+            max_words=40,
+            overlap=10,
+            **overrides,  # type: ignore[arg-type]
+        )
+        run_pipeline(options)
+        return options
+
+    separate = build("separate")
+    fused = build("fused", fused=True)
+    direct = build("direct", write_corpus=False)
+
+    assert fused.corpus_path.read_bytes() == separate.corpus_path.read_bytes()
+    assert fused.index_path.read_bytes() == separate.index_path.read_bytes()
+    assert direct.index_path.read_bytes() == separate.index_path.read_bytes()
+    assert not direct.corpus_path.exists()
+
+    again = run_pipeline(direct)
+    assert again.skipped == ("corpus", "index")
+    assert pipeline_is_stale(replace(direct, max_words=30))
+    rebuilt = run_pipeline(replace(direct, max_words=30))
+    assert rebuilt.corpus is not None and not rebuilt.corpus.written
+
+
+@pytest.mark.parametrize(
+    "arguments",
+    [
+        ["--daemon", "build.sock", "--domains-root", "domains"],
+        ["--domains-root", "domains", "--daemon", "build.sock"],
+        ["--daemon", "build.sock", "--profile-report", "profile.json"],
+        ["--domains-root", "domains", "--profile-report", "profile.json"],
+    ],
+)
+def test_pipeline_cli_rejects_conflicting_modes(arguments: list) -> None:
+    with pytest.raises(SystemExit) as excinfo:
+        build_parser().parse_args(arguments)
+
+    assert excinfo.value.code == 2
+
+
+def test_pipeline_without_corpus_removes_outdated_corpus(tmp_path: Path) -> None:
+    docs_dir = create_sample_source(tmp_path)
+    options = PipelineOptions(
+        sources=[docs_dir],
+        corpus_path=tmp_path / "data" / "corpus.jsonl",
+        index_path=tmp_path / "data" / "index.json",
+    )
+    run_pipeline(options)
+    assert options.corpus_path.exists()
+
+    (docs_dir / "sample.md").write_text("# Neu\n\nGanz anderer Inhalt.", encoding="utf-8")
+    stream = io.StringIO()
+    result = run_pipeline(replace(options, write_corpus=False), progress=ProgressReporter.ndjson(stream))
+
+    assert result.index is not None
+    assert not options.corpus_path.exists()
+    events = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert any(
+        event["event"] == "corpus_removed" and event["path"] == str(options.corpus_path) for event in events
+    )
+    manifest = json.loads((tmp_path / "data" / "index.json.manifest").read_text(encoding="utf-8"))
+    assert list(manifest["stages"]) == ["index"]
+
+
+def test_pipeline_term_offsets_are_opt_in(tmp_path: Path) -> None:
+    docs_dir = create_sample_source(tmp_path)
+    options = PipelineOptions(
+        sources=[docs_dir],
+        corpus_path=tmp_path / "data" / "corpus.jsonl",
+        index_path=tmp_path / "data" / "index.json",
+    )
+
+    run_pipeline(options)
+    assert "spans" not in json.loads(options.index_path.read_text(encoding="utf-8"))["chunks"][0]
+
+    with_offsets = replace(options, term_offsets=True)
+    assert pipeline_is_stale(with_offsets)
+    result = run_pipeline(with_offsets)
+    assert result.skipped == ("corpus",)
+    assert "spans" in json.loads(options.index_path.read_text(encoding="utf-8"))["chunks"][0]
+    assert PipelineOptions.from_dict(with_offsets.to_dict()) == with_offsets
@@ -2,15 +2,28 @@ from __future__ import annotations
 
 import json
 from pathlib import Path
+import random
 import sys
 
+import pytest
+
 ROOT = Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
-from rag_chatbot.chat import ChatMessage
-from rag_chatbot.report import build_report, format_report, load_report, load_transcript, report_from_json
-from rag_chatbot.transcript import ChatTranscript, TranscriptContext, TranscriptTurn
+from rag_chatbot.chat import ChatMessage, TurnTimings
+from rag_chatbot.report import (
+    ReportAggregator,
+    build_report,
+    build_report_from_turns,
+    expand_transcript_paths,
+    format_report,
+    load_report,
+    load_reports,
+    load_transcript,
+    report_from_json,
+)
+from rag_chatbot.transcript import ChatTranscript, TranscriptContext, TranscriptTurn, TranscriptWriter
 
 
 def sample_transcript() -> ChatTranscript:
@@ -102,3 +115,145 @@ def test_report_from_json_accepts_dumped_transcript() -> None:
 
     report = report_from_json(text)
     assert report.stats.turns == 2
+
+
+def test_report_lists_stage_percentiles() -> None:
+    transcript = ChatTranscript()
+    for millis in range(1, 101):
+        transcript.extend(
+            [
+                TranscriptTurn(
+                    question=f"Frage {millis}",
+                    response="Antwort",
+                    context=(),
+                    prompt_messages=(),
+                    timings=TurnTimings(
+                        vectorise=None,
+                        search=millis / 1000,
+                        prompt=0.0001,
+                        responder=millis / 100,
+                    ),
+                )
+            ]
+        )
+
+    report = report_from_json(json.dumps(transcript.to_dict()))
+
+    latencies = {latency.stage: latency for latency in report.latencies}
+    assert set(latencies) == {"search", "prompt", "responder"}
+    assert latencies["search"].samples == 100
+    search = latencies["search"]
+    assert (search.p50, search.p90, search.p99) == pytest.approx((0.05, 0.09, 0.099), rel=0.01)
+    assert latencies["responder"].p99 == pytest.approx(0.99, rel=0.01)
+    text = format_report(report)
+    assert "Laufzeiten pro Schritt (ms):" in text
+    assert f"- Suche: p50 {search.p50 * 1000:.2f}, p90 {search.p90 * 1000:.2f}" in text
+    assert "(n=100)" in text
+    assert report.to_dict()["latencies"][0]["stage"] == "search"
+
+
+def test_report_without_timings_has_no_latency_section() -> None:
+    report = build_report(sample_transcript())
+
+    assert report.latencies == ()
+    assert "latencies" not in report.to_dict()
+    assert "Laufzeiten" not in format_report(report)
+
+
+def _scored_turns(count: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    turns = []
+    for position in range(count):
+        context = tuple(
+            TranscriptContext(
+                chunk_id=f"chunk-{position}-{rank}",
+                score=round(rng.random(), 4),
+                text="Text",
+                metadata={"source": f"docs/{rng.randrange(5)}.md"},
+            )
+            for rank in range(3)
+        )
+        turns.append(TranscriptTurn(question=f"Frage {position}", response="Antwort", context=context, prompt_messages=()))
+    return turns
+
+
+def test_streaming_report_matches_exact_statistics(tmp_path: Path) -> None:
+    turns = _scored_turns(200)
+    path = tmp_path / "transcript.jsonl"
+    with TranscriptWriter(path) as writer:
+        for turn in turns:
+            writer.write(turn)
+
+    report = load_report(path, median=True)
+
+    scores: dict = {}
+    for turn in turns:
+        for item in turn.context:
+            scores.setdefault(item.metadata["source"], []).append(item.score)
+    assert report == build_report_from_turns(turns, median=True)
+    assert report.stats.context_items == 600
+    for source in report.sources:
+        values = sorted(scores[source.source])
+        assert source.hits == len(values)
+        assert source.average_score == round(sum(values) / len(values), 6)
+        assert source.max_score == values[-1]
+        median = values[(len(values) + 1) // 2 - 1]
+        assert source.median_score == pytest.approx(median, rel=0.01)
+    ranking = [(source.hits, source.average_score) for source in report.sources]
+    assert ranking == sorted(ranking, reverse=True)
+    assert "median_score" in report.to_dict()["sources"][0]
+
+
+def test_report_json_omits_median_by_default() -> None:
+    report = build_report_from_turns(_scored_turns(30))
+
+    assert report.sources
+    for source in report.to_dict()["sources"]:
+        assert set(source) == {"source", "hits", "average_score", "max_score"}
+    assert all(source.median_score is None for source in report.sources)
+
+
+def test_merged_aggregators_equal_single_pass() -> None:
+    turns = _scored_turns(90)
+    left, right = ReportAggregator(), ReportAggregator()
+    for position, turn in enumerate(turns):
+        (left if position < 40 else right).add(turn)
+    left.merge(right)
+
+    merged = left.report(median=True)
+    single = build_report_from_turns(turns, median=True)
+    assert merged.stats == single.stats
+    assert [source.source for source in merged.sources] == [source.source for source in single.sources]
+    for ours, theirs in zip(merged.sources, single.sources):
+        assert ours.hits == theirs.hits
+        assert ours.average_score == pytest.approx(theirs.average_score, abs=1e-6)
+        assert ours.median_score == theirs.median_score
+
+
+def test_load_reports_merges_files_across_processes(tmp_path: Path) -> None:
+    turns = _scored_turns(120)
+    paths = []
+    for part in range(3):
+        path = tmp_path / f"run-{part}" / "transcript.jsonl"
+        path.parent.mkdir()
+        with TranscriptWriter(path) as writer:
+            for turn in turns[part * 40 : (part + 1) * 40]:
+                writer.write(turn)
+        paths.append(path)
+    (tmp_path / "run-0" / "index.json").write_text("{}", encoding="utf-8")
+
+    found = expand_transcript_paths([str(tmp_path), str(tmp_path / "run-*" / "transcript.jsonl")])
+    assert found == paths
+
+    parallel = load_reports(found, workers=2)
+    serial = load_reports(found, workers=1)
+    single = build_report_from_turns(turns)
+    assert parallel == serial
+    assert parallel.stats.turns == 120
+    assert [source.source for source in parallel.sources] == [source.source for source in single.sources]
+    assert [source.hits for source in parallel.sources] == [source.hits for source in single.sources]
+
+
+def test_load_reports_rejects_empty_input() -> None:
+    with pytest.raises(ValueError):
+        load_reports([])
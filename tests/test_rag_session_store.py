@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import asyncio
+import sys
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from rag_chatbot.chat import AsyncChatSession, ChatSession
+from rag_chatbot.retrieval import SearchResult
+from rag_chatbot.session_store import ChatSessionStore
+
+
+@dataclass
+class FakeIndex:
+    results: List[SearchResult]
+
+    def search(self, query: str, *, top_k: int, min_score: float):
+        return self.results[:top_k]
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _factory() -> ChatSession:
+    return ChatSession(FakeIndex([]), responder=lambda prompt: f"Echo: {prompt.messages[-1].content}")
+
+
+def test_store_keeps_history_per_session_id() -> None:
+    store = ChatSessionStore(_factory)
+
+    store.send("a", "Hallo")
+    store.send("b", "Servus")
+    store.send("a", "Noch da?")
+
+    assert [message.content for message in store.get("a").history] == [
+        "Hallo",
+        "Echo: Hallo",
+        "Noch da?",
+        "Echo: Noch da?",
+    ]
+    assert len(store.get("b").history) == 2
+    stats = store.stats()
+    assert stats.sessions == 2
+    assert stats.bytes > 0
+
+
+def test_store_evicts_idle_and_least_recently_used_sessions() -> None:
+    clock = FakeClock()
+    store = ChatSessionStore(_factory, idle_ttl=60, max_sessions=2, clock=clock)
+
+    store.send("a", "Eins")
+    clock.now = 10
+    store.send("b", "Zwei")
+    clock.now = 20
+    store.get("a")
+    store.send("c", "Drei")
+
+    assert "b" not in store
+    assert "a" in store and "c" in store
+
+    clock.now = 100
+    store.prune()
+
+    stats = store.stats()
+    assert stats.sessions == 0
+    assert stats.bytes == 0
+    assert stats.evictions == {"idle": 2, "capacity": 1, "bytes": 0}
+
+
+def test_store_enforces_byte_budget() -> None:
+    store = ChatSessionStore(_factory, max_bytes=100)
+
+    store.send("a", "x" * 40)
+    store.send("b", "y" * 40)
+
+    assert "a" not in store
+    assert store.stats().evictions["bytes"] == 1
+    assert store.stats().bytes <= 100
+
+
+def test_store_restores_persisted_history_after_restart(tmp_path: Path) -> None:
+    database = tmp_path / "sessions.sqlite"
+    store = ChatSessionStore(_factory, persist_path=database)
+    store.send("gast-1", "Wann beginnt das Quiz?")
+    store.close()
+
+    restarted = ChatSessionStore(_factory, persist_path=database)
+    session = restarted.get("gast-1")
+
+    assert [message.content for message in session.history] == [
+        "Wann beginnt das Quiz?",
+        "Echo: Wann beginnt das Quiz?",
+    ]
+    assert restarted.stats().restored == 1
+
+    restarted.discard("gast-1")
+    assert restarted.get("gast-1").history == ()
+    restarted.close()
+
+
+def test_store_supports_async_sessions() -> None:
+    async def responder(prompt):
+        return "Antwort"
+
+    store = ChatSessionStore(lambda: AsyncChatSession(FakeIndex([]), responder=responder))
+
+    turn = asyncio.run(store.asend("a", "Hallo"))
+
+    assert turn.response == "Antwort"
+    with pytest.raises(TypeError):
+        store.send("a", "Hallo")
+
+
+def test_store_persists_async_turns_off_the_event_loop(tmp_path: Path) -> None:
+    async def responder(prompt):
+        return "Antwort"
+
+    database = tmp_path / "sessions.sqlite"
+    store = ChatSessionStore(
+        lambda: AsyncChatSession(FakeIndex([]), responder=responder),
+        persist_path=database,
+    )
+    writers: List[int] = []
+    persist = store._persist
+
+    def recording_persist(*args) -> None:
+        writers.append(threading.get_ident())
+        persist(*args)
+
+    store._persist = recording_persist  # type: ignore[method-assign]
+
+    async def run() -> int:
+        await store.asend("a", "Hallo")
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(run())
+    store.close()
+
+    assert writers and loop_thread not in writers
+    restarted = ChatSessionStore(_factory, persist_path=database)
+    assert [message.content for message in restarted.get("a").history] == ["Hallo", "Antwort"]
+    restarted.close()
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import math
+from pathlib import Path
+import random
+import sys
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from rag_chatbot.sketch import QuantileSketch
+
+
+def exact_quantile(values, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[max(1, math.ceil(q * len(ordered))) - 1]
+
+
+def test_quantiles_stay_within_relative_accuracy() -> None:
+    rng = random.Random(3)
+    values = [rng.lognormvariate(0, 2) for _ in range(5000)]
+    sketch = QuantileSketch(relative_accuracy=0.01)
+    for value in values:
+        sketch.add(value)
+
+    assert sketch.count == 5000
+    for q in (0.1, 0.5, 0.9, 0.99):
+        assert sketch.quantile(q) == pytest.approx(exact_quantile(values, q), rel=0.01)
+    assert sketch.quantile(0.0) == min(values)
+    assert sketch.quantile(1.0) == max(values)
+
+
+def test_zeros_and_empty_sketch() -> None:
+    sketch = QuantileSketch()
+    assert sketch.quantile(0.5) == 0.0
+
+    for value in (0.0, 0.0, 0.0, 2.0):
+        sketch.add(value)
+    assert sketch.quantile(0.5) == 0.0
+    assert sketch.quantile(1.0) == 2.0
+
+
+def test_merge_matches_single_sketch() -> None:
+    values = [value / 7 for value in range(1, 400)]
+    whole, left, right = QuantileSketch(), QuantileSketch(), QuantileSketch()
+    for position, value in enumerate(values):
+        whole.add(value)
+        (left if position % 2 else right).add(value)
+    left.merge(right)
+
+    assert left.count == whole.count
+    for q in (0.25, 0.5, 0.75, 0.95):
+        assert left.quantile(q) == whole.quantile(q)
+
+
+def test_bucket_limit_keeps_upper_quantiles() -> None:
+    sketch = QuantileSketch(relative_accuracy=0.01, max_buckets=32)
+    values = [1.01 ** exponent for exponent in range(2000)]
+    for value in values:
+        sketch.add(value)
+
+    assert len(sketch._buckets) <= 32
+    assert sketch.quantile(0.99) == pytest.approx(exact_quantile(values, 0.99), rel=0.01)
+
+
+def test_rejects_invalid_input() -> None:
+    with pytest.raises(ValueError):
+        QuantileSketch(relative_accuracy=1.5)
+    with pytest.raises(ValueError):
+        QuantileSketch().add(-1.0)
+    with pytest.raises(ValueError):
+        QuantileSketch().quantile(2.0)
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from rag_chatbot.chat import ChatSession
+from rag_chatbot.retrieval import SearchResult, TermMatch
+from rag_chatbot.snippets import extract_snippet
+
+FILLER = " ".join(f"fuelltext{number}" for number in range(80))
+TEXT = f"{FILLER} Der Einlass beginnt um 18 Uhr am Haupteingang. {FILLER}"
+
+
+def _matches(text: str, *terms: str) -> tuple:
+    found = []
+    for term_id, term in enumerate(terms):
+        start = text.find(term)
+        while start != -1:
+            found.append(TermMatch(start, start + len(term), term_id, 1.0))
+            start = text.find(term, start + 1)
+    return tuple(sorted(found, key=lambda match: match.start))
+
+
+def test_snippet_is_centred_on_query_hits() -> None:
+    snippet = extract_snippet(TEXT, _matches(TEXT, "Einlass", "beginnt"), 120)
+
+    assert len(snippet) <= 120
+    assert "Der Einlass beginnt um 18 Uhr" in snippet
+    assert snippet.startswith("…") and snippet.endswith("…")
+
+
+def test_snippet_prefers_window_with_more_distinct_terms() -> None:
+    text = f"Einlass Einlass Einlass {FILLER} Einlass beginnt heute. {FILLER}"
+
+    snippet = extract_snippet(text, _matches(text, "Einlass", "beginnt"), 60)
+
+    assert "Einlass beginnt" in snippet
+
+
+def test_snippet_without_hits_keeps_text_start() -> None:
+    snippet = extract_snippet(TEXT, (), 50)
+
+    assert snippet.startswith("fuelltext0 fuelltext1")
+    assert snippet.endswith("…")
+    assert len(snippet) <= 50
+
+
+def test_short_text_is_returned_whole() -> None:
+    assert extract_snippet("  Kurzer\n Text ", (), 420) == "Kurzer Text"
+
+
+def test_text_that_fits_after_condensing_is_returned_whole() -> None:
+    text = "Der Einlass\n\n" + " " * 200 + "beginnt um 18 Uhr."
+
+    snippet = extract_snippet(text, _matches(text, "beginnt"), 40)
+
+    assert snippet == "Der Einlass beginnt um 18 Uhr."
+
+
+def test_session_uses_configured_snippet_budget() -> None:
+    result = SearchResult(
+        chunk_id="faq:0000",
+        score=0.9,
+        text=TEXT,
+        metadata={"title": "FAQ"},
+        matches=_matches(TEXT, "Einlass"),
+    )
+
+    class Index:
+        def search(self, query: str, *, top_k: int, min_score: float):
+            return [result]
+
+    prompts: list = []
+    session = ChatSession(Index(), responder=lambda prompt: prompts.append(prompt) or "ok", snippet_chars=80)
+    session.send("Wann ist Einlass?")
+
+    context = prompts[0].messages[-2].content
+    snippet = context.split("\n")[-1]
+    assert "Einlass" in snippet
+    assert len(snippet) <= 80
+
+    with pytest.raises(ValueError):
+        ChatSession(Index(), responder=lambda prompt: "", snippet_chars=0)
@@ -4,15 +4,19 @@ import json
 from dataclasses import dataclass
 from pathlib import Path
 import sys
+import time
 from typing import List
 
+import pytest
+
 ROOT = Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
-from rag_chatbot.chat import ChatSession
+from rag_chatbot.chat import ChatSession, TurnTimings
 from rag_chatbot.retrieval import SearchResult
-from rag_chatbot.transcript import ChatTranscript
+from rag_chatbot import transcript as transcript_module
+from rag_chatbot.transcript import ChatTranscript, TranscriptWriter, iter_transcript_turns
 
 
 @dataclass
@@ -91,3 +95,170 @@ def test_transcript_save_creates_json(tmp_path: Path) -> None:
     assert payload["turns"][0]["question"].startswith("Welche Wettbewerbe")
     assert payload["stats"]["turns"] == 1
     assert payload["stats"]["unique_sources"] == 1
+
+
+@dataclass
+class SplitIndex(FakeIndex):
+    def vectorise(self, query: str):
+        return {0: 1.0}
+
+    def search_vector(self, vector, *, top_k: int, min_score: float):
+        return self.results[:top_k]
+
+
+def test_transcript_stores_stage_timings_when_enabled() -> None:
+    result = SearchResult(chunk_id="doc:0001", score=0.5, text="Inhalt", metadata={})
+    transcript = ChatTranscript()
+
+    def responder(prompt):
+        time.sleep(0.01)
+        return "Antwort"
+
+    session = ChatSession(SplitIndex([result]), responder=responder, transcript=transcript, record_timings=True)
+    turn = session.send("Frage")
+
+    assert turn.timings is not None
+    assert turn.timings.vectorise is not None
+    assert turn.timings.responder >= 0.01
+    assert turn.timings.responder > turn.timings.search
+    payload = transcript.to_dict()["turns"][0]
+    assert set(payload["timings"]) == {"vectorise", "search", "prompt", "responder"}
+    assert payload["prompt_chars"] == turn.prompt.chars
+    assert payload["prompt_tokens"] == turn.prompt.estimated_tokens
+    restored = ChatTranscript.from_dict(json.loads(json.dumps(transcript.to_dict())))
+    assert restored.turns[0].timings == TurnTimings.from_dict(payload["timings"])
+
+
+def test_timings_are_not_recorded_by_default() -> None:
+    transcript = ChatTranscript()
+    session = ChatSession(FakeIndex([]), responder=lambda prompt: "Antwort", transcript=transcript)
+
+    assert session.send("Frage").timings is None
+    assert "timings" not in transcript.to_dict()["turns"][0]
+
+
+def _session_with(transcript) -> ChatSession:
+    result = SearchResult(
+        chunk_id="doc:0001",
+        score=0.5,
+        text="edocs ist eine Quiz-Plattform.",
+        metadata={"source": "docs/about.md"},
+    )
+    return ChatSession(FakeIndex([result]), responder=lambda prompt: "Antwort", transcript=transcript)
+
+
+def test_transcript_writer_appends_jsonl_in_batches(tmp_path: Path) -> None:
+    path = tmp_path / "eval" / "transcript.jsonl"
+    writer = TranscriptWriter(path, flush_every=2, fsync=False, compact=False)
+    session = _session_with(writer)
+
+    session.send("Erste Frage")
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line) for line in lines] == [{"format": "rag-transcript", "version": 1}]
+    session.send("Zweite Frage")
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line)["question"] for line in lines[1:]] == ["Erste Frage", "Zweite Frage"]
+
+    session.send("Dritte Frage")
+    writer.close()
+
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 4
+    assert all('": ' not in line for line in lines)
+    assert writer.stats().turns == 3
+    assert writer.stats().unique_sources == 1
+
+    with TranscriptWriter(path, append=True, fsync=False, compact=False) as appender:
+        _session_with(appender).send("Vierte Frage")
+
+    loaded = ChatTranscript.load(path)
+    assert [turn.question for turn in loaded.turns] == ["Erste Frage", "Zweite Frage", "Dritte Frage", "Vierte Frage"]
+    assert loaded.stats().to_dict()["turns"] == 4
+
+
+def test_load_reads_legacy_json_incrementally(tmp_path: Path, monkeypatch) -> None:
+    transcript = ChatTranscript()
+    session = _session_with(transcript)
+    for number in range(5):
+        session.send(f"Frage {number}")
+    path = tmp_path / "transcript.json"
+    transcript.save(path)
+    monkeypatch.setattr(transcript_module, "_READ_SIZE", 7)
+
+    loaded = list(iter_transcript_turns(path))
+
+    assert loaded == list(transcript.turns)
+    assert ChatTranscript.load(path).to_dict() == transcript.to_dict()
+
+
+def test_load_accepts_json_with_other_key_order(tmp_path: Path) -> None:
+    transcript = ChatTranscript()
+    _session_with(transcript).send("Frage")
+    payload = transcript.to_dict()
+    path = tmp_path / "transcript.json"
+    path.write_text(json.dumps({"stats": payload["stats"], "turns": payload["turns"]}), encoding="utf-8")
+
+    assert ChatTranscript.load(path).turns == transcript.turns
+
+
+def test_load_rejects_empty_and_unknown_files(tmp_path: Path) -> None:
+    empty = tmp_path / "empty.jsonl"
+    empty.write_text("\n", encoding="utf-8")
+    unknown = tmp_path / "unknown.jsonl"
+    unknown.write_text('{"format": "anderes"}\n', encoding="utf-8")
+
+    with pytest.raises(ValueError):
+        ChatTranscript.load(empty)
+    with pytest.raises(ValueError):
+        ChatTranscript.load(unknown)
+
+
+def _conversation(turns: int) -> ChatTranscript:
+    transcript = ChatTranscript()
+    session = _session_with(transcript)
+    for number in range(turns):
+        session.send(f"Frage {number}")
+    return transcript
+
+
+def test_compact_dict_roundtrip_is_lossless() -> None:
+    transcript = _conversation(8)
+
+    compact = transcript.to_dict(compact=True)
+    restored = ChatTranscript.from_dict(json.loads(json.dumps(compact)))
+
+    assert restored.turns == transcript.turns
+    assert restored.to_dict() == transcript.to_dict()
+    assert compact["texts"].count("edocs ist eine Quiz-Plattform.") == 1
+    assert all(isinstance(reference, int) for turn in compact["turns"] for reference in turn["prompt"])
+    assert len(json.dumps(compact)) * 2 < len(json.dumps(transcript.to_dict()))
+
+
+def test_compact_save_and_load(tmp_path: Path) -> None:
+    transcript = _conversation(4)
+    path = tmp_path / "transcript.json"
+
+    transcript.save(path, compact=True)
+
+    assert ChatTranscript.load(path).turns == transcript.turns
+
+
+def test_compact_writer_interns_across_lines_and_appends(tmp_path: Path) -> None:
+    path = tmp_path / "transcript.jsonl"
+    with TranscriptWriter(path, fsync=False) as writer:
+        session = _session_with(writer)
+        session.send("Erste Frage")
+        session.send("Zweite Frage")
+    with TranscriptWriter(path, append=True, fsync=False) as writer:
+        session = _session_with(writer)
+        session.send("Erste Frage")
+
+    records = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert records[0] == {"format": "rag-transcript", "version": 2}
+    texts = [text for record in records for text in record.get("texts", [])]
+    assert len(texts) == len(set(texts))
+
+    loaded = ChatTranscript.load(path)
+    assert [turn.question for turn in loaded.turns] == ["Erste Frage", "Zweite Frage", "Erste Frage"]
+    assert loaded.turns[0].prompt_messages[0] is loaded.turns[2].prompt_messages[0]
+    assert loaded.turns[2].context[0].text == "edocs ist eine Quiz-Plattform."